@@ -1,9 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
-import pandas as pd
-import joblib
-import requests
+from typing import List, Optional, Union
+import numpy as np
+import asyncio
+import functools
+import httpx
+import logging
+import os
+import time
+import warnings
+from feature_cache import FeatureCache
+from features import FEATURES, build_feature_matrix, build_feature_plan, round_rating
+from flat_forest import FlatForest, load_flat_model
+from feature_snapshot import FeatureSnapshot
+from metrics import (REQUEST_LATENCY, STAGE_LATENCY, UPSTREAM_ERRORS, UPSTREAM_LATENCY,
+                     format_timings, render_latest, timed)
+
+# Per-request lines are logged at INFO and upstream failures at WARNING;
+# LOG_LEVEL=WARNING silences the former, LOG_LEVEL=DEBUG adds fetch details
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("prediction_api")
+# httpx logs every upstream request at INFO; upstream_get() reports failures itself
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 # Pydantic models for request/response
 class PredictionRequest(BaseModel):
@@ -39,12 +61,141 @@ class PredictionResponse(BaseModel):
 class ErrorResponse(BaseModel):
     error: str
 
+# Upper bound on pairs accepted by one batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+class BatchPredictionRequest(BaseModel):
+    items: List[PredictionRequest] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_SIZE,
+        description="Product/customer pairs to score"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "items": [
+                        {"product_id": 1, "customer_id": 1},
+                        {"product_id": 2, "customer_id": 1}
+                    ]
+                }
+            ]
+        }
+    }
+
+class BatchPredictionError(BaseModel):
+    status: str
+    product_id: int
+    customer_id: int
+    error: str
+
+class BatchPredictionResponse(BaseModel):
+    status: str
+    database: str
+    total: int
+    succeeded: int
+    failed: int
+    results: List[Union[PredictionResponse, BatchPredictionError]]
+
+# Upper bound on k for one recommendation request
+MAX_RECOMMENDATIONS = int(os.getenv("MAX_RECOMMENDATIONS", "1000"))
+
+class Recommendation(BaseModel):
+    rank: int
+    product_id: int
+    product_name: str
+    category: str
+    brand: str
+    price: float
+    predicted_rating: float
+    product_avg_rating: float
+    product_review_count: int
+
+class RecommendationResponse(BaseModel):
+    status: str
+    database: str
+    customer_id: int
+    customer_country: str
+    category: Optional[str]
+    candidates: int
+    recommendations: List[Recommendation]
+
+# Remote API URLs
+SQL_API_URL = os.getenv("SQL_API_URL", "https://synthetic-ecommerce.onrender.com")
+NOSQL_API_URL = os.getenv("NOSQL_API_URL", "https://synthetic-ecommerce-a31h.onrender.com")
+
+# Upstream HTTP client settings (seconds / connection counts)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5.0"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30.0"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+# Seconds a request may wait for a free pooled connection
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "10.0"))
+
+# One shared keep-alive client per upstream, keyed by backend ('sql' / 'nosql')
+http_clients = {}
+
+async def load_models():
+    """Load the serving model, then the batch model, off the event loop"""
+    await asyncio.to_thread(load_model)
+    await asyncio.to_thread(load_batch_model)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    timeout = httpx.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT, pool=UPSTREAM_POOL_TIMEOUT)
+    limits = httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS
+    )
+    http_clients['sql'] = httpx.AsyncClient(base_url=SQL_API_URL, timeout=timeout, limits=limits)
+    http_clients['nosql'] = httpx.AsyncClient(base_url=NOSQL_API_URL, timeout=timeout, limits=limits)
+    model_task = asyncio.create_task(load_models())
+    yield
+    if not model_task.done():
+        model_task.cancel()
+    for client in http_clients.values():
+        await client.aclose()
+    http_clients.clear()
+
+# Feature cache settings: entries expire after FEATURE_CACHE_TTL seconds and
+# each cache holds at most FEATURE_CACHE_MAX_SIZE entries (0 disables caching)
+FEATURE_CACHE_TTL = float(os.getenv("FEATURE_CACHE_TTL", "300"))
+FEATURE_CACHE_MAX_SIZE = int(os.getenv("FEATURE_CACHE_MAX_SIZE", "10000"))
+
+# Separate caches per backend and per kind of lookup
+CACHE_KINDS = ('product', 'customer', 'product_stats', 'customer_stats')
+feature_caches = {
+    backend: {kind: FeatureCache(FEATURE_CACHE_TTL, FEATURE_CACHE_MAX_SIZE) for kind in CACHE_KINDS}
+    for backend in ('sql', 'nosql')
+}
+
+def cached_fetch(backend, kind):
+    """Serve a single-id fetcher from feature_caches[backend][kind].
+
+    Only successful lookups are stored; a fetcher returns None when the
+    entity does not exist and raises UpstreamError when the upstream failed,
+    so both are retried.
+    """
+    def decorator(fetch):
+        @functools.wraps(fetch)
+        async def wrapper(key):
+            cache = feature_caches[backend][kind]
+            value = cache.get(key)
+            if value is not None:
+                return value
+            value = await fetch(key)
+            if value is not None:
+                cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
 # FastAPI app with built-in OpenAPI/Swagger
 app = FastAPI(
     title="E-Commerce Rating Prediction API",
     description="AI-powered API that predicts customer ratings (1-5 stars) for e-commerce products. Supports both SQL and NoSQL databases.",
     version="1.0.0",
-    contact={"name": "API Support"}
+    contact={"name": "API Support"},
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -56,140 +207,264 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Remote API URLs
-SQL_API_URL = "https://synthetic-ecommerce.onrender.com"
-NOSQL_API_URL = "https://synthetic-ecommerce-a31h.onrender.com"
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    """End-to-end latency per matched route template (prediction_request_seconds)"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    if route is not None and route.path != '/metrics':
+        REQUEST_LATENCY.labels(route=route.path).observe(time.perf_counter() - started)
+    return response
 
-# Load the model and encoders
-print("Loading model...")
-model, encoders = joblib.load('model.pkl')
-print("Model loaded successfully!")
+# Model artifacts: 'flat' serves the memory-mapped FlatForest directory
+# exported by flat_forest.py (converted on the fly if only model.pkl exists),
+# 'sklearn' serves the RandomForestRegressor as trained
+MODEL_PATH = os.getenv("MODEL_PATH", "model.pkl")
+FLAT_MODEL_PATH = os.getenv("FLAT_MODEL_PATH", "model_flat")
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "flat")
 
-# ============================================================================
-# SQL DATABASE FUNCTIONS (Relational DB)
-# ============================================================================
+# FlatForest has almost no per-call overhead but costs more per row than
+# sklearn's compiled traversal, so with the flat engine only predicts of
+# fewer rows than this use it; larger ones go to the sklearn estimator
+FLAT_MAX_ROWS = int(os.getenv("FLAT_MAX_ROWS", "500"))
 
-def fetch_product_sql(product_id):
-    """Fetch product from SQL API"""
+# Feature snapshot written by train_model_sampled.py; enables /local/predict
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "features_snapshot.npz")
+
+# Set by load_model(); `model` stays None until the service is ready.
+# batch_model serves predicts of FLAT_MAX_ROWS rows or more (see model_for);
+# with model_flat/ it is loaded once the service is ready
+model = None
+batch_model = None
+encoders = None
+feature_plan = None
+feature_snapshot = None
+model_status = {'state': 'loading', 'engine': MODEL_ENGINE, 'batch_engine': None,
+                'flat_max_rows': FLAT_MAX_ROWS, 'artifact': None,
+                'snapshot': None, 'load_seconds': None, 'error': None}
+
+def check_feature_order(artifact, loaded_model):
+    """Rows are passed as plain arrays in FEATURES order; make sure that is
+    the order the model was fitted with before silencing sklearn's name check"""
+    if list(getattr(loaded_model, 'feature_names_in_', FEATURES)) != FEATURES:
+        raise RuntimeError(f"{artifact} was trained on {list(loaded_model.feature_names_in_)}, "
+                           f"expected {FEATURES}")
+
+def load_model():
+    """Load the model and encoders and build the encoder lookup tables.
+
+    Runs in a worker thread from the lifespan hook, so the server accepts
+    connections (and answers /health) while the model is still loading.
+    joblib/sklearn are only imported when the pickled sklearn artifact is used.
+    With model_flat/ the service is ready as soon as it is mapped; model.pkl
+    is loaded for large batches afterwards by load_batch_model.
+    """
+    global model, batch_model, encoders, feature_plan, feature_snapshot
+    started = time.perf_counter()
+    logger.info("Loading model (engine=%s)...", MODEL_ENGINE)
     try:
-        response = requests.get(f"{SQL_API_URL}/products/{product_id}")
-        if response.status_code == 200:
-            return response.json()
-        return None
+        if MODEL_ENGINE == 'flat' and os.path.isdir(FLAT_MODEL_PATH):
+            artifact = FLAT_MODEL_PATH
+            loaded_model, loaded_encoders = load_flat_model(FLAT_MODEL_PATH, mmap_mode='r')
+            loaded_batch_model = None
+        else:
+            import joblib
+
+            artifact = MODEL_PATH
+            loaded_model, loaded_encoders = joblib.load(MODEL_PATH)
+            loaded_batch_model = loaded_model
+            # Only random forests can be flattened; other backends (hgb) are
+            # served by sklearn itself
+            if MODEL_ENGINE == 'flat' and hasattr(loaded_model, 'estimators_'):
+                loaded_model = FlatForest.from_sklearn(loaded_model)
+            elif MODEL_ENGINE == 'flat':
+                logger.info("%s is a %s, serving it with sklearn",
+                            MODEL_PATH, type(loaded_model).__name__)
+                model_status['engine'] = 'sklearn'
+
+        check_feature_order(artifact, loaded_model)
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+        # Encoder lookup tables, built once so each request skips LabelEncoder.transform
+        feature_plan = build_feature_plan(loaded_encoders)
+        encoders = loaded_encoders
+
+        if os.path.exists(SNAPSHOT_PATH):
+            feature_snapshot = FeatureSnapshot.load(SNAPSHOT_PATH)
+            model_status['snapshot'] = SNAPSHOT_PATH
+            logger.info("Feature snapshot loaded: %d products, %d customers",
+                        feature_snapshot.n_products, feature_snapshot.n_customers)
+        batch_model = loaded_batch_model
+        model = loaded_model
     except Exception as e:
-        print(f"Error fetching product from SQL: {e}")
-        return None
+        model_status.update(state='failed', error=str(e))
+        logger.error("Error loading model: %s", e)
+        raise
 
-def fetch_customer_sql(customer_id):
-    """Fetch customer from SQL API"""
+    model_status.update(state='ready', artifact=artifact,
+                        batch_engine='flat' if batch_model is None else 'sklearn',
+                        load_seconds=round(time.perf_counter() - started, 3))
+    logger.info("Model loaded successfully in %ss!", model_status['load_seconds'])
+
+def load_batch_model():
+    """Load model.pkl as batch_model once load_model has made the service ready.
+
+    Only needed when the flat model was loaded from model_flat/. Until it is
+    loaded, or if loading fails, the flat model scores every predict, so a
+    failure is logged rather than raised.
+    """
+    global batch_model
+    if batch_model is not None or model is None or not os.path.exists(MODEL_PATH):
+        return
     try:
-        response = requests.get(f"{SQL_API_URL}/customers/{customer_id}")
-        if response.status_code == 200:
-            return response.json()
-        return None
+        import joblib
+
+        loaded_model, _ = joblib.load(MODEL_PATH)
+        check_feature_order(MODEL_PATH, loaded_model)
     except Exception as e:
-        print(f"Error fetching customer from SQL: {e}")
-        return None
+        logger.error("Error loading %s for large batches, the flat model serves them: %s", MODEL_PATH, e)
+        return
+    batch_model = loaded_model
+    model_status['batch_engine'] = 'sklearn'
+    logger.info("Batch model %s loaded", MODEL_PATH)
+
+def model_for(n_rows):
+    """The engine to score n_rows rows with: the serving model for single
+    rows and small batches, the sklearn estimator from FLAT_MAX_ROWS rows
+    (once it is loaded)"""
+    if n_rows >= FLAT_MAX_ROWS and batch_model is not None:
+        return batch_model
+    return model
+
+def require_model():
+    """Reject prediction requests until the model is loaded"""
+    if model is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is not ready (state: {model_status['state']})"
+        )
 
-def fetch_product_reviews_sql(product_id):
-    """Fetch all reviews for a product from SQL API"""
+def require_snapshot():
+    """Reject local predictions when no feature snapshot is available"""
+    require_model()
+    if feature_snapshot is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Feature snapshot not available ({SNAPSHOT_PATH} not found)"
+        )
+
+class UpstreamError(Exception):
+    """An upstream request that failed (timeout, connection error, non-404
+    status), as opposed to an entity the upstream does not have"""
+
+async def upstream_get(backend, endpoint, **params):
+    """GET `endpoint` (a path template such as /products/{id}) from an upstream
+
+    Returns the JSON body on 200 and None on 404; raises UpstreamError
+    otherwise. Latency and failures are recorded per backend and endpoint
+    template.
+    """
+    path = endpoint.format(**params)
     try:
-        response = requests.get(f"{SQL_API_URL}/reviews/")
-        if response.status_code == 200:
-            all_reviews = response.json()
-            return [r for r in all_reviews if r['product_id'] == product_id]
-        return []
+        with timed(UPSTREAM_LATENCY, backend=backend, endpoint=endpoint):
+            response = await http_clients[backend].get(path)
     except Exception as e:
-        print(f"Error fetching product reviews from SQL: {e}")
-        return []
+        reason = type(e).__name__
+        logger.warning("Error fetching %s from %s: %s", path, backend.upper(), e)
+        UPSTREAM_ERRORS.labels(backend=backend, endpoint=endpoint, reason=reason).inc()
+        raise UpstreamError(f'{backend.upper()} request {path} failed: {reason}') from e
+    if response.status_code == 200:
+        return response.json()
+    logger.debug("%s %s returned %d", backend.upper(), path, response.status_code)
+    UPSTREAM_ERRORS.labels(backend=backend, endpoint=endpoint, reason=f'http_{response.status_code}').inc()
+    if response.status_code == 404:
+        return None
+    raise UpstreamError(f'{backend.upper()} request {path} returned {response.status_code}')
 
-def fetch_customer_reviews_sql(customer_id):
-    """Fetch all reviews by a customer from SQL API"""
+async def upstream_rating_stats(backend, endpoint, entity_id):
+    """(mean, count) rating stats, or None when they are missing or could not
+    be fetched; predictions then fall back to neutral stats"""
     try:
-        response = requests.get(f"{SQL_API_URL}/reviews/")
-        if response.status_code == 200:
-            all_reviews = response.json()
-            return [r for r in all_reviews if r['customer_id'] == customer_id]
-        return []
-    except Exception as e:
-        print(f"Error fetching customer reviews from SQL: {e}")
-        return []
+        stats = await upstream_get(backend, endpoint, id=entity_id)
+    except UpstreamError:
+        return None
+    return (stats['mean_rating'], stats['review_count']) if stats is not None else None
+
+# ============================================================================
+# SQL DATABASE FUNCTIONS (Relational DB)
+# ============================================================================
+
+@cached_fetch('sql', 'product')
+async def fetch_product_sql(product_id):
+    """Fetch product from SQL API"""
+    return await upstream_get('sql', '/products/{id}', id=product_id)
+
+@cached_fetch('sql', 'customer')
+async def fetch_customer_sql(customer_id):
+    """Fetch customer from SQL API"""
+    return await upstream_get('sql', '/customers/{id}', id=customer_id)
+
+@cached_fetch('sql', 'product_stats')
+async def fetch_product_rating_stats_sql(product_id):
+    """Fetch aggregated (mean, count) rating stats for a product from SQL API"""
+    return await upstream_rating_stats('sql', '/reviews/stats/product/{id}', product_id)
+
+@cached_fetch('sql', 'customer_stats')
+async def fetch_customer_rating_stats_sql(customer_id):
+    """Fetch aggregated (mean, count) rating stats for a customer from SQL API"""
+    return await upstream_rating_stats('sql', '/reviews/stats/customer/{id}', customer_id)
 
 # ============================================================================
 # NOSQL DATABASE FUNCTIONS (MongoDB)
 # ============================================================================
 
-def fetch_product_nosql(product_id):
+@cached_fetch('nosql', 'product')
+async def fetch_product_nosql(product_id):
     """Fetch product from NoSQL API using numeric product_id"""
-    try:
-        response = requests.get(f"{NOSQL_API_URL}/products/by-product-id/{product_id}")
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"Error fetching product from NoSQL: {e}")
-        return None
+    return await upstream_get('nosql', '/products/by-product-id/{id}', id=product_id)
 
-def fetch_customer_nosql(customer_id):
+@cached_fetch('nosql', 'customer')
+async def fetch_customer_nosql(customer_id):
     """Fetch customer from NoSQL API using numeric customer_id"""
-    try:
-        response = requests.get(f"{NOSQL_API_URL}/customers/by-customer-id/{customer_id}")
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"Error fetching customer from NoSQL: {e}")
-        return None
+    return await upstream_get('nosql', '/customers/by-customer-id/{id}', id=customer_id)
 
-def fetch_product_reviews_nosql(product_id):
-    """Fetch all reviews for a product from NoSQL API"""
-    try:
-        response = requests.get(f"{NOSQL_API_URL}/product-reviews/product/{product_id}")
-        if response.status_code == 200:
-            return response.json()
-        return []
-    except Exception as e:
-        print(f"Error fetching product reviews from NoSQL: {e}")
-        return []
+@cached_fetch('nosql', 'product_stats')
+async def fetch_product_rating_stats_nosql(product_id):
+    """Fetch aggregated (mean, count) rating stats for a product from NoSQL API"""
+    return await upstream_rating_stats('nosql', '/product-reviews/stats/product/{id}', product_id)
 
-def fetch_customer_reviews_nosql(customer_id):
-    """Fetch all reviews by a customer from NoSQL API"""
-    try:
-        response = requests.get(f"{NOSQL_API_URL}/product-reviews/customer/{customer_id}")
-        if response.status_code == 200:
-            return response.json()
-        return []
-    except Exception as e:
-        print(f"Error fetching customer reviews from NoSQL: {e}")
-        return []
+@cached_fetch('nosql', 'customer_stats')
+async def fetch_customer_rating_stats_nosql(customer_id):
+    """Fetch aggregated (mean, count) rating stats for a customer from NoSQL API"""
+    return await upstream_rating_stats('nosql', '/product-reviews/stats/customer/{id}', customer_id)
+
+# (product, customer, product rating stats, customer rating stats) fetchers
+SQL_FETCHERS = (fetch_product_sql, fetch_customer_sql,
+                fetch_product_rating_stats_sql, fetch_customer_rating_stats_sql)
+NOSQL_FETCHERS = (fetch_product_nosql, fetch_customer_nosql,
+                  fetch_product_rating_stats_nosql, fetch_customer_rating_stats_nosql)
 
 # ============================================================================
 # SHARED PREDICTION LOGIC
 # ============================================================================
 
-def make_prediction(product, customer, product_reviews, customer_reviews, db_type):
-    """Shared prediction logic for both SQL and NoSQL"""
+def resolve_rating_stats(stats):
+    """Apply the neutral default (3.0, 0) when an entity has no reviews yet
+    or its stats could not be fetched (stats is None)"""
+    if stats is None:
+        return 3.0, 0  # Default
+    mean, count = stats
+    if not count or mean is None:
+        return 3.0, 0  # Default
+    return mean, count
 
-    # Calculate product statistics
-    if product_reviews:
-        product_ratings = [r['rating'] for r in product_reviews]
-        mean_product_avg = sum(product_ratings) / len(product_ratings)
-        count_product_avg = len(product_ratings)
-    else:
-        mean_product_avg = 3.0  # Default
-        count_product_avg = 0
-
-    # Calculate customer statistics
-    if customer_reviews:
-        customer_ratings = [r['rating'] for r in customer_reviews]
-        mean_customer_avg = sum(customer_ratings) / len(customer_ratings)
-        count_customer_avg = len(customer_ratings)
-    else:
-        mean_customer_avg = 3.0  # Default
-        count_customer_avg = 0
+def prepare_input(product, customer, product_stats, customer_stats):
+    """Build the raw (unencoded) model input for one product/customer pair"""
+    mean_product_avg, count_product_avg = resolve_rating_stats(product_stats)
+    mean_customer_avg, count_customer_avg = resolve_rating_stats(customer_stats)
 
-    # Prepare input data for prediction
-    input_data = {
+    return {
         'price': product.get('price', 0.0),
         'category': product.get('category', ''),
         'brand': product.get('brand', ''),
@@ -201,38 +476,8 @@ def make_prediction(product, customer, product_reviews, customer_reviews, db_typ
         'count_customer_avg': count_customer_avg
     }
 
-    # Convert to DataFrame
-    input_df = pd.DataFrame([input_data])
-
-    # Encode categorical columns
-    categorical_mappings = {
-        'category': encoders['category'],
-        'brand': encoders['brand'],
-        'gender': encoders['gender'],
-        'country': encoders['country']
-    }
-
-    for col, encoder in categorical_mappings.items():
-        if input_df[col].iloc[0] != '' and input_df[col].iloc[0] is not None:
-            try:
-                input_df[f'{col}_encoded'] = encoder.transform(input_df[col])
-            except ValueError:
-                input_df[f'{col}_encoded'] = 0
-        else:
-            input_df[f'{col}_encoded'] = 0
-
-    # Prepare features in the same order as training
-    features = ['price', 'category_encoded', 'brand_encoded', 'gender_encoded',
-               'country_encoded', 'mean_product_avg', 'count_product_avg',
-               'mean_customer_avg', 'count_customer_avg']
-
-    # Make prediction
-    prediction = model.predict(input_df[features])
-    predicted_rating = float(prediction[0])
-
-    # Clamp between 1 and 5
-    predicted_rating = max(1.0, min(5.0, predicted_rating))
-
+def format_prediction(product, customer, input_data, predicted_rating, db_type):
+    """Shape one prediction into the PredictionResponse payload"""
     return {
         'status': 'success',
         'database': db_type,
@@ -242,11 +487,145 @@ def make_prediction(product, customer, product_reviews, customer_reviews, db_typ
         'category': product.get('category'),
         'price': product.get('price'),
         'customer_country': customer.get('country'),
-        'predicted_rating': round(predicted_rating, 2),
-        'product_avg_rating': round(mean_product_avg, 2),
-        'product_review_count': count_product_avg,
-        'customer_avg_rating': round(mean_customer_avg, 2),
-        'customer_review_count': count_customer_avg
+        'predicted_rating': float(round_rating(predicted_rating)),
+        'product_avg_rating': round(input_data['mean_product_avg'], 2),
+        'product_review_count': input_data['count_product_avg'],
+        'customer_avg_rating': round(input_data['mean_customer_avg'], 2),
+        'customer_review_count': input_data['count_customer_avg']
+    }
+
+def stage(db_type, name, timings=None):
+    """Time one prediction stage into prediction_stage_seconds (and timings)"""
+    return timed(STAGE_LATENCY, timings, name, database=db_type, stage=name)
+
+def make_predictions(samples, db_type, timings=None):
+    """Score many (product, customer, product_stats, customer_stats) samples
+    with a single predict call on the engine model_for picks"""
+    with stage(db_type, 'feature_build', timings):
+        inputs = [prepare_input(*sample) for sample in samples]
+        X = build_feature_matrix(inputs, feature_plan)
+    with stage(db_type, 'inference', timings):
+        predictions = model_for(len(X)).predict(X)
+
+    # Clamp between 1 and 5
+    predictions = np.clip(predictions, 1.0, 5.0)
+
+    return [
+        format_prediction(product, customer, input_data, float(predicted_rating), db_type)
+        for (product, customer, _, _), input_data, predicted_rating
+        in zip(samples, inputs, predictions)
+    ]
+
+def make_prediction(product, customer, product_stats, customer_stats, db_type, timings=None):
+    """Shared prediction logic for both SQL and NoSQL
+
+    product_stats and customer_stats are (mean, count) rating tuples; a mean
+    of None (no reviews yet) or missing stats fall back to the neutral
+    default of 3.0. Stage durations are added to `timings` when given.
+    """
+    return make_predictions([(product, customer, product_stats, customer_stats)], db_type, timings)[0]
+
+def recommend_products(customer_row, k, category=None):
+    """(product rows, predicted ratings, candidate count) for the top-k
+    snapshot products of one customer
+
+    Every candidate product is scored against the customer in a single
+    vectorized feature build and model.predict call; np.argpartition then
+    picks the k best in O(n) and only those k are sorted.
+    """
+    if category is None:
+        candidate_rows = np.arange(feature_snapshot.n_products)
+    else:
+        candidate_rows = feature_snapshot.product_rows_in_category(category)
+    if not candidate_rows.size:
+        return candidate_rows, np.empty(0), 0
+
+    with stage('Local', 'feature_build'):
+        X = feature_snapshot.feature_matrix(candidate_rows, customer_row, feature_plan)
+    with stage('Local', 'inference'):
+        scores = np.clip(model_for(len(X)).predict(X), 1.0, 5.0)
+
+    k = min(k, scores.size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    # Ties broken by product id so results are stable across calls
+    top = top[np.lexsort((feature_snapshot.product_id[candidate_rows[top]], -scores[top]))]
+    return candidate_rows[top], scores[top], scores.size
+
+async def fetch_distinct(fetch, ids, limit):
+    """Call `fetch` once per distinct id, at most `limit` (a semaphore) at a
+    time; returns {id: result}, with the UpstreamError as the result of a
+    failed fetch"""
+    async def fetch_one(entity_id):
+        async with limit:
+            try:
+                return await fetch(entity_id)
+            except UpstreamError as e:
+                return e
+
+    distinct_ids = list(dict.fromkeys(ids))
+    results = await asyncio.gather(*(fetch_one(i) for i in distinct_ids))
+    return dict(zip(distinct_ids, results))
+
+async def predict_batch(items, db_type, fetchers):
+    """Batch prediction shared by SQL and NoSQL
+
+    Each distinct product and customer is fetched once, all found pairs are
+    scored with one model.predict call, and pairs whose product or customer
+    is missing or could not be fetched are reported as per-item errors.
+    No more than UPSTREAM_MAX_CONNECTIONS fetches are in flight, so a large
+    batch does not queue thousands of requests on the connection pool.
+    """
+    fetch_product, fetch_customer, fetch_product_stats, fetch_customer_stats = fetchers
+    product_ids = [item.product_id for item in items]
+    customer_ids = [item.customer_id for item in items]
+
+    limit = asyncio.Semaphore(UPSTREAM_MAX_CONNECTIONS)
+    with stage(db_type, 'fetch'):
+        products, customers, product_stats, customer_stats = await asyncio.gather(
+            fetch_distinct(fetch_product, product_ids, limit),
+            fetch_distinct(fetch_customer, customer_ids, limit),
+            fetch_distinct(fetch_product_stats, product_ids, limit),
+            fetch_distinct(fetch_customer_stats, customer_ids, limit)
+        )
+
+    results = [None] * len(items)
+    samples = []
+    positions = []
+    for position, item in enumerate(items):
+        product = products[item.product_id]
+        customer = customers[item.customer_id]
+        status = 'error'
+        if isinstance(product, UpstreamError) or isinstance(customer, UpstreamError):
+            status = 'upstream_error'
+            error = str(product if isinstance(product, UpstreamError) else customer)
+        elif not product:
+            error = f'Product {item.product_id} not found in {db_type} database'
+        elif not customer:
+            error = f'Customer {item.customer_id} not found in {db_type} database'
+        else:
+            samples.append((product, customer,
+                            product_stats[item.product_id], customer_stats[item.customer_id]))
+            positions.append(position)
+            continue
+        results[position] = {
+            'status': status,
+            'product_id': item.product_id,
+            'customer_id': item.customer_id,
+            'error': error
+        }
+
+    if samples:
+        for position, prediction in zip(positions, make_predictions(samples, db_type)):
+            results[position] = prediction
+
+    failed = len(items) - len(samples)
+    return {
+        'status': 'success' if not failed else ('partial' if samples else 'error'),
+        'database': db_type,
+        'total': len(items),
+        'succeeded': len(samples),
+        'failed': failed,
+        'results': results
     }
 
 # ============================================================================
@@ -259,7 +638,7 @@ def make_prediction(product, customer, product_reviews, customer_reviews, db_typ
     summary="API Overview",
     description="Get API information and available endpoints"
 )
-def home():
+async def home():
     return {
         'message': 'E-Commerce Rating Prediction API (Unified)',
         'endpoints': {
@@ -284,31 +663,98 @@ def home():
                     'product_id': 1,
                     'customer_id': 1
                 }
+            },
+            '/local/predict': {
+                'method': 'POST',
+                'description': 'Predict rating from the local feature snapshot (no upstream calls)',
+                'database': 'Local snapshot',
+                'snapshot': SNAPSHOT_PATH,
+                'required_fields': ['product_id', 'customer_id'],
+                'example': {
+                    'product_id': 1,
+                    'customer_id': 1
+                }
+            },
+            '/sql/predict/batch': {
+                'method': 'POST',
+                'description': 'Predict ratings for many pairs using SQL database API',
+                'database': 'Relational Database',
+                'api_url': SQL_API_URL,
+                'required_fields': ['items'],
+                'max_items': MAX_BATCH_SIZE
+            },
+            '/nosql/predict/batch': {
+                'method': 'POST',
+                'description': 'Predict ratings for many pairs using NoSQL database API',
+                'database': 'MongoDB',
+                'api_url': NOSQL_API_URL,
+                'required_fields': ['items'],
+                'max_items': MAX_BATCH_SIZE
+            },
+            '/recommend/{customer_id}': {
+                'method': 'GET',
+                'description': 'Top-k products by predicted rating for a customer (local feature snapshot)',
+                'database': 'Local snapshot',
+                'snapshot': SNAPSHOT_PATH,
+                'query_params': {'k': 20, 'category': None},
+                'max_k': MAX_RECOMMENDATIONS
             }
         }
     }
 
+@app.get(
+    "/health",
+    tags=["Health"],
+    summary="Liveness Check",
+    description="The process is up and serving HTTP. Does not wait for the model."
+)
+async def health():
+    return {'status': 'ok'}
+
+@app.get(
+    "/ready",
+    tags=["Health"],
+    summary="Readiness Check",
+    description="200 once the model is loaded and predictions can be served, 503 while it is still loading or if loading failed.",
+    responses={503: {"description": "Model not loaded yet"}}
+)
+async def ready():
+    if model is None:
+        return JSONResponse(status_code=503, content=model_status)
+    return model_status
+
 @app.post(
     "/sql/predict",
     tags=["Predictions"],
     response_model=PredictionResponse,
     responses={
         404: {"model": ErrorResponse, "description": "Product or customer not found"},
-        500: {"model": ErrorResponse, "description": "Server error"}
+        500: {"model": ErrorResponse, "description": "Server error"},
+        502: {"model": ErrorResponse, "description": "Upstream database API failed or timed out"},
+        503: {"model": ErrorResponse, "description": "Model not loaded yet"}
     },
     summary="Predict Rating (SQL Database)",
     description="Predict product rating using SQL database API. Fetches product and customer data from relational database."
 )
-def predict_sql(request: PredictionRequest):
+async def predict_sql(request: PredictionRequest):
     try:
+        require_model()
+
         product_id = request.product_id
         customer_id = request.customer_id
 
-        # Fetch data from SQL API
-        print(f"[SQL] Fetching data for product_id={product_id}, customer_id={customer_id}")
+        # Fetch data from SQL API (independent lookups run concurrently)
+        logger.debug("[SQL] Fetching data for product_id=%s, customer_id=%s", product_id, customer_id)
 
-        product = fetch_product_sql(product_id)
-        customer = fetch_customer_sql(customer_id)
+        started = time.perf_counter()
+        timings = {}
+        with stage('SQL', 'fetch', timings):
+            product, customer, product_stats, customer_stats = await asyncio.gather(
+                fetch_product_sql(product_id),
+                fetch_customer_sql(customer_id),
+                fetch_product_rating_stats_sql(product_id),
+                fetch_customer_rating_stats_sql(customer_id)
+            )
 
         if not product:
             raise HTTPException(
@@ -322,15 +768,17 @@ def predict_sql(request: PredictionRequest):
                 detail=f'Customer {customer_id} not found in SQL database'
             )
 
-        product_reviews = fetch_product_reviews_sql(product_id)
-        customer_reviews = fetch_customer_reviews_sql(customer_id)
-
         # Make prediction
-        result = make_prediction(product, customer, product_reviews, customer_reviews, 'SQL')
+        result = make_prediction(product, customer, product_stats, customer_stats, 'SQL', timings)
+        timings['total'] = time.perf_counter() - started
+        logger.info("[SQL] product_id=%s customer_id=%s rating=%s %s",
+                    product_id, customer_id, result['predicted_rating'], format_timings(timings))
         return result
 
     except HTTPException:
         raise
+    except UpstreamError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -340,21 +788,32 @@ def predict_sql(request: PredictionRequest):
     response_model=PredictionResponse,
     responses={
         404: {"model": ErrorResponse, "description": "Product or customer not found"},
-        500: {"model": ErrorResponse, "description": "Server error"}
+        500: {"model": ErrorResponse, "description": "Server error"},
+        502: {"model": ErrorResponse, "description": "Upstream database API failed or timed out"},
+        503: {"model": ErrorResponse, "description": "Model not loaded yet"}
     },
     summary="Predict Rating (NoSQL Database)",
     description="Predict product rating using NoSQL database API. Fetches product and customer data from MongoDB."
 )
-def predict_nosql(request: PredictionRequest):
+async def predict_nosql(request: PredictionRequest):
     try:
+        require_model()
+
         product_id = request.product_id
         customer_id = request.customer_id
 
-        # Fetch data from NoSQL API
-        print(f"[NoSQL] Fetching data for product_id={product_id}, customer_id={customer_id}")
+        # Fetch data from NoSQL API (independent lookups run concurrently)
+        logger.debug("[NoSQL] Fetching data for product_id=%s, customer_id=%s", product_id, customer_id)
 
-        product = fetch_product_nosql(product_id)
-        customer = fetch_customer_nosql(customer_id)
+        started = time.perf_counter()
+        timings = {}
+        with stage('NoSQL', 'fetch', timings):
+            product, customer, product_stats, customer_stats = await asyncio.gather(
+                fetch_product_nosql(product_id),
+                fetch_customer_nosql(customer_id),
+                fetch_product_rating_stats_nosql(product_id),
+                fetch_customer_rating_stats_nosql(customer_id)
+            )
 
         if not product:
             raise HTTPException(
@@ -368,18 +827,209 @@ def predict_nosql(request: PredictionRequest):
                 detail=f'Customer {customer_id} not found in NoSQL database'
             )
 
-        product_reviews = fetch_product_reviews_nosql(product_id)
-        customer_reviews = fetch_customer_reviews_nosql(customer_id)
-
         # Make prediction
-        result = make_prediction(product, customer, product_reviews, customer_reviews, 'NoSQL')
+        result = make_prediction(product, customer, product_stats, customer_stats, 'NoSQL', timings)
+        timings['total'] = time.perf_counter() - started
+        logger.info("[NoSQL] product_id=%s customer_id=%s rating=%s %s",
+                    product_id, customer_id, result['predicted_rating'], format_timings(timings))
         return result
 
     except HTTPException:
         raise
+    except UpstreamError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post(
+    "/sql/predict/batch",
+    tags=["Predictions"],
+    response_model=BatchPredictionResponse,
+    responses={
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model not loaded yet"}
+    },
+    summary="Batch Predict Ratings (SQL Database)",
+    description="Predict ratings for many product/customer pairs using SQL database API. Each distinct product and customer is fetched once and all pairs are scored in one model call; missing products or customers are reported per item, and upstream failures as upstream_error items."
+)
+async def predict_sql_batch(request: BatchPredictionRequest):
+    require_model()
+    try:
+        logger.info("[SQL] Batch prediction for %d pairs", len(request.items))
+        return await predict_batch(request.items, 'SQL', SQL_FETCHERS)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post(
+    "/nosql/predict/batch",
+    tags=["Predictions"],
+    response_model=BatchPredictionResponse,
+    responses={
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model not loaded yet"}
+    },
+    summary="Batch Predict Ratings (NoSQL Database)",
+    description="Predict ratings for many product/customer pairs using NoSQL database API. Each distinct product and customer is fetched once and all pairs are scored in one model call; missing products or customers are reported per item, and upstream failures as upstream_error items."
+)
+async def predict_nosql_batch(request: BatchPredictionRequest):
+    require_model()
+    try:
+        logger.info("[NoSQL] Batch prediction for %d pairs", len(request.items))
+        return await predict_batch(request.items, 'NoSQL', NOSQL_FETCHERS)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post(
+    "/local/predict",
+    tags=["Predictions"],
+    response_model=PredictionResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Product or customer not found"},
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model or feature snapshot not loaded"}
+    },
+    summary="Predict Rating (Local Snapshot)",
+    description="Predict product rating from the in-memory feature snapshot written at training time. Makes no upstream calls; product/customer attributes and rating stats are as of the last training run."
+)
+async def predict_local(request: PredictionRequest):
+    try:
+        require_snapshot()
+        product_id = request.product_id
+        customer_id = request.customer_id
+
+        product = feature_snapshot.product(product_id)
+        customer = feature_snapshot.customer(customer_id)
+
+        if not product:
+            raise HTTPException(
+                status_code=404,
+                detail=f'Product {product_id} not found in feature snapshot'
+            )
+
+        if not customer:
+            raise HTTPException(
+                status_code=404,
+                detail=f'Customer {customer_id} not found in feature snapshot'
+            )
+
+        (product, product_stats), (customer, customer_stats) = product, customer
+        return make_prediction(product, customer, product_stats, customer_stats, 'Local')
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get(
+    "/recommend/{customer_id}",
+    tags=["Predictions"],
+    response_model=RecommendationResponse,
+    responses={
+        404: {"model": ErrorResponse, "description": "Customer not found"},
+        500: {"model": ErrorResponse, "description": "Server error"},
+        503: {"model": ErrorResponse, "description": "Model or feature snapshot not loaded"}
+    },
+    summary="Top-K Product Recommendations",
+    description="Rank every product in the feature snapshot (optionally one category) by predicted rating for a customer and return the k best. Scores all candidates in one model call; makes no upstream calls."
+)
+async def recommend(
+    customer_id: int,
+    k: int = Query(20, ge=1, le=MAX_RECOMMENDATIONS, description="Number of products to return"),
+    category: Optional[str] = Query(None, description="Only rank products in this category")
+):
+    try:
+        require_snapshot()
+        customer_row = feature_snapshot.customer_index(customer_id)
+        if customer_row < 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f'Customer {customer_id} not found in feature snapshot'
+            )
+
+        rows, scores, candidates = recommend_products(customer_row, k, category)
+
+        recommendations = []
+        for rank, (row, score) in enumerate(zip(rows, scores), start=1):
+            product, (mean_rating, review_count) = feature_snapshot.product(int(feature_snapshot.product_id[row]))
+            mean_rating, review_count = resolve_rating_stats((mean_rating, review_count))
+            recommendations.append({
+                'rank': rank,
+                'product_id': product['product_id'],
+                'product_name': product['product_name'],
+                'category': product['category'],
+                'brand': product['brand'],
+                'price': product['price'],
+                'predicted_rating': float(round_rating(score)),
+                'product_avg_rating': round(mean_rating, 2),
+                'product_review_count': review_count
+            })
+
+        customer, _ = feature_snapshot.customer(customer_id)
+        return {
+            'status': 'success',
+            'database': 'Local',
+            'customer_id': customer_id,
+            'customer_country': customer['country'],
+            'category': category,
+            'candidates': candidates,
+            'recommendations': recommendations
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get(
+    "/metrics",
+    tags=["Health"],
+    summary="Prometheus Metrics",
+    description="Upstream latency and error counters, per-stage and end-to-end prediction latency histograms, in Prometheus text format."
+)
+async def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+@app.get(
+    "/admin/cache",
+    tags=["Admin"],
+    summary="Feature Cache Stats",
+    description="Size, hit/miss and eviction counters for each feature cache, per backend."
+)
+async def feature_cache_stats():
+    return {
+        backend: {kind: cache.stats() for kind, cache in caches.items()}
+        for backend, caches in feature_caches.items()
+    }
+
+@app.delete(
+    "/admin/cache",
+    tags=["Admin"],
+    summary="Invalidate Feature Cache",
+    description="Drop cached rows and rating stats for a product and/or customer. With neither id given, the selected caches are cleared entirely."
+)
+async def invalidate_feature_cache(
+    product_id: Optional[int] = Query(None, description="Product whose row and rating stats to drop"),
+    customer_id: Optional[int] = Query(None, description="Customer whose row and rating stats to drop"),
+    backend: Optional[str] = Query(None, pattern="^(sql|nosql)$", description="Limit to one backend")
+):
+    backends = [backend] if backend else list(feature_caches)
+    invalidated = 0
+    for name in backends:
+        caches = feature_caches[name]
+        if product_id is None and customer_id is None:
+            for cache in caches.values():
+                invalidated += cache.stats()['size']
+                cache.clear()
+            continue
+        if product_id is not None:
+            invalidated += caches['product'].invalidate(product_id)
+            invalidated += caches['product_stats'].invalidate(product_id)
+        if customer_id is not None:
+            invalidated += caches['customer'].invalidate(customer_id)
+            invalidated += caches['customer_stats'].invalidate(customer_id)
+    return {'status': 'success', 'backends': backends, 'invalidated': invalidated}
+
 if __name__ == '__main__':
     import uvicorn
 
@@ -388,11 +1038,19 @@ if __name__ == '__main__':
     print("="*70)
     print("Endpoints:")
     print("  - GET  /              : API overview")
-    print("  - GET  /health        : Health check")
+    print("  - GET  /health        : Liveness check")
+    print("  - GET  /ready         : Readiness check (model loaded)")
+    print("  - GET  /metrics       : Prometheus metrics")
     print("  - GET  /docs          : Swagger documentation (Interactive)")
     print("  - GET  /redoc         : ReDoc documentation (Alternative)")
     print("  - POST /sql/predict   : Predict rating (SQL database)")
     print("  - POST /nosql/predict : Predict rating (NoSQL database)")
+    print("  - POST /sql/predict/batch   : Batch predict ratings (SQL database)")
+    print("  - POST /nosql/predict/batch : Batch predict ratings (NoSQL database)")
+    print("  - POST /local/predict : Predict rating (local feature snapshot)")
+    print("  - GET  /recommend/{customer_id} : Top-k product recommendations")
+    print("  - GET  /admin/cache   : Feature cache stats")
+    print("  - DELETE /admin/cache : Invalidate feature cache")
     print("="*70)
     print(f"\nSQL Database:   {SQL_API_URL}")
     print(f"NoSQL Database: {NOSQL_API_URL}")
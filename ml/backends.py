@@ -0,0 +1,115 @@
+"""Model backends for train_model_sampled.py
+
+  forest : RandomForestRegressor on a 50k-review sample (the original model),
+           served by the flattened forest engine (model_flat/)
+  hgb    : HistGradientBoostingRegressor on every review. Features are binned
+           into at most 255 buckets and the label-encoded columns are split
+           natively as categories, so training on the full dataset takes
+           about as long as the forest takes on the sample. Served from
+           model.pkl by sklearn (api.py falls back to it automatically).
+
+Each training run writes training_report_<backend>.json (training time,
+memory, model size, accuracy, per-row latency); when the other backend's
+report is present the two are printed side by side.
+"""
+import json
+import os
+import numpy as np
+
+BACKENDS = ('forest', 'hgb')
+DEFAULT_BACKEND = 'forest'
+
+# Training reviews per backend (None: all of them)
+SAMPLE_SIZES = {'forest': 50000, 'hgb': None}
+
+# HistGradientBoosting categorical features must have codes below max_bins
+MAX_CATEGORIES = 255
+
+HGB_PARAMS = {
+    'max_iter': 300,
+    'learning_rate': 0.1,
+    'max_leaf_nodes': 31,
+    'min_samples_leaf': 100,
+    'early_stopping': True,
+    'validation_fraction': 0.1,
+    'n_iter_no_change': 10,
+}
+
+REPORT_PATH = 'training_report_{backend}.json'
+
+
+def backend_option(argv):
+    backend = argv[argv.index('--backend') + 1] if '--backend' in argv else DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise SystemExit(f"Unknown --backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    return backend
+
+
+def native_categorical_features(X, columns):
+    """The encoded columns HistGradientBoosting can treat as categories;
+    a column with more than MAX_CATEGORIES labels stays numeric"""
+    return [col for col in columns if X[col].max() < MAX_CATEGORIES]
+
+
+def build_model(backend, X_train, categorical_columns=()):
+    if backend == 'hgb':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        categorical = native_categorical_features(X_train, categorical_columns)
+        numeric = sorted(set(categorical_columns) - set(categorical))
+        if numeric:
+            print(f"More than {MAX_CATEGORIES} labels, kept numeric: {', '.join(numeric)}")
+        return HistGradientBoostingRegressor(categorical_features=categorical or None,
+                                             random_state=42, **HGB_PARAMS)
+
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1)
+
+
+def model_size_mb(*paths):
+    """Total on-disk size of the given files / directories"""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return round(total / 1e6, 2)
+
+
+def write_report(report):
+    path = REPORT_PATH.format(backend=report['backend'])
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Training report written to {path}')
+    return path
+
+
+def print_comparison(report):
+    """Side-by-side table with the other backend's last report, if any"""
+    others = [b for b in BACKENDS if b != report['backend']
+              and os.path.exists(REPORT_PATH.format(backend=b))]
+    if not others:
+        return
+    with open(REPORT_PATH.format(backend=others[0])) as f:
+        other = json.load(f)
+
+    rows = [
+        ('training rows', lambda r: r['training_rows']),
+        ('train seconds', lambda r: r['train_seconds']),
+        ('pipeline seconds', lambda r: r['pipeline_seconds']),
+        ('peak RSS MB', lambda r: r['peak_rss_mb']),
+        ('model MB', lambda r: r['model_mb']),
+        ('test RMSE', lambda r: r['rmse']),
+        ('test R²', lambda r: r['r2']),
+        ('single row p50 ms', lambda r: r['latency']['single_row_ms']['p50']),
+        ('single row p99 ms', lambda r: r['latency']['single_row_ms']['p99']),
+        ('batch us/row', lambda r: r['latency']['batch_us_per_row']),
+    ]
+    left, right = other, report
+    print(f'\n{"":<20} {left["backend"] + " (" + left["engine"] + ")":>18} '
+          f'{right["backend"] + " (" + right["engine"] + ")":>18}')
+    for label, value in rows:
+        a, b = value(left), value(right)
+        a, b = (f'{v:.4g}' if isinstance(v, (float, np.floating)) else str(v) for v in (a, b))
+        print(f'{label:<20} {a:>18} {b:>18}')
@@ -0,0 +1,329 @@
+"""Reproducible inference benchmarks for the rating model and the prediction API
+
+Runs, with a fixed seed and fixed iteration counts:
+  - encode_single / encode_10k : feature assembly (encoder lookups) per row / per 10k rows
+  - model_predict_<n>          : model.predict on batches of 1, 10, 100 and 10,000 rows,
+                                 on the engine the API uses for that many rows
+  - make_prediction            : the single-row shared prediction path
+  - e2e_<backend>_predict[_cached] : POST /sql/predict, /nosql/predict and
+                                 /local/predict through the ASGI app, against
+                                 in-process stub upstreams (no sockets, no network),
+                                 with the feature cache off and warm; latency is
+                                 measured one request at a time, rps with
+                                 --concurrency requests in flight
+
+Each result reports p50/p95/p99/mean latency in ms and requests (or rows)
+per second. The model is loaded exactly as api.py loads it, so MODEL_ENGINE,
+FLAT_MODEL_PATH etc. apply; run from the directory holding the artifacts.
+
+Usage:
+    python3 benchmark.py [--output benchmark_results.json] [--concurrency 16] [--upstream-delay-ms 0]
+    python3 benchmark.py --compare baseline.json benchmark_results.json
+"""
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import numpy as np
+import httpx
+import api
+from features import CATEGORICAL_COLUMNS, build_feature_matrix
+
+SEED = 42
+WARMUP = 20
+SINGLE_ROW_ITERATIONS = 2000
+BATCH_SIZES = (1, 10, 100, 10000)
+E2E_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 16
+
+# Entity id ranges served by the stub upstreams
+N_PRODUCTS = 1000
+N_CUSTOMERS = 5000
+REVIEWS_PER_ENTITY = 20
+
+
+# ============================================================================
+# MEASUREMENT HELPERS
+# ============================================================================
+
+def summarize(timings, rows_per_call=1, wall_seconds=None):
+    """Latency percentiles (ms) and throughput for per-call timings (s)"""
+    timings = np.asarray(timings)
+    wall_seconds = wall_seconds if wall_seconds is not None else timings.sum()
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+    result = {
+        'n': len(timings),
+        'p50_ms': round(p50, 4),
+        'p95_ms': round(p95, 4),
+        'p99_ms': round(p99, 4),
+        'mean_ms': round(timings.mean() * 1000, 4),
+        'rps': round(len(timings) / wall_seconds, 1),
+    }
+    if rows_per_call > 1:
+        result['rows_per_call'] = rows_per_call
+        result['rows_per_second'] = round(len(timings) * rows_per_call / wall_seconds, 1)
+    return result
+
+
+def time_calls(fn, iterations, warmup=WARMUP):
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def iterations_for(rows):
+    """Fewer repetitions for large batches so every case takes similar time"""
+    return max(20, SINGLE_ROW_ITERATIONS // max(1, rows // 10))
+
+
+# ============================================================================
+# SYNTHETIC INPUTS (seeded)
+# ============================================================================
+
+def random_inputs(rng, n):
+    """Raw prediction inputs with labels drawn from the model's encoders"""
+    classes = {col: [str(c) for c in np.asarray(getattr(api.encoders[col], 'classes_', api.encoders[col]))]
+               for col in CATEGORICAL_COLUMNS}
+    inputs = []
+    for _ in range(n):
+        input_data = {
+            'price': float(rng.uniform(1, 1000)),
+            'mean_product_avg': float(rng.uniform(1, 5)),
+            'count_product_avg': int(rng.integers(0, 500)),
+            'mean_customer_avg': float(rng.uniform(1, 5)),
+            'count_customer_avg': int(rng.integers(0, 50)),
+        }
+        for col in CATEGORICAL_COLUMNS:
+            input_data[col] = classes[col][rng.integers(len(classes[col]))]
+        inputs.append(input_data)
+    return inputs
+
+
+def stub_entities(rng):
+    """Deterministic product/customer documents for the stub upstreams"""
+    inputs = random_inputs(rng, max(N_PRODUCTS, N_CUSTOMERS))
+    products = {
+        i: {'product_id': i, 'product_name': f'Product {i}', 'category': inputs[i]['category'],
+            'brand': inputs[i]['brand'], 'price': inputs[i]['price'], 'stock_quantity': 10}
+        for i in range(1, N_PRODUCTS + 1)
+    }
+    customers = {
+        i: {'customer_id': i, 'name': f'Customer {i}', 'email': f'c{i}@example.com',
+            'gender': inputs[i - 1]['gender'], 'country': inputs[i - 1]['country']}
+        for i in range(1, N_CUSTOMERS + 1)
+    }
+    return products, customers
+
+
+def stub_transport(products, customers, delay_seconds):
+    """httpx transport answering both the SQL and the NoSQL API routes"""
+    reviews = [{'rating': 1 + i % 5} for i in range(REVIEWS_PER_ENTITY)]
+    mean = sum(r['rating'] for r in reviews) / len(reviews)
+
+    async def handler(request):
+        if delay_seconds:
+            await asyncio.sleep(delay_seconds)
+        parts = request.url.path.strip('/').split('/')
+        entity_id = int(parts[-1])
+        if parts[0] == 'products':
+            doc = products.get(entity_id)
+            return httpx.Response(200, json=doc) if doc else httpx.Response(404)
+        if parts[0] == 'customers':
+            doc = customers.get(entity_id)
+            return httpx.Response(200, json=doc) if doc else httpx.Response(404)
+        # /reviews/stats/{product|customer}/{id} (SQL), /product-reviews/stats/... (NoSQL)
+        if parts[0] in ('reviews', 'product-reviews') and parts[1] == 'stats':
+            return httpx.Response(200, json={f'{parts[2]}_id': entity_id, 'mean_rating': mean,
+                                             'review_count': len(reviews)})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_encoding(rng):
+    single = random_inputs(rng, 1)
+    batch = random_inputs(rng, 10000)
+    return {
+        'encode_single': summarize(time_calls(lambda: build_feature_matrix(single, api.feature_plan),
+                                              SINGLE_ROW_ITERATIONS)),
+        'encode_10k': summarize(time_calls(lambda: build_feature_matrix(batch, api.feature_plan), 20),
+                                rows_per_call=len(batch)),
+    }
+
+
+def bench_model(rng):
+    results = {}
+    X_all = build_feature_matrix(random_inputs(rng, max(BATCH_SIZES)), api.feature_plan)
+    for rows in BATCH_SIZES:
+        X = X_all[:rows]
+        results[f'model_predict_{rows}'] = summarize(
+            time_calls(lambda: api.model_for(rows).predict(X), iterations_for(rows), warmup=min(WARMUP, 5)),
+            rows_per_call=rows
+        )
+    return results
+
+
+def bench_make_prediction(rng):
+    product = {'product_id': 1, 'product_name': 'Product 1', 'category': 'x', 'brand': 'x', 'price': 1.0}
+    customer = {'customer_id': 1, 'country': 'x', 'gender': 'x'}
+    input_data = random_inputs(rng, 1)[0]
+    product.update(category=input_data['category'], brand=input_data['brand'], price=input_data['price'])
+    customer.update(gender=input_data['gender'], country=input_data['country'])
+    return {'make_prediction': summarize(time_calls(
+        lambda: api.make_prediction(product, customer, (4.1, 120), (3.5, 8), 'SQL'),
+        SINGLE_ROW_ITERATIONS
+    ))}
+
+
+async def run_requests(client, path, payloads, concurrency):
+    """POST every payload with at most `concurrency` in flight; (timings, wall seconds)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = np.empty(len(payloads))
+
+    async def one(i, payload):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            timings[i] = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}: {response.text}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i, p) for i, p in enumerate(payloads)))
+    return timings, time.perf_counter() - started
+
+
+def set_feature_caches(enabled):
+    for caches in api.feature_caches.values():
+        for cache in caches.values():
+            cache.clear()
+            cache.max_size = api.FEATURE_CACHE_MAX_SIZE if enabled else 0
+
+
+async def bench_end_to_end(rng, concurrency, upstream_delay_ms):
+    products, customers = stub_entities(rng)
+    transport = stub_transport(products, customers, upstream_delay_ms / 1000)
+    api.http_clients['sql'] = httpx.AsyncClient(transport=transport, base_url='http://sql-stub')
+    api.http_clients['nosql'] = httpx.AsyncClient(transport=transport, base_url='http://nosql-stub')
+
+    payloads = [{'product_id': int(rng.integers(1, N_PRODUCTS + 1)),
+                 'customer_id': int(rng.integers(1, N_CUSTOMERS + 1))} for _ in range(E2E_REQUESTS)]
+    backends = ['sql', 'nosql'] + (['local'] if api.feature_snapshot is not None else [])
+    if api.feature_snapshot is not None:
+        # Local predictions need ids present in the snapshot
+        local_payloads = [{'product_id': int(rng.choice(api.feature_snapshot.product_id)),
+                           'customer_id': int(rng.choice(api.feature_snapshot.customer_id))}
+                          for _ in range(E2E_REQUESTS)]
+
+    results = {}
+    app_transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=app_transport, base_url='http://api') as client:
+        for backend in backends:
+            path = f'/{backend}/predict'
+            requests_ = local_payloads if backend == 'local' else payloads
+            for cached in ((False,) if backend == 'local' else (False, True)):
+                set_feature_caches(cached)
+                # With the cache on, a first pass leaves every entity cached (warm cache)
+                await run_requests(client, path, requests_ if cached else requests_[:WARMUP], 1)
+                name = f'e2e_{backend}_predict' + ('_cached' if cached else '')
+                # Latency from one request at a time; throughput with `concurrency` in flight
+                timings, _ = await run_requests(client, path, requests_, 1)
+                _, wall = await run_requests(client, path, requests_, concurrency)
+                results[name] = summarize(timings)
+                results[name]['rps'] = round(len(requests_) / wall, 1)
+                results[name]['concurrency'] = concurrency
+    set_feature_caches(True)
+    for client in api.http_clients.values():
+        await client.aclose()
+    return results
+
+
+def environment():
+    versions = {}
+    for module in ('numpy', 'sklearn', 'fastapi', 'httpx'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            pass
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+        'model': dict(api.model_status),
+        'seed': SEED,
+    }
+
+
+def run(concurrency=DEFAULT_CONCURRENCY, upstream_delay_ms=0.0):
+    # Per-request log lines would dominate the end-to-end timings
+    logging.getLogger('prediction_api').setLevel(logging.WARNING)
+    api.load_model()
+    api.load_batch_model()
+
+    results = {}
+    for bench in (bench_encoding, bench_model, bench_make_prediction):
+        print(f'Running {bench.__name__}...')
+        results.update(bench(np.random.default_rng(SEED)))
+    print('Running bench_end_to_end...')
+    results.update(asyncio.run(bench_end_to_end(np.random.default_rng(SEED), concurrency, upstream_delay_ms)))
+
+    report = {'environment': environment(),
+              'config': {'concurrency': concurrency, 'upstream_delay_ms': upstream_delay_ms,
+                         'e2e_requests': E2E_REQUESTS, 'single_row_iterations': SINGLE_ROW_ITERATIONS},
+              'results': results}
+    print_results(results)
+    return report
+
+
+def print_results(results):
+    print(f'\n{"benchmark":<30} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"rps":>10} {"rows/s":>12}')
+    for name, r in results.items():
+        rows = f"{r['rows_per_second']:12.0f}" if 'rows_per_second' in r else f'{"":>12}'
+        print(f"{name:<30} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {r['rps']:10.1f} {rows}")
+
+
+def compare(baseline_path, candidate_path):
+    """Print candidate/baseline ratios; p99 ratios above 1 are regressions"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    with open(candidate_path) as f:
+        candidate = json.load(f)['results']
+    print(f'{"benchmark":<30} {"p50 x":>8} {"p99 x":>8} {"rps x":>8}')
+    for name in baseline:
+        if name not in candidate:
+            continue
+        b, c = baseline[name], candidate[name]
+        print(f"{name:<30} {c['p50_ms'] / b['p50_ms']:8.2f} {c['p99_ms'] / b['p99_ms']:8.2f} "
+              f"{c['rps'] / b['rps']:8.2f}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--compare' in args:
+        i = args.index('--compare')
+        compare(args[i + 1], args[i + 2])
+        sys.exit(0)
+
+    def option(flag, default, cast):
+        return cast(args[args.index(flag) + 1]) if flag in args else default
+
+    output = option('--output', 'benchmark_results.json', str)
+    report = run(concurrency=option('--concurrency', DEFAULT_CONCURRENCY, int),
+                 upstream_delay_ms=option('--upstream-delay-ms', 0.0, float))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResults written to {output}')
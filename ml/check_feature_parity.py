@@ -0,0 +1,89 @@
+"""Parity check: fast feature assembly (features.py) vs the original
+DataFrame + LabelEncoder.transform encoding used by make_prediction.
+
+Every known label of every encoder is checked, plus empty, missing and
+unseen labels, then a randomized set of full rows is compared both as
+feature matrices and as model predictions. Exits non-zero on any mismatch.
+
+Usage:
+    python3 check_feature_parity.py [model.pkl]
+"""
+import sys
+import numpy as np
+import pandas as pd
+import joblib
+from features import FEATURES, CATEGORICAL_COLUMNS, build_feature_matrix, build_feature_plan
+
+EDGE_CASE_LABELS = ['', None, '__unseen__', float('nan'), 0]
+
+
+def reference_features(input_data, encoders):
+    """The original single-row encoding path, kept verbatim as the oracle"""
+    input_df = pd.DataFrame([input_data])
+    for col in CATEGORICAL_COLUMNS:
+        encoder = encoders[col]
+        if input_df[col].iloc[0] != '' and input_df[col].iloc[0] is not None:
+            try:
+                input_df[f'{col}_encoded'] = encoder.transform(input_df[col])
+            except ValueError:
+                input_df[f'{col}_encoded'] = 0
+        else:
+            input_df[f'{col}_encoded'] = 0
+    return input_df[FEATURES]
+
+
+def random_input(rng, encoders):
+    input_data = {
+        'price': float(rng.uniform(0, 1000)),
+        'mean_product_avg': float(rng.uniform(1, 5)),
+        'count_product_avg': int(rng.integers(0, 500)),
+        'mean_customer_avg': float(rng.uniform(1, 5)),
+        'count_customer_avg': int(rng.integers(0, 50)),
+    }
+    for col in CATEGORICAL_COLUMNS:
+        labels = encoders[col].classes_.tolist() + EDGE_CASE_LABELS
+        input_data[col] = labels[rng.integers(len(labels))]
+    return input_data
+
+
+def main(model_path='model.pkl', n_random=500):
+    model, encoders = joblib.load(model_path)
+    plan = build_feature_plan(encoders)
+    failures = 0
+
+    # 1. Every label of every encoder, one column at a time
+    base = {'price': 10.0, 'mean_product_avg': 3.0, 'count_product_avg': 0,
+            'mean_customer_avg': 3.0, 'count_customer_avg': 0,
+            'category': '', 'brand': '', 'gender': '', 'country': ''}
+    for col in CATEGORICAL_COLUMNS:
+        for label in encoders[col].classes_.tolist() + EDGE_CASE_LABELS:
+            input_data = dict(base, **{col: label})
+            expected = reference_features(input_data, encoders).to_numpy(dtype=np.float64)
+            actual = build_feature_matrix([input_data], plan)
+            if not np.array_equal(expected, actual):
+                failures += 1
+                print(f'MISMATCH {col}={label!r}: expected {expected[0]}, got {actual[0]}')
+
+    # 2. Random full rows: features and predictions
+    rng = np.random.default_rng(42)
+    inputs = [random_input(rng, encoders) for _ in range(n_random)]
+    expected = pd.concat([reference_features(i, encoders) for i in inputs], ignore_index=True)
+    actual = build_feature_matrix(inputs, plan)
+    row_mismatches = np.flatnonzero(~(expected.to_numpy(dtype=np.float64) == actual).all(axis=1))
+    for row in row_mismatches:
+        failures += 1
+        print(f'MISMATCH row {row}: {inputs[row]}')
+
+    expected_pred = model.predict(expected)
+    actual_pred = model.predict(pd.DataFrame(actual, columns=FEATURES))
+    if not np.array_equal(expected_pred, actual_pred):
+        failures += 1
+        print(f'MISMATCH predictions: max abs diff {np.abs(expected_pred - actual_pred).max()}')
+
+    checked = sum(len(encoders[c].classes_) + len(EDGE_CASE_LABELS) for c in CATEGORICAL_COLUMNS)
+    print(f'Checked {checked} single labels and {n_random} random rows: {failures} mismatches')
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(*sys.argv[1:2]) else 0)
@@ -0,0 +1,104 @@
+"""Content-addressed cache of the training feature frame
+
+Loading, sampling, merging and label-encoding the dataset gives the same
+result as long as the CSVs, the sampling parameters and the feature code
+are unchanged. The finished frame (model features + rating) is stored as
+uncompressed per-column .npy arrays in one .npz, the fitted encoders as
+their classes_ arrays, next to the feature snapshot and training state
+built from the same pass:
+
+  feature_frame_cache/<key>/frame.npz, encoders.npz,
+                            features_snapshot.npz, training_state.npz, meta.json
+
+The key hashes the content of the input files, the source of the modules
+that shape the frame (HASHED_MODULES, including train_model_sampled.py,
+which does the loading, merging and encoding itself) and the caller's
+parameters. meta.json is written last and marks an entry as complete.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = 'feature_frame_cache'
+
+# Older entries beyond this many are removed when a new one is written
+MAX_ENTRIES = 3
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+HASHED_MODULES = ('ingest.py', 'features.py', 'feature_snapshot.py', 'train_model_sampled.py')
+
+
+def _update_with_file(digest, path, block_size=1 << 20):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+
+def cache_key(input_paths, **params):
+    """Hex key over input file contents, HASHED_MODULES sources and `params`"""
+    digest = hashlib.sha256()
+    for path in input_paths:
+        digest.update(os.path.basename(path).encode())
+        _update_with_file(digest, path)
+    for module in HASHED_MODULES:
+        _update_with_file(digest, os.path.join(ML_DIR, module))
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+class FeatureFrameCache:
+    """One cache entry; path() locates extra artifacts stored alongside"""
+
+    def __init__(self, key, root=CACHE_DIR):
+        self.key = key
+        self.root = root
+        self.dir = os.path.join(root, key)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    @property
+    def complete(self):
+        return os.path.exists(self.path('meta.json'))
+
+    def prepare(self):
+        """Start a fresh entry (discarding any incomplete one)"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir)
+
+    def save(self, frame, encoders):
+        np.savez(self.path('frame.npz'), **{col: frame[col].to_numpy() for col in frame.columns})
+        np.savez(self.path('encoders.npz'),
+                 **{col: np.asarray(getattr(enc, 'classes_', enc)).astype(str) for col, enc in encoders.items()})
+        meta = {'key': self.key, 'columns': list(frame.columns), 'rows': len(frame),
+                'encoders': list(encoders), 'created_at': time.time()}
+        with open(self.path('meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        self._prune()
+
+    def load(self):
+        """(frame DataFrame, {column: fitted LabelEncoder})"""
+        from sklearn.preprocessing import LabelEncoder
+
+        with open(self.path('meta.json')) as f:
+            meta = json.load(f)
+        with np.load(self.path('frame.npz'), allow_pickle=False) as data:
+            frame = pd.DataFrame({col: data[col] for col in meta['columns']})
+        encoders = {}
+        with np.load(self.path('encoders.npz'), allow_pickle=False) as data:
+            for col in meta['encoders']:
+                encoder = LabelEncoder()
+                encoder.classes_ = data[col].astype(object)  # as fitted on string columns
+                encoders[col] = encoder
+        return frame, encoders
+
+    def _prune(self):
+        entries = [os.path.join(self.root, name) for name in os.listdir(self.root)]
+        entries = [e for e in entries if os.path.exists(os.path.join(e, 'meta.json'))]
+        entries.sort(key=lambda e: os.path.getmtime(os.path.join(e, 'meta.json')), reverse=True)
+        for stale in entries[MAX_ENTRIES:]:
+            shutil.rmtree(stale, ignore_errors=True)
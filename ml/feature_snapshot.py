@@ -0,0 +1,196 @@
+"""Columnar per-product / per-customer feature snapshot for zero-network predictions
+
+train_model_sampled.py already holds every product and customer attribute
+plus the full-dataset rating aggregates; write_snapshot() stores them as one
+uncompressed .npz of flat columns sorted by id:
+
+  product_id, product_name, product_price, product_mean_rating, product_review_count,
+  product_category_codes / product_category_vocab, product_brand_codes / product_brand_vocab,
+  customer_id, customer_mean_rating, customer_review_count,
+  customer_gender_codes / customer_gender_vocab, customer_country_codes / customer_country_vocab
+
+String columns with few distinct values are stored as int32 codes into a
+vocab array (code -1 = missing). Entities without reviews have a NaN mean and
+a count of 0. Lookups are a binary search over the sorted id column.
+"""
+import numpy as np
+from features import encode_label
+
+SNAPSHOT_PATH = 'features_snapshot.npz'
+
+PRODUCT_CODED_COLUMNS = ('category', 'brand')
+CUSTOMER_CODED_COLUMNS = ('gender', 'country')
+
+# Neutral rating stats for entities without reviews (as in the prediction API)
+DEFAULT_MEAN_RATING = 3.0
+
+
+def _coded(values):
+    """(int32 codes, unicode vocab) for a pandas Series; missing -> -1"""
+    import pandas as pd
+
+    codes, vocab = pd.factorize(values)
+    return codes.astype(np.int32), np.asarray(vocab, dtype=str)
+
+
+def write_snapshot(path, products_df, customers_df, product_avg_ratings, customer_avg_ratings):
+    """Write the snapshot from the training DataFrames (see module docstring)"""
+    products = products_df.merge(product_avg_ratings, on='product_id', how='left').sort_values('product_id')
+    customers = customers_df.merge(customer_avg_ratings, on='customer_id', how='left').sort_values('customer_id')
+
+    columns = {
+        'product_id': products['product_id'].to_numpy(np.int64),
+        'product_name': products['product_name'].fillna('').to_numpy(str),
+        'product_price': products['price'].to_numpy(np.float64),
+        'product_mean_rating': products['mean_product_avg'].to_numpy(np.float64),
+        'product_review_count': products['count_product_avg'].fillna(0).to_numpy(np.int32),
+        'customer_id': customers['customer_id'].to_numpy(np.int64),
+        'customer_mean_rating': customers['mean_customer_avg'].to_numpy(np.float64),
+        'customer_review_count': customers['count_customer_avg'].fillna(0).to_numpy(np.int32),
+    }
+    for col in PRODUCT_CODED_COLUMNS:
+        columns[f'product_{col}_codes'], columns[f'product_{col}_vocab'] = _coded(products[col])
+    for col in CUSTOMER_CODED_COLUMNS:
+        columns[f'customer_{col}_codes'], columns[f'customer_{col}_vocab'] = _coded(customers[col])
+
+    np.savez(path, **columns)
+    size_mb = sum(a.nbytes for a in columns.values()) / 1e6
+    print(f'Feature snapshot saved to {path}: {len(products)} products, '
+          f'{len(customers)} customers ({size_mb:.1f} MB)')
+
+
+def _decode(codes, vocab, index):
+    code = codes[index]
+    return str(vocab[code]) if code >= 0 else ''
+
+
+def _stats(means, counts, index):
+    count = int(counts[index])
+    return (float(means[index]), count) if count else (None, 0)
+
+
+def snapshot_rows(ids, snapshot_ids):
+    """Row index of each id in the sorted snapshot id column, or -1"""
+    rows = np.searchsorted(snapshot_ids, ids)
+    found = rows < len(snapshot_ids)
+    found[found] = snapshot_ids[rows[found]] == ids[found]
+    return np.where(found, rows, -1)
+
+
+class FeatureSnapshot:
+    """Memory-resident snapshot with O(log n) lookups by product_id / customer_id"""
+
+    def __init__(self, columns):
+        for name, values in columns.items():
+            setattr(self, name, values)
+        self._encoded_vocabs = {}
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    @property
+    def n_products(self):
+        return len(self.product_id)
+
+    @property
+    def n_customers(self):
+        return len(self.customer_id)
+
+    @staticmethod
+    def _find(ids, key):
+        """Row index of `key` in the sorted id column, or -1"""
+        index = int(np.searchsorted(ids, key))
+        return index if index < len(ids) and ids[index] == key else -1
+
+    def product_index(self, product_id):
+        return self._find(self.product_id, product_id)
+
+    def customer_index(self, customer_id):
+        return self._find(self.customer_id, customer_id)
+
+    def product(self, product_id):
+        """(product dict, (mean, count) rating stats), or None if unknown"""
+        i = self.product_index(product_id)
+        if i < 0:
+            return None
+        product = {
+            'product_id': int(self.product_id[i]),
+            'product_name': str(self.product_name[i]),
+            'price': float(self.product_price[i]),
+            'category': _decode(self.product_category_codes, self.product_category_vocab, i),
+            'brand': _decode(self.product_brand_codes, self.product_brand_vocab, i),
+        }
+        return product, _stats(self.product_mean_rating, self.product_review_count, i)
+
+    def customer(self, customer_id):
+        """(customer dict, (mean, count) rating stats), or None if unknown"""
+        i = self.customer_index(customer_id)
+        if i < 0:
+            return None
+        customer = {
+            'customer_id': int(self.customer_id[i]),
+            'gender': _decode(self.customer_gender_codes, self.customer_gender_vocab, i),
+            'country': _decode(self.customer_country_codes, self.customer_country_vocab, i),
+        }
+        return customer, _stats(self.customer_mean_rating, self.customer_review_count, i)
+
+    def _encoded(self, entity, col, lookup, rows):
+        """Model codes of `col` for snapshot rows; missing/unseen labels -> 0"""
+        key = (entity, col, id(lookup))
+        vocab_codes = self._encoded_vocabs.get(key)
+        if vocab_codes is None:
+            vocab = getattr(self, f'{entity}_{col}_vocab').tolist()
+            # Trailing 0 is picked up by the -1 "missing" code
+            vocab_codes = np.array([encode_label(lookup, label) for label in vocab] + [0], dtype=np.float64)
+            self._encoded_vocabs[key] = vocab_codes
+        return vocab_codes[getattr(self, f'{entity}_{col}_codes')[rows]]
+
+    @staticmethod
+    def _resolved_stats(means, counts, rows):
+        """(mean, count) columns with the neutral default for unreviewed rows"""
+        counts = counts[rows].astype(np.float64)
+        means = means[rows]
+        reviewed = (counts > 0) & ~np.isnan(means)
+        return np.where(reviewed, means, DEFAULT_MEAN_RATING), np.where(reviewed, counts, 0.0)
+
+    def feature_matrix(self, product_rows, customer_rows, plan):
+        """Model feature matrix for parallel arrays of product/customer row
+        indices (scalars broadcast), built column by column in `plan` order.
+
+        Produces the same values as features.build_feature_matrix on the
+        dicts returned by product()/customer().
+        """
+        product_rows = np.asarray(product_rows)
+        customer_rows = np.asarray(customer_rows)
+        n_rows = np.broadcast(product_rows, customer_rows).size
+
+        product_mean, product_count = self._resolved_stats(
+            self.product_mean_rating, self.product_review_count, product_rows)
+        customer_mean, customer_count = self._resolved_stats(
+            self.customer_mean_rating, self.customer_review_count, customer_rows)
+        numeric = {
+            'price': self.product_price[product_rows],
+            'mean_product_avg': product_mean,
+            'count_product_avg': product_count,
+            'mean_customer_avg': customer_mean,
+            'count_customer_avg': customer_count,
+        }
+
+        matrix = np.empty((n_rows, len(plan)), dtype=np.float64)
+        for position, (col, lookup) in enumerate(plan):
+            if lookup is None:
+                matrix[:, position] = numeric[col]
+            elif col in PRODUCT_CODED_COLUMNS:
+                matrix[:, position] = self._encoded('product', col, lookup, product_rows)
+            else:
+                matrix[:, position] = self._encoded('customer', col, lookup, customer_rows)
+        return matrix
+
+    def product_rows_in_category(self, category):
+        """Row indices of all products in `category` (empty if unknown)"""
+        matches = np.flatnonzero(self.product_category_vocab == category)
+        if not matches.size:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.product_category_codes == matches[0])
@@ -0,0 +1,73 @@
+"""Feature assembly shared by the prediction API and offline tools
+
+Encoding goes through plain dict lookups precomputed from each
+LabelEncoder's classes_, so building a row needs no pandas DataFrame and no
+LabelEncoder.transform call. Empty, missing and unseen labels encode to 0,
+exactly like the original per-request encoding.
+"""
+import numpy as np
+
+# Feature order used at training time
+FEATURES = ['price', 'category_encoded', 'brand_encoded', 'gender_encoded',
+            'country_encoded', 'mean_product_avg', 'count_product_avg',
+            'mean_customer_avg', 'count_customer_avg']
+
+CATEGORICAL_COLUMNS = ['category', 'brand', 'gender', 'country']
+
+# (model, encoders) pickle written by train_model_sampled.py
+MODEL_PATH = 'model.pkl'
+
+
+def round_rating(ratings):
+    """Predicted ratings rounded to 2 decimals as returned to clients
+
+    Used for single predictions and whole arrays alike: np.round and
+    Python's round() disagree on some .xx5 ties, so the API and offline
+    scoring must not mix them.
+    """
+    return np.round(ratings, 2)
+
+
+def build_encoder_lookups(encoders):
+    """label -> code dict for each categorical column
+
+    `encoders` maps column -> fitted LabelEncoder, or directly to its
+    classes_ array (as stored in the flat model artifact).
+    """
+    lookups = {}
+    for col in CATEGORICAL_COLUMNS:
+        classes = getattr(encoders[col], 'classes_', encoders[col])
+        lookup = {label: code for code, label in enumerate(np.asarray(classes).tolist())}
+        lookup.pop('', None)  # empty labels always encode to 0
+        lookups[col] = lookup
+    return lookups
+
+
+def build_feature_plan(encoders):
+    """(input column, lookup or None) for every entry of FEATURES, in order"""
+    lookups = build_encoder_lookups(encoders)
+    plan = []
+    for feature in FEATURES:
+        col = feature[:-len('_encoded')] if feature.endswith('_encoded') else feature
+        plan.append((col, lookups.get(col) if col in CATEGORICAL_COLUMNS else None))
+    return plan
+
+
+def encode_label(lookup, value):
+    """Code for `value`, or 0 when it is empty, missing, unseen or unhashable"""
+    try:
+        return lookup.get(value, 0)
+    except TypeError:
+        return 0
+
+
+def build_feature_matrix(inputs, plan):
+    """Fill a preallocated (n_rows, n_features) float64 matrix from raw
+    input dicts (price, category, brand, gender, country and rating stats)"""
+    matrix = np.empty((len(inputs), len(plan)), dtype=np.float64)
+    for row, input_data in enumerate(inputs):
+        matrix[row] = [
+            input_data[col] if lookup is None else encode_label(lookup, input_data[col])
+            for col, lookup in plan
+        ]
+    return matrix
@@ -0,0 +1,272 @@
+"""Array-backed inference engine for the trained RandomForestRegressor
+
+All trees of the forest are flattened into one set of contiguous NumPy
+arrays (feature, threshold, children, value), with leaves pointing back
+at themselves. Prediction walks every unfinished (row, tree) pair one level
+per step with vectorized gathers, so a single row costs a few dozen small
+NumPy operations instead of sklearn's per-call validation and thread
+dispatch.
+
+The exported artifact is a directory of uncompressed .npy files plus a
+meta.json. load_flat_model() memory-maps the arrays, so loading is nearly
+instant, worker processes share the same page-cache pages, and neither
+pickle, joblib nor sklearn is needed to serve.
+
+Export an existing model and compare it with sklearn:
+    python3 flat_forest.py                       # model.pkl -> model_flat/
+    python3 flat_forest.py model.pkl model_flat --benchmark
+"""
+import json
+import os
+import sys
+import time
+import numpy as np
+
+FLAT_MODEL_PATH = 'model_flat'
+
+# Bumped whenever the on-disk layout of the artifact directory changes
+FLAT_FORMAT_VERSION = 1
+
+# Node arrays persisted as <name>.npy
+NODE_ARRAYS = ('feature', 'threshold', 'children', 'is_leaf', 'value', 'missing_go_to_left', 'roots')
+
+# Rows traversed together; bounds the (rows x trees) node-index working set
+CHUNK_SIZE = 8192
+
+# Traversal steps between removing finished (row, tree) pairs
+COMPACT_EVERY = 4
+
+
+class FlatForest:
+    """Drop-in replacement for RandomForestRegressor.predict
+
+    children holds each node's [left, right] child ids interleaved, so one
+    gather picks the next node; is_leaf marks the self-looping leaves.
+    """
+
+    def __init__(self, feature, threshold, children, is_leaf, value, missing_go_to_left,
+                 roots, max_depth, n_features_in_, feature_names_in_=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.missing_go_to_left = missing_go_to_left
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features_in_
+        if feature_names_in_ is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in_, dtype=object)
+
+    @property
+    def left(self):
+        return self.children[0::2]
+
+    @property
+    def right(self):
+        return self.children[1::2]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted single-output RandomForestRegressor"""
+        features, thresholds, lefts, rights, values, missing_lefts, roots = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so finished pairs can keep
+            # stepping harmlessly; their feature/threshold are never decisive
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            missing_lefts.append(
+                np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)), dtype=bool)
+            )
+            roots.append(offset)
+            offset += tree.node_count
+
+        index_dtype = np.int32 if 2 * offset < np.iinfo(np.int32).max else np.int64
+        left = np.concatenate(lefts).astype(index_dtype)
+        children = np.empty(2 * offset, dtype=index_dtype)
+        children[0::2] = left
+        children[1::2] = np.concatenate(rights)
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=children,
+            is_leaf=left == np.arange(offset, dtype=index_dtype),
+            value=np.concatenate(values).astype(np.float64),
+            missing_go_to_left=np.concatenate(missing_lefts),
+            roots=np.asarray(roots, dtype=index_dtype),
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+            n_features_in_=model.n_features_in_,
+            feature_names_in_=getattr(model, 'feature_names_in_', None)
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.value)
+
+    def apply(self, X):
+        """Leaf node index per (row, tree); X must already be float32"""
+        n_rows, n_trees = X.shape[0], len(self.roots)
+        x_flat = X.ravel()
+        has_missing = np.isnan(x_flat).any()
+
+        # One slot per (row, tree) pair; `active` holds slots not yet at a leaf
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        active = np.arange(nodes.size)
+        current, offsets = nodes, row_offsets
+        for step in range(1, self.max_depth + 1):
+            x = x_flat[offsets + self.feature[current]]
+            # Same test as sklearn: float32 input against the float64 threshold
+            go_right = ~(x <= self.threshold[current])
+            if has_missing:
+                missing = np.isnan(x)
+                go_right[missing] = ~self.missing_go_to_left[current[missing]]
+            current = self.children[2 * current + go_right]
+
+            # Finished pairs keep stepping on their self-looping leaf; drop
+            # them from the working set every few steps
+            if step % COMPACT_EVERY == 0 or step == self.max_depth:
+                nodes[active] = current
+                live = ~self.is_leaf[current]
+                if live.all():
+                    continue
+                active = active[live]
+                if not active.size:
+                    break
+                current, offsets = current[live], offsets[live]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict(self, X):
+        """Mean leaf value over all trees for each row of X"""
+        # sklearn evaluates trees on float32 input; do the same for identical splits
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[0] <= CHUNK_SIZE:
+            return self.value[self.apply(X)].mean(axis=1)
+        return np.concatenate([
+            self.value[self.apply(X[start:start + CHUNK_SIZE])].mean(axis=1)
+            for start in range(0, X.shape[0], CHUNK_SIZE)
+        ])
+
+
+def save_flat_model(flat_model, encoders, flat_path=FLAT_MODEL_PATH):
+    """Write the forest and the encoders' classes_ as an artifact directory"""
+    os.makedirs(flat_path, exist_ok=True)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(flat_path, f'{name}.npy'), getattr(flat_model, name))
+    for col, encoder in encoders.items():
+        classes = np.asarray(getattr(encoder, 'classes_', encoder)).astype(str)
+        np.save(os.path.join(flat_path, f'classes_{col}.npy'), classes)
+
+    names = getattr(flat_model, 'feature_names_in_', None)
+    meta = {
+        'format_version': FLAT_FORMAT_VERSION,
+        'max_depth': int(flat_model.max_depth),
+        'n_features_in_': int(flat_model.n_features_in_),
+        'feature_names_in_': None if names is None else [str(n) for n in names],
+        'encoders': list(encoders)
+    }
+    with open(os.path.join(flat_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_flat_model(flat_path=FLAT_MODEL_PATH, mmap_mode='r'):
+    """Load (FlatForest, {column: classes array}) from an artifact directory
+
+    With mmap_mode='r' the node arrays are read-only memory maps: nothing is
+    copied or decompressed up front and pages are shared between processes.
+    The classes arrays stand in for the LabelEncoders (see features.py).
+    """
+    with open(os.path.join(flat_path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['format_version'] != FLAT_FORMAT_VERSION:
+        raise ValueError(f"{flat_path} has format version {meta['format_version']}, "
+                         f"expected {FLAT_FORMAT_VERSION}; re-export it with flat_forest.py")
+
+    # np.asarray drops the np.memmap subclass (whose per-index bookkeeping
+    # costs more than the traversal itself) but keeps viewing the same pages
+    arrays = {
+        name: np.asarray(np.load(os.path.join(flat_path, f'{name}.npy'), mmap_mode=mmap_mode))
+        for name in NODE_ARRAYS
+    }
+    flat_model = FlatForest(
+        **arrays,
+        max_depth=meta['max_depth'],
+        n_features_in_=meta['n_features_in_'],
+        feature_names_in_=meta['feature_names_in_']
+    )
+    encoders = {
+        col: np.load(os.path.join(flat_path, f'classes_{col}.npy'))
+        for col in meta['encoders']
+    }
+    return flat_model, encoders
+
+
+def export_flat_model(model_path='model.pkl', flat_path=FLAT_MODEL_PATH):
+    """Flatten the sklearn artifact into an artifact directory next to it"""
+    import joblib
+
+    model, encoders = joblib.load(model_path)
+    flat_model = FlatForest.from_sklearn(model)
+    save_flat_model(flat_model, encoders, flat_path)
+    print(f'Flattened {flat_model.n_estimators} trees ({flat_model.node_count} nodes) '
+          f'from {model_path} into {flat_path}/')
+    return flat_model
+
+
+def benchmark(model, flat_model, X, repeats=200):
+    """Agreement and per-row latency of sklearn vs the flat engine"""
+    expected = model.predict(X)
+    actual = flat_model.predict(X)
+    print(f'Max abs difference over {len(X)} rows: {np.abs(expected - actual).max():.3e}')
+
+    single_row = X[:1]
+    results = {}
+    for name, predict in (('sklearn', model.predict), ('flat', flat_model.predict)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predict(single_row)
+        single = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        predict(X)
+        batch = (time.perf_counter() - start) / len(X)
+        results[name] = (single, batch)
+        print(f'{name:>8}: single row {single * 1e6:10.1f} us | batch {batch * 1e6:8.2f} us/row')
+
+    print(f' speedup: single row {results["sklearn"][0] / results["flat"][0]:.1f}x | '
+          f'batch {results["sklearn"][1] / results["flat"][1]:.1f}x')
+    return results
+
+
+if __name__ == '__main__':
+    import joblib
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    model_path = args[0] if args else 'model.pkl'
+    flat_path = args[1] if len(args) > 1 else FLAT_MODEL_PATH
+    export_flat_model(model_path, flat_path)
+
+    if '--benchmark' in sys.argv:
+        flat_model, _ = load_flat_model(flat_path)
+        import warnings
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        model, _ = joblib.load(model_path)
+        rng = np.random.default_rng(42)
+        low = np.zeros(model.n_features_in_)
+        high = np.array([1000, 20, 50, 3, 50, 5, 500, 5, 50], dtype=np.float64)[:model.n_features_in_]
+        X = rng.uniform(low, high, size=(10000, model.n_features_in_))
+        benchmark(model, flat_model, X)
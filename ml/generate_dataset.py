@@ -0,0 +1,342 @@
+"""Scalable synthetic e-commerce dataset generator
+
+Writes customers, products, orders, order_items and product_reviews with the
+columns of sql_api/app/models.py and nosql/models.py, as CSV (default, the
+layout train_model_sampled.py reads) or Parquet:
+
+  <output>/customers.csv, products.csv, orders.csv, order_items.csv, product_reviews.csv
+  (Parquet: <output>/<table>.parquet/part-NNNNN.parquet)
+
+Generation is vectorized with NumPy and split into chunks of --chunk-size
+rows that run in parallel worker processes; each worker writes its chunk as
+a part file, so memory is bounded by the chunk size, not the dataset size.
+Every chunk draws from its own generator seeded by (seed, table, chunk),
+so the output is identical for any number of workers.
+
+Foreign keys are valid by construction: ids are 1..N per table, reviews and
+orders reference customers/products in range, every order item references
+an existing order and product, and orders.total_amount is the sum of its
+items. Ratings depend on a per-product quality and a per-customer bias (plus
+noise), and product popularity is Zipf-like, so the data has learnable signal.
+
+Usage:
+    python3 generate_dataset.py [--customers 2000000] [--products 20000] [--orders 1000000]
+        [--reviews 4000000] [--seed 42] [--workers N] [--chunk-size 1000000]
+        [--format csv|parquet] [--output dataset]
+"""
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+DEFAULT_COUNTS = {'customers': 2_000_000, 'products': 20_000, 'orders': 1_000_000, 'reviews': 4_000_000}
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 1_000_000
+TABLES = ('customers', 'products', 'orders', 'order_items', 'product_reviews')
+
+# Stable per-table stream ids for the chunk seeds
+TABLE_STREAMS = {'customers': 1, 'products': 2, 'orders': 3, 'product_reviews': 4, 'attributes': 5}
+
+GENDERS = np.array(['Male', 'Female', 'Other'])
+GENDER_WEIGHTS = [0.48, 0.48, 0.04]
+COUNTRIES = np.array(['Rwanda', 'Kenya', 'Uganda', 'Tanzania', 'Nigeria', 'Ghana', 'South Africa',
+                      'USA', 'Canada', 'UK', 'Germany', 'France', 'India', 'Brazil', 'Turkey'])
+CATEGORIES = np.array(['Electronics', 'Books', 'Clothing', 'Home & Kitchen', 'Sports', 'Toys',
+                       'Beauty', 'Grocery', 'Automotive', 'Garden'])
+# Typical price range per category (log-normal around the median)
+CATEGORY_MEDIAN_PRICE = np.array([250, 20, 40, 60, 50, 30, 25, 10, 80, 45], dtype=np.float64)
+BRANDS = np.array([f'{prefix}{suffix}' for prefix in ('Nova', 'Zen', 'Apex', 'Luma', 'Terra', 'Orbit', 'Kivu', 'Sava')
+                   for suffix in ('', 'Tech', 'Home', 'Pro', 'Co')])
+FIRST_NAMES = np.array(['Alice', 'Jean', 'Grace', 'Eric', 'Aline', 'David', 'Sarah', 'Patrick', 'Diane',
+                        'Samuel', 'Claire', 'Emmanuel', 'Ange', 'Kevin', 'Olivia', 'Yves', 'Mary', 'James'])
+LAST_NAMES = np.array(['Uwase', 'Mugisha', 'Niyonsaba', 'Habimana', 'Ingabire', 'Smith', 'Johnson',
+                       'Okafor', 'Mensah', 'Kamau', 'Otieno', 'Muller', 'Martin', 'Patel', 'Silva'])
+ADJECTIVES = np.array(['Smart', 'Classic', 'Ultra', 'Eco', 'Compact', 'Deluxe', 'Essential', 'Portable'])
+PAYMENT_METHODS = np.array(['Credit Card', 'Debit Card', 'PayPal', 'Mobile Money', 'Bank Transfer'])
+PAYMENT_WEIGHTS = [0.35, 0.2, 0.15, 0.2, 0.1]
+REVIEW_TEXTS = np.array([
+    ['Terrible, broke after a day.', 'Very disappointed.', 'Would not buy again.'],
+    ['Below expectations.', 'Not great for the price.', 'Quality could be better.'],
+    ['It is okay.', 'Average product.', 'Does the job.'],
+    ['Good value for money.', 'Works well.', 'Happy with this purchase.'],
+    ['Excellent!', 'Absolutely love it.', 'Best purchase this year.'],
+])
+
+# Dates are drawn as days since DATE_ORIGIN
+DATE_ORIGIN = np.datetime64('2020-01-01')
+SIGNUP_DAYS = 4 * 365          # signups 2020-2023
+ACTIVITY_END_DAYS = 6 * 365    # orders and reviews until end of 2025
+
+MAX_ITEMS_PER_ORDER = 5
+ZIPF_EXPONENT = 0.8
+
+# Per-entity attributes shared with the workers (set by _init_worker)
+_attrs = {}
+
+
+# ============================================================================
+# SHARED ATTRIBUTES
+# ============================================================================
+
+def entity_attributes(counts, seed):
+    """Per-customer and per-product numeric attributes that several tables
+    depend on (drawn once, in the parent, then shared with the workers)"""
+    rng = np.random.default_rng([seed, TABLE_STREAMS['attributes']])
+    n_customers, n_products = counts['customers'], counts['products']
+    category = rng.integers(len(CATEGORIES), size=n_products).astype(np.int16)
+    price = np.round(CATEGORY_MEDIAN_PRICE[category] * rng.lognormal(0, 0.6, n_products), 2)
+    # Zipf-like popularity over a random permutation of products
+    weights = 1.0 / np.arange(1, n_products + 1) ** ZIPF_EXPONENT
+    popularity_cdf = np.cumsum(rng.permutation(weights))
+    return {
+        'n_customers': n_customers,
+        'n_products': n_products,
+        'customer_country': rng.choice(len(COUNTRIES), n_customers).astype(np.int16),
+        'customer_signup': rng.integers(SIGNUP_DAYS, size=n_customers).astype(np.int32),
+        'customer_bias': rng.normal(0, 0.5, n_customers).astype(np.float32),
+        'product_category': category,
+        'product_price': price,
+        'product_quality': rng.normal(0, 0.8, n_products).astype(np.float32),
+        'popularity_cdf': popularity_cdf / popularity_cdf[-1],
+    }
+
+
+def order_item_counts(counts, seed, chunk_size):
+    """Items per order for every order chunk; drawn up front so each chunk
+    knows its first order_item_id without waiting for the previous chunks"""
+    per_chunk = []
+    for chunk, (start, stop) in enumerate(chunk_bounds(counts['orders'], chunk_size)):
+        rng = np.random.default_rng([seed, TABLE_STREAMS['orders'], chunk, 0])
+        per_chunk.append(1 + rng.binomial(MAX_ITEMS_PER_ORDER - 1, 0.3, stop - start))
+    return per_chunk
+
+
+def _init_worker(attrs):
+    _attrs.update(attrs)
+
+
+# ============================================================================
+# TABLE CHUNKS
+# ============================================================================
+
+def chunk_bounds(n_rows, chunk_size):
+    return [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+
+
+def _dates(days):
+    return (DATE_ORIGIN + days.astype('timedelta64[D]')).astype(str)
+
+
+def _popular_products(rng, n):
+    return np.searchsorted(_attrs['popularity_cdf'], rng.random(n), side='right').clip(
+        max=_attrs['n_products'] - 1) + 1
+
+
+def _activity_days(rng, customer_ids):
+    """Days after each customer's signup, within the activity window"""
+    signup = _attrs['customer_signup'][customer_ids - 1]
+    return signup + (rng.random(len(customer_ids)) * (ACTIVITY_END_DAYS - signup)).astype(np.int32)
+
+
+def customers_chunk(rng, start, stop):
+    ids = np.arange(start + 1, stop + 1)
+    first = rng.integers(len(FIRST_NAMES), size=len(ids))
+    last = rng.integers(len(LAST_NAMES), size=len(ids))
+    return pd.DataFrame({
+        'customer_id': ids,
+        'name': FIRST_NAMES.astype(object)[first] + ' ' + LAST_NAMES.astype(object)[last],
+        # The id makes every email unique
+        'email': (np.char.lower(FIRST_NAMES).astype(object)[first] + '.'
+                  + np.char.lower(LAST_NAMES).astype(object)[last] + ids.astype(str).astype(object)
+                  + '@example.com'),
+        'gender': GENDERS[rng.choice(len(GENDERS), len(ids), p=GENDER_WEIGHTS)],
+        'signup_date': _dates(_attrs['customer_signup'][start:stop]),
+        'country': COUNTRIES[_attrs['customer_country'][start:stop]],
+    })
+
+
+def products_chunk(rng, start, stop):
+    ids = np.arange(start + 1, stop + 1)
+    category = _attrs['product_category'][start:stop]
+    brand = BRANDS[rng.integers(len(BRANDS), size=len(ids))]
+    return pd.DataFrame({
+        'product_id': ids,
+        'product_name': (brand.astype(object) + ' ' + ADJECTIVES[rng.integers(len(ADJECTIVES), size=len(ids))]
+                         + ' ' + CATEGORIES[category].astype(object) + ' ' + ids.astype(str).astype(object)),
+        'category': CATEGORIES[category],
+        'price': _attrs['product_price'][start:stop],
+        'stock_quantity': rng.integers(0, 500, len(ids)),
+        'brand': brand,
+    })
+
+
+def orders_chunk(rng, start, stop, items_per_order, first_item_id):
+    """(orders, order_items) for orders start+1..stop"""
+    order_ids = np.arange(start + 1, stop + 1)
+    customer_ids = rng.integers(1, _attrs['n_customers'] + 1, len(order_ids))
+
+    item_order_ids = np.repeat(order_ids, items_per_order)
+    product_ids = _popular_products(rng, len(item_order_ids))
+    quantity = 1 + rng.binomial(4, 0.15, len(item_order_ids))
+    unit_price = _attrs['product_price'][product_ids - 1]
+    totals = np.bincount(item_order_ids - start - 1, weights=quantity * unit_price, minlength=len(order_ids))
+
+    # Mostly shipped to the customer's own country
+    shipping = _attrs['customer_country'][customer_ids - 1].copy()
+    abroad = rng.random(len(order_ids)) < 0.1
+    shipping[abroad] = rng.integers(len(COUNTRIES), size=int(abroad.sum()))
+
+    orders = pd.DataFrame({
+        'order_id': order_ids,
+        'customer_id': customer_ids,
+        'order_date': _dates(_activity_days(rng, customer_ids)),
+        'total_amount': np.round(totals, 2),
+        'payment_method': PAYMENT_METHODS[rng.choice(len(PAYMENT_METHODS), len(order_ids), p=PAYMENT_WEIGHTS)],
+        'shipping_country': COUNTRIES[shipping],
+    })
+    items = pd.DataFrame({
+        'order_item_id': np.arange(first_item_id, first_item_id + len(item_order_ids)),
+        'order_id': item_order_ids,
+        'product_id': product_ids,
+        'quantity': quantity,
+        'unit_price': unit_price,
+    })
+    return orders, items
+
+
+def reviews_chunk(rng, start, stop):
+    ids = np.arange(start + 1, stop + 1)
+    product_ids = _popular_products(rng, len(ids))
+    customer_ids = rng.integers(1, _attrs['n_customers'] + 1, len(ids))
+    latent = (3.4 + _attrs['product_quality'][product_ids - 1] + _attrs['customer_bias'][customer_ids - 1]
+              + rng.normal(0, 0.9, len(ids)))
+    rating = np.clip(np.rint(latent), 1, 5).astype(np.int8)
+    text = REVIEW_TEXTS[rating - 1, rng.integers(REVIEW_TEXTS.shape[1], size=len(ids))]
+    return pd.DataFrame({
+        'review_id': ids,
+        'product_id': product_ids,
+        'customer_id': customer_ids,
+        'rating': rating,
+        'review_text': text,
+        'review_date': _dates(_activity_days(rng, customer_ids)),
+    })
+
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def part_path(output, fmt, table, chunk):
+    if fmt == 'parquet':
+        return os.path.join(output, f'{table}.parquet', f'part-{chunk:05d}.parquet')
+    return os.path.join(output, '.parts', table, f'part-{chunk:05d}.csv')
+
+
+def write_part(frame, path, fmt):
+    if fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def generate_chunk(task):
+    """Build and write one chunk (runs in a worker); returns rows written per table"""
+    table, chunk, start, stop, seed, fmt, output, extra = task
+    rng = np.random.default_rng([seed, TABLE_STREAMS[table], chunk])
+    if table == 'orders':
+        orders, items = orders_chunk(rng, start, stop, *extra)
+        write_part(orders, part_path(output, fmt, 'orders', chunk), fmt)
+        write_part(items, part_path(output, fmt, 'order_items', chunk), fmt)
+        return {'orders': len(orders), 'order_items': len(items)}
+    build = {'customers': customers_chunk, 'products': products_chunk, 'product_reviews': reviews_chunk}[table]
+    frame = build(rng, start, stop)
+    write_part(frame, part_path(output, fmt, table, chunk), fmt)
+    return {table: len(frame)}
+
+
+def merge_csv_parts(output, table):
+    """Concatenate the part files into <table>.csv, keeping one header"""
+    parts_dir = os.path.join(output, '.parts', table)
+    parts = sorted(os.listdir(parts_dir))
+    with open(os.path.join(output, f'{table}.csv'), 'wb') as out:
+        for i, name in enumerate(parts):
+            with open(os.path.join(parts_dir, name), 'rb') as part:
+                if i:
+                    part.readline()
+                shutil.copyfileobj(part, out, 1 << 20)
+
+
+def generate(counts=None, seed=DEFAULT_SEED, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+             fmt='csv', output='dataset'):
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"format must be 'csv' or 'parquet', got {fmt!r}")
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit('--format parquet needs pyarrow (pip install pyarrow)')
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    for table in TABLES:
+        directory = (os.path.join(output, f'{table}.parquet') if fmt == 'parquet'
+                     else os.path.join(output, '.parts', table))
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+    attrs = entity_attributes(counts, seed)
+    items_per_order = order_item_counts(counts, seed, chunk_size)
+    first_item_ids = np.cumsum([1] + [int(c.sum()) for c in items_per_order])
+
+    tasks = []
+    for table, count_key in (('customers', 'customers'), ('products', 'products'),
+                             ('orders', 'orders'), ('product_reviews', 'reviews')):
+        for chunk, (start, stop) in enumerate(chunk_bounds(counts[count_key], chunk_size)):
+            extra = (items_per_order[chunk], int(first_item_ids[chunk])) if table == 'orders' else ()
+            tasks.append((table, chunk, start, stop, seed, fmt, output, extra))
+
+    print(f'Generating {", ".join(f"{n:,} {k}" for k, n in counts.items())} '
+          f'in {len(tasks)} chunks with {workers} worker processes...')
+    rows = dict.fromkeys(TABLES, 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(attrs,)) as pool:
+        for written in pool.map(generate_chunk, tasks):
+            for table, n in written.items():
+                rows[table] += n
+
+    if fmt == 'csv':
+        for table in TABLES:
+            merge_csv_parts(output, table)
+        shutil.rmtree(os.path.join(output, '.parts'))
+
+    elapsed = time.perf_counter() - started
+    manifest = {'seed': seed, 'format': fmt, 'chunk_size': chunk_size, 'rows': rows,
+                'seconds': round(elapsed, 1)}
+    with open(os.path.join(output, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(rows.values())
+    for table in TABLES:
+        print(f'  {table:<16} {rows[table]:>12,} rows')
+    print(f'{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s) written to {output}/')
+    return manifest
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    def option(flag, default, cast):
+        return cast(args[args.index(flag) + 1]) if flag in args else default
+
+    generate(
+        counts={key: option(f'--{key}', default, int) for key, default in DEFAULT_COUNTS.items()},
+        seed=option('--seed', DEFAULT_SEED, int),
+        workers=option('--workers', None, int),
+        chunk_size=option('--chunk-size', DEFAULT_CHUNK_SIZE, int),
+        fmt=option('--format', 'csv', str),
+        output=option('--output', 'dataset', str),
+    )
@@ -0,0 +1,221 @@
+"""Memory-lean CSV ingestion for the training pipeline
+
+Only the columns the model and the feature snapshot use are read, with
+compact dtypes (int32 ids, category strings, float32 ratings). The reviews
+file, by far the largest, is streamed in chunks: per-product and
+per-customer rating aggregates are accumulated with np.bincount and the
+training sample is drawn by reservoir sampling, so the full reviews table
+is never held in memory.
+
+The aggregates are persisted with the review_id watermark they cover and
+the byte offset the pass ended at (training_state.npz), so refresh_model.py
+can seek past the old reviews and fold in only the newer ones.
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Reviews read per chunk; bounds the transient memory of the streaming pass
+REVIEW_CHUNK_SIZE = 500_000
+
+# price stays float64: the products table is small and the value is echoed
+# back verbatim by /local/predict
+PRODUCT_DTYPES = {'product_id': 'int32', 'product_name': 'object', 'category': 'category',
+                  'brand': 'category', 'price': 'float64'}
+CUSTOMER_DTYPES = {'customer_id': 'int32', 'gender': 'category', 'country': 'category'}
+REVIEW_DTYPES = {'review_id': 'int64', 'product_id': 'int32', 'customer_id': 'int32', 'rating': 'float32'}
+
+TRAINING_STATE_PATH = 'training_state.npz'
+
+
+def read_products(path):
+    return pd.read_csv(path, usecols=list(PRODUCT_DTYPES), dtype=PRODUCT_DTYPES)
+
+
+def read_customers(path):
+    return pd.read_csv(path, usecols=list(CUSTOMER_DTYPES), dtype=CUSTOMER_DTYPES)
+
+
+class RatingAggregator:
+    """Running rating sum and count per id, indexed directly by id
+
+    Ids are small positive integers, so dense arrays grown to the largest
+    id seen are both smaller and faster than a groupby over partial results.
+    """
+
+    def __init__(self, sums=None, counts=None):
+        self.sums = np.zeros(0, dtype=np.float64) if sums is None else np.asarray(sums, dtype=np.float64)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def update(self, ids, ratings):
+        sums = np.bincount(ids, weights=ratings)
+        counts = np.bincount(ids)
+        if len(sums) > len(self.sums):
+            self.sums = np.pad(self.sums, (0, len(sums) - len(self.sums)))
+            self.counts = np.pad(self.counts, (0, len(counts) - len(self.counts)))
+        self.sums[:len(sums)] += sums
+        self.counts[:len(counts)] += counts
+
+    def to_frame(self, id_column, prefix):
+        """DataFrame of (id, mean_<prefix>_avg, count_<prefix>_avg) for reviewed ids"""
+        ids = np.flatnonzero(self.counts)
+        return pd.DataFrame({
+            id_column: ids.astype(np.int32),
+            f'mean_{prefix}_avg': self.sums[ids] / self.counts[ids],
+            f'count_{prefix}_avg': self.counts[ids],
+        })
+
+
+class ReviewStats:
+    """Product and customer rating aggregates plus the highest review_id they
+    include (the watermark) and the artifact version they belong to
+
+    offset is the byte offset in the reviews CSV where the pass that built
+    them ended (0 when they did not come from the CSV); trees_grown counts
+    every tree fitted for this artifact lineage, so refreshes never reuse a
+    tree seed.
+    """
+
+    def __init__(self, products=None, customers=None, watermark=0, version=0, offset=0, trees_grown=0):
+        self.products = products or RatingAggregator()
+        self.customers = customers or RatingAggregator()
+        self.watermark = watermark
+        self.version = version
+        self.offset = offset
+        self.trees_grown = trees_grown
+
+    def update(self, chunk):
+        ratings = chunk['rating'].to_numpy()
+        self.products.update(chunk['product_id'].to_numpy(), ratings)
+        self.customers.update(chunk['customer_id'].to_numpy(), ratings)
+        if len(chunk):
+            self.watermark = max(self.watermark, int(chunk['review_id'].max()))
+
+    def product_frame(self):
+        return self.products.to_frame('product_id', 'product')
+
+    def customer_frame(self):
+        return self.customers.to_frame('customer_id', 'customer')
+
+    def save(self, path=TRAINING_STATE_PATH):
+        np.savez(path,
+                 product_sums=self.products.sums, product_counts=self.products.counts,
+                 customer_sums=self.customers.sums, customer_counts=self.customers.counts,
+                 watermark=np.int64(self.watermark), version=np.int64(self.version),
+                 offset=np.int64(self.offset), trees_grown=np.int64(self.trees_grown))
+
+    @classmethod
+    def load(cls, path=TRAINING_STATE_PATH):
+        with np.load(path) as data:
+            # offset and trees_grown are missing from states saved before them
+            return cls(RatingAggregator(data['product_sums'], data['product_counts']),
+                       RatingAggregator(data['customer_sums'], data['customer_counts']),
+                       int(data['watermark']), int(data['version']),
+                       int(data['offset']) if 'offset' in data else 0,
+                       int(data['trees_grown']) if 'trees_grown' in data else 0)
+
+
+class ReservoirSample:
+    """Uniform random sample of at most `size` rows from a stream of chunks
+
+    Every row draws a random priority and the `size` rows with the smallest
+    priorities seen so far are kept (bottom-k reservoir sampling), so memory
+    is O(size + chunk) however long the stream is.
+    """
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.keys = np.empty(0)
+
+    def update(self, chunk):
+        keys = self.rng.random(len(chunk))
+        if len(self.keys) == self.size:
+            # Reservoir full: only rows beating the current worst can enter
+            entering = keys < self.keys.max()
+            chunk, keys = chunk[entering], keys[entering]
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk], ignore_index=True)
+        keys = np.concatenate([self.keys, keys])
+        if len(keys) > self.size:
+            kept = np.argpartition(keys, self.size - 1)[:self.size]
+            rows, keys = rows.iloc[kept].reset_index(drop=True), keys[kept]
+        self.rows, self.keys = rows, keys
+
+    def result(self):
+        """The sampled rows, in random order"""
+        return self.rows.iloc[np.argsort(self.keys)].reset_index(drop=True)
+
+
+def _resumes_at(f, offset):
+    """Whether a pass that ended at byte `offset` still lines up with the
+    file: it has not shrunk and a line ends right before the offset"""
+    if not offset or offset > os.fstat(f.fileno()).st_size:
+        return False
+    f.seek(offset - 1)
+    return f.read(1) == b'\n'
+
+
+def stream_reviews(path, sample_size, seed=42, chunksize=REVIEW_CHUNK_SIZE, stats=None):
+    """One pass over the reviews CSV
+
+    Returns (sample, stats, n_reviews): a uniform sample of `sample_size`
+    reviews and the ReviewStats over all of them, whose product_frame() /
+    customer_frame() match groupby(...)['rating'].agg(['mean', 'count']).
+
+    With `sample_size=None` every review is kept (in file order) instead of
+    a sample.
+
+    When existing `stats` are given, only reviews past their watermark are
+    sampled and merged into them. The file is taken to be append-only:
+    reading resumes at the byte offset where their pass ended, so old
+    reviews are not parsed again. If the file no longer lines up with that
+    offset (or the stats did not come from it), it is read from the start
+    and filtered on the watermark instead.
+    """
+    incremental = stats is not None
+    stats = stats if incremental else ReviewStats()
+    after = stats.watermark
+    reservoir = ReservoirSample(sample_size, seed) if sample_size is not None else None
+    kept = []
+    total = 0
+    with open(path, 'rb') as f:
+        if incremental and _resumes_at(f, stats.offset):
+            # Past the header: column names come from the first line
+            columns = pd.read_csv(path, nrows=0).columns.tolist()
+            f.seek(stats.offset)
+            chunks = [] if not f.peek(1) else pd.read_csv(
+                f, header=None, names=columns, usecols=list(REVIEW_DTYPES),
+                dtype=REVIEW_DTYPES, chunksize=chunksize
+            )
+        else:
+            f.seek(0)
+            chunks = pd.read_csv(f, usecols=list(REVIEW_DTYPES), dtype=REVIEW_DTYPES, chunksize=chunksize)
+        for chunk in chunks:
+            if incremental:
+                chunk = chunk[chunk['review_id'].to_numpy() > after]
+            stats.update(chunk)
+            if reservoir is not None:
+                reservoir.update(chunk)
+            else:
+                kept.append(chunk)
+            total += len(chunk)
+        stats.offset = f.tell()
+    if not total:
+        empty = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in REVIEW_DTYPES.items()})
+        return empty, stats, 0
+    if reservoir is None:
+        return pd.concat(kept, ignore_index=True), stats, total
+    return reservoir.result(), stats, total
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
@@ -0,0 +1,313 @@
+"""Bulk loader: dataset CSVs -> Postgres (SQL API) and MongoDB (NoSQL API)
+
+Replaces one POST per row through the create endpoints:
+  - Postgres: each CSV is streamed straight into COPY ... FROM STDIN (no
+    per-row statements, no per-row commits); the tables are created from
+    sql_api/app/models.py if missing, foreign keys and secondary indexes
+    are dropped for the load and rebuilt (and validated) once at the end,
+    and the id sequences are moved past the loaded ids
+  - MongoDB: the CSVs are read in --batch-size chunks and written with
+    unordered insert_many from --workers threads; the indexes declared in
+    nosql/init-mongo.js are built after the data is in
+
+Tables load in foreign-key order, in stages whose tables do not reference
+each other and so load in parallel:
+  customers + products -> orders + product_reviews -> order_items
+
+Usage (from the directory holding dataset/):
+    python3 load_dataset.py [--target sql|mongo|both] [--dataset dataset] [--replace]
+        [--postgres-url URL] [--mongo-url URL] [--database ecommerce_db]
+        [--batch-size 10000] [--workers 4]
+
+--postgres-url defaults to $DATABASE_URL, --mongo-url to $MONGODB_URL (or
+mongodb://localhost:27017), --database to $DATABASE_NAME (or ecommerce_db).
+Non-empty targets are refused unless --replace is given, which truncates
+the tables / drops the collections first.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+ML_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(ML_DIR)
+INIT_MONGO_JS = os.path.join(REPO_DIR, 'nosql', 'init-mongo.js')
+
+# Tables of a stage only reference tables of earlier stages
+LOAD_STAGES = (('customers', 'products'), ('orders', 'product_reviews'), ('order_items',))
+PRIMARY_KEYS = {'customers': 'customer_id', 'products': 'product_id', 'orders': 'order_id',
+                'order_items': 'order_item_id', 'product_reviews': 'review_id'}
+DATE_COLUMNS = {'customers': ['signup_date'], 'orders': ['order_date'], 'product_reviews': ['review_date']}
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_WORKERS = 4
+REPORT_PATH = 'load_report.json'
+
+
+def csv_path(dataset, table):
+    return os.path.join(dataset, f'{table}.csv')
+
+
+def csv_columns(path):
+    with open(path) as f:
+        return f.readline().strip().split(',')
+
+
+def rate(rows, seconds):
+    return round(rows / seconds) if seconds else None
+
+
+# ============================================================================
+# POSTGRES (COPY)
+# ============================================================================
+
+def postgres_dsn(url):
+    """libpq accepts postgresql:// URLs but not SQLAlchemy's driver suffix"""
+    return re.sub(r'^postgres(ql)?\+\w+://', 'postgresql://', url)
+
+
+def sql_api_database(url):
+    """(models module, declarative Base, engine) of sql_api/app, bound to `url`"""
+    os.environ['DATABASE_URL'] = url
+    if os.path.join(REPO_DIR, 'sql_api') not in sys.path:
+        sys.path.insert(0, os.path.join(REPO_DIR, 'sql_api'))
+    from app import models
+    from app.database import Base, engine
+    return models, Base, engine
+
+
+def create_sql_tables(url):
+    """Create missing tables with the SQL API's own models (as its startup does)"""
+    _, Base, engine = sql_api_database(url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+
+def copy_table(dsn, dataset, table):
+    """Stream one CSV into its table with COPY; returns (rows, seconds)"""
+    import psycopg2
+
+    path = csv_path(dataset, table)
+    columns = ', '.join(csv_columns(path))
+    started = time.perf_counter()
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur, open(path) as f:
+        cur.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)', f, size=1 << 20)
+        rows = cur.rowcount
+    conn.close()
+    return rows, time.perf_counter() - started
+
+
+def drop_deferred_constraints(cur, tables):
+    """Drop the foreign keys and secondary indexes of `tables`; returns the
+    statements that recreate them
+
+    Maintaining two B-trees and two foreign-key lookups per row made COPY of
+    product_reviews ~5x slower than building them once afterwards. Primary
+    keys (and any index backing a constraint) stay in place.
+    """
+    cur.execute('SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint '
+                'WHERE contype = %s AND conrelid::regclass::text = ANY(%s)', ('f', list(tables)))
+    foreign_keys = cur.fetchall()
+    cur.execute('SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid) FROM pg_index i '
+                'WHERE i.indrelid::regclass::text = ANY(%s) '
+                'AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)', (list(tables),))
+    indexes = cur.fetchall()
+
+    for table, name, _ in foreign_keys:
+        cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+    for name, _ in indexes:
+        cur.execute(f'DROP INDEX {name}')
+    # Indexes first; the foreign keys are validated against the loaded rows
+    return ([definition for _, definition in indexes]
+            + [f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}' for table, name, definition in foreign_keys])
+
+
+def restore_constraints(dsn, statements):
+    """Run the statements from drop_deferred_constraints one by one; a
+    foreign key the loaded rows violate is re-added as NOT VALID (enforced
+    for new rows only). Returns the violation messages."""
+    import psycopg2
+
+    violations = []
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for statement in statements:
+            try:
+                cur.execute(statement)
+            except psycopg2.errors.ForeignKeyViolation as e:
+                cur.execute(statement + ' NOT VALID')
+                violations.append(str(e).strip())
+    conn.close()
+    return violations
+
+
+def load_sql(url, dataset, tables, replace=False):
+    import psycopg2
+
+    dsn = postgres_dsn(url)
+    create_sql_tables(url)
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        if replace:
+            cur.execute(f'TRUNCATE {", ".join(tables)} CASCADE')
+        else:
+            for table in tables:
+                cur.execute(f'SELECT EXISTS (SELECT 1 FROM {table})')
+                if cur.fetchone()[0]:
+                    raise SystemExit(f'Postgres table {table} is not empty; use --replace to reload it')
+        restore_statements = drop_deferred_constraints(cur, tables)
+    conn.close()
+
+    results = {}
+    try:
+        for stage in LOAD_STAGES:
+            stage_tables = [t for t in stage if t in tables]
+            with ThreadPoolExecutor(max_workers=len(stage_tables) or 1) as pool:
+                futures = {t: pool.submit(copy_table, dsn, dataset, t) for t in stage_tables}
+                for table, future in futures.items():
+                    rows, seconds = future.result()
+                    results[table] = {'rows': rows, 'seconds': round(seconds, 2),
+                                      'rows_per_second': rate(rows, seconds)}
+                    print(f'  [sql] {table:<16} {rows:>12,} rows in {seconds:7.1f}s '
+                          f'({results[table]["rows_per_second"]:,} rows/s)')
+    finally:
+        # Rebuilt even after a failed load, so the schema is never left without them
+        started = time.perf_counter()
+        violations = restore_constraints(dsn, restore_statements)
+        seconds = time.perf_counter() - started
+        print(f'  [sql] {len(restore_statements)} indexes and foreign keys rebuilt and validated in {seconds:.1f}s')
+        results['_constraints'] = {'count': len(restore_statements), 'seconds': round(seconds, 2)}
+    if violations:
+        raise SystemExit('Loaded rows violate foreign keys (re-added as NOT VALID):\n' + '\n'.join(violations))
+
+    # Explicit ids were loaded; later inserts must not collide with them
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cur:
+        for table in tables:
+            key = PRIMARY_KEYS[table]
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+                        f"COALESCE(MAX({key}), 0) + 1, false) FROM {table}")
+    conn.close()
+    return results
+
+
+# ============================================================================
+# MONGODB (unordered insert_many)
+# ============================================================================
+
+def mongo_indexes(path=INIT_MONGO_JS):
+    """[(collection, field, unique)] from the createIndex calls in init-mongo.js"""
+    with open(path) as f:
+        source = f.read()
+    pattern = re.compile(r'db\.(\w+)\.createIndex\(\{\s*"(\w+)":\s*1\s*\}\s*(,\s*\{\s*unique:\s*true\s*\})?\)')
+    return [(collection, field, bool(unique)) for collection, field, unique in pattern.findall(source)]
+
+
+def read_batches(dataset, table, batch_size):
+    """Documents of one CSV, batch_size at a time, with dates as datetimes"""
+    for chunk in pd.read_csv(csv_path(dataset, table), chunksize=batch_size,
+                             parse_dates=DATE_COLUMNS.get(table, [])):
+        yield chunk.to_dict('records')
+
+
+def insert_collection(collection, batches, workers):
+    """insert_many(ordered=False) per batch from `workers` threads, with at
+    most 2 * workers batches read ahead; returns (rows, seconds)"""
+    in_flight = threading.BoundedSemaphore(2 * workers)
+    started = time.perf_counter()
+
+    def insert(docs):
+        try:
+            return len(collection.insert_many(docs, ordered=False).inserted_ids)
+        finally:
+            in_flight.release()
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for docs in batches:
+            in_flight.acquire()
+            futures.append(pool.submit(insert, docs))
+        rows = sum(f.result() for f in futures)
+    return rows, time.perf_counter() - started
+
+
+def load_mongo(url, database, dataset, tables, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+               replace=False, client=None):
+    from pymongo import ASCENDING, MongoClient
+
+    client = client or MongoClient(url)
+    db = client[database]
+    for table in tables:
+        if replace:
+            db.drop_collection(table)
+        elif db[table].estimated_document_count():
+            raise SystemExit(f'MongoDB collection {table} is not empty; use --replace to reload it')
+
+    results = {}
+    for stage in LOAD_STAGES:
+        stage_tables = [t for t in stage if t in tables]
+        with ThreadPoolExecutor(max_workers=len(stage_tables) or 1) as pool:
+            futures = {t: pool.submit(insert_collection, db[t], read_batches(dataset, t, batch_size), workers)
+                       for t in stage_tables}
+            for table, future in futures.items():
+                rows, seconds = future.result()
+                results[table] = {'rows': rows, 'seconds': round(seconds, 2), 'rows_per_second': rate(rows, seconds)}
+                print(f'  [mongo] {table:<14} {rows:>12,} rows in {seconds:7.1f}s '
+                      f'({results[table]["rows_per_second"]:,} rows/s)')
+
+    # Building indexes once over the loaded data beats maintaining them per insert
+    started = time.perf_counter()
+    indexes = [(c, field, unique) for c, field, unique in mongo_indexes() if c in tables]
+    for collection, field, unique in indexes:
+        db[collection].create_index([(field, ASCENDING)], unique=unique)
+    seconds = time.perf_counter() - started
+    print(f'  [mongo] {len(indexes)} indexes from init-mongo.js built in {seconds:.1f}s')
+    results['_indexes'] = {'count': len(indexes), 'seconds': round(seconds, 2)}
+    return results
+
+
+def load(target='both', dataset='dataset', postgres_url=None, mongo_url=None, database='ecommerce_db',
+         batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, replace=False):
+    tables = [t for stage in LOAD_STAGES for t in stage if os.path.exists(csv_path(dataset, t))]
+    if not tables:
+        raise SystemExit(f'No dataset CSVs found in {dataset}/')
+    print(f'Loading {", ".join(tables)} from {dataset}/')
+
+    report = {'dataset': dataset, 'tables': tables}
+    if target in ('sql', 'both'):
+        if not postgres_url:
+            raise SystemExit('Postgres URL missing: pass --postgres-url or set DATABASE_URL')
+        print('Postgres (COPY):')
+        report['sql'] = load_sql(postgres_url, dataset, tables, replace)
+    if target in ('mongo', 'both'):
+        print(f'MongoDB (insert_many, batches of {batch_size}, {workers} threads per collection):')
+        report['mongo'] = load_mongo(mongo_url, database, dataset, tables, batch_size, workers, replace)
+
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Load report written to {REPORT_PATH}')
+    return report
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    def option(flag, default, cast=str):
+        return cast(args[args.index(flag) + 1]) if flag in args else default
+
+    target = option('--target', 'both')
+    if target not in ('sql', 'mongo', 'both'):
+        raise SystemExit(f"--target must be sql, mongo or both, got {target!r}")
+    load(
+        target=target,
+        dataset=option('--dataset', 'dataset'),
+        postgres_url=option('--postgres-url', os.getenv('DATABASE_URL')),
+        mongo_url=option('--mongo-url', os.getenv('MONGODB_URL', 'mongodb://localhost:27017')),
+        database=option('--database', os.getenv('DATABASE_NAME', 'ecommerce_db')),
+        batch_size=option('--batch-size', DEFAULT_BATCH_SIZE, int),
+        workers=option('--workers', DEFAULT_WORKERS, int),
+        replace='--replace' in args,
+    )
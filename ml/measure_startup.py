@@ -0,0 +1,92 @@
+"""Cold-start cost of the prediction service, measured in fresh interpreters
+
+Reports how long each heavy import takes before the first request can be
+served, and how long each model artifact takes to load:
+  - model.pkl   : joblib pickle written by train_model_sampled.py (compress=3)
+  - model_flat/ : memory-mapped FlatForest directory (flat_forest.py)
+
+Usage (from the directory holding the artifacts):
+    python3 measure_startup.py [--repeats 3]
+"""
+import os
+import subprocess
+import sys
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORTS = ['numpy', 'pandas', 'joblib', 'sklearn.ensemble', 'fastapi', 'httpx', 'api']
+
+LOADERS = {
+    'model.pkl (joblib, compressed)': (
+        'model.pkl',
+        "import joblib; joblib.load('model.pkl')"
+    ),
+    'model_flat/ (mmap)': (
+        'model_flat',
+        "from flat_forest import load_flat_model; load_flat_model('model_flat', mmap_mode='r')"
+    ),
+}
+
+
+def time_in_subprocess(setup, statement):
+    """Seconds spent in `statement` inside a fresh interpreter"""
+    code = (
+        f"import sys, time; sys.path.insert(0, {ML_DIR!r}); {setup}\n"
+        f"start = time.perf_counter()\n{statement}\n"
+        f"print(time.perf_counter() - start)"
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def best_of(repeats, setup, statement):
+    return min(time_in_subprocess(setup, statement) for _ in range(repeats))
+
+
+def main(repeats=3):
+    print(f'{"="*60}')
+    print('IMPORT TIME (fresh interpreter, best of {})'.format(repeats))
+    print(f'{"="*60}')
+    for module in IMPORTS:
+        # numpy is preloaded for everything but itself so its cost is not
+        # double-counted in the modules that build on it
+        setup = '' if module == 'numpy' else 'import numpy'
+        try:
+            seconds = best_of(repeats, setup, f'import {module}')
+            print(f'{module:<20} {seconds * 1000:9.1f} ms')
+        except RuntimeError as e:
+            print(f'{module:<20} {"failed":>9}    ({e})')
+
+    print(f'\n{"="*60}')
+    print('MODEL LOAD TIME (imports excluded)')
+    print(f'{"="*60}')
+    for name, (path, statement) in LOADERS.items():
+        if not os.path.exists(path):
+            print(f'{name:<32} {"missing":>9}')
+            continue
+        setup = 'import joblib, sklearn.ensemble, flat_forest'
+        seconds = best_of(repeats, setup, statement)
+        print(f'{name:<32} {seconds * 1000:9.1f} ms')
+
+    # What the service actually pays: still-unloaded modules brought in by the
+    # loaded artifact (e.g. sklearn for model.pkl, nothing extra for model_flat/)
+    print(f'\n{"="*60}')
+    print('IMPORTED BY THE SERVICE (import api + default model load)')
+    print(f'{"="*60}')
+    probe = (
+        "import api; api.load_model()\n"
+        "print(' '.join(m for m in ('pandas', 'sklearn', 'joblib') if m in sys.modules) or 'none')"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', f"import sys; sys.path.insert(0, {ML_DIR!r})\n{probe}"],
+        capture_output=True, text=True
+    )
+    heavy = result.stdout.strip().splitlines()[-1] if result.returncode == 0 else 'failed'
+    print(f'heavy modules loaded: {heavy}')
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[sys.argv.index('--repeats') + 1]) if '--repeats' in sys.argv else 3
+    main(repeats)
@@ -0,0 +1,64 @@
+"""Prometheus metrics for the prediction API, served by GET /metrics
+
+  prediction_upstream_request_seconds{backend, endpoint}      upstream HTTP latency
+  prediction_upstream_errors_total{backend, endpoint, reason} failed upstream calls
+  prediction_stage_seconds{database, stage}                   fetch / feature_build / inference
+  prediction_request_seconds{route}                           end-to-end handler time
+
+`endpoint` is the upstream path template (e.g. /products/{id}), never the
+concrete URL, so label cardinality stays bounded.
+"""
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Sub-millisecond resolution for the in-process stages, seconds for upstreams
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UPSTREAM_LATENCY = Histogram(
+    'prediction_upstream_request_seconds',
+    'Latency of HTTP calls to the SQL/NoSQL APIs',
+    ['backend', 'endpoint']
+)
+UPSTREAM_ERRORS = Counter(
+    'prediction_upstream_errors_total',
+    'Upstream calls that failed or returned a non-200 status',
+    ['backend', 'endpoint', 'reason']
+)
+STAGE_LATENCY = Histogram(
+    'prediction_stage_seconds',
+    'Time spent in each prediction stage',
+    ['database', 'stage'],
+    buckets=STAGE_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    'prediction_request_seconds',
+    'End-to-end prediction handler latency',
+    ['route'],
+    buckets=STAGE_BUCKETS
+)
+
+
+@contextmanager
+def timed(histogram, timings=None, key=None, **labels):
+    """Observe the block's wall time on `histogram`; also store it in
+    timings[key] (seconds) when a timings dict is given"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.labels(**labels).observe(elapsed)
+        if timings is not None:
+            timings[key] = elapsed
+
+
+def format_timings(timings):
+    """'fetch=12.3ms inference=0.4ms' for log lines"""
+    return ' '.join(f'{key}={seconds * 1000:.2f}ms' for key, seconds in timings.items())
+
+
+def render_latest():
+    """(body, content type) of the Prometheus text exposition"""
+    return generate_latest(), CONTENT_TYPE_LATEST
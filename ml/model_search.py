@@ -0,0 +1,235 @@
+"""Hyperparameter search with a latency-aware model selector
+
+Every combination of n_estimators x max_depth x min_samples_leaf is fitted
+in parallel worker processes (one single-threaded fit per worker). Each
+candidate's pickle and flattened artifact are written under
+model_search/candidate_<i>/, then inference latency is measured one
+candidate at a time in this process, so timings are not skewed by
+concurrent fits.
+
+Candidates are fitted and scored on a validation split carved out of the
+training set; the test set is never seen during the search. The selected
+model is the most accurate (lowest validation RMSE) candidate whose
+single-row p99 latency fits the budget; if none fits, the fastest one is
+chosen and flagged. Its parameters are then refitted on the whole training
+set, and only that model is scored on the test set. All results go to
+model_search_report.json.
+
+Used by train_model_sampled.py:
+    python3 train_model_sampled.py --search [--p99-budget-ms 5] [--engine flat|sklearn]
+        [--workers N] [--n-estimators 25,50,100] [--max-depth none,16] [--min-samples-leaf 1,10]
+"""
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from flat_forest import FlatForest, load_flat_model, save_flat_model
+
+SEARCH_DIR = 'model_search'
+REPORT_PATH = 'model_search_report.json'
+
+DEFAULT_GRID = {
+    'n_estimators': [25, 50, 100],
+    'max_depth': [None, 16],
+    'min_samples_leaf': [1, 10],
+}
+DEFAULT_P99_BUDGET_MS = 5.0
+
+# Share of the training set held out to score candidates
+VALIDATION_SIZE = 0.2
+
+# Single-row predictions timed per candidate (after warm-up)
+LATENCY_SAMPLES = 500
+
+# Training data shared with the worker processes (set by _init_worker)
+_data = {}
+
+
+def _init_worker(X_fit, y_fit, X_val, y_val):
+    _data.update(X_fit=X_fit, y_fit=y_fit, X_val=X_val, y_val=y_val)
+
+
+def _directory_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+
+def fit_candidate(index, params, out_dir):
+    """Fit one candidate, score it on the validation split and save its
+    artifacts (runs in a worker)"""
+    started = time.perf_counter()
+    model = RandomForestRegressor(**params, random_state=42, n_jobs=1)
+    model.fit(_data['X_fit'], _data['y_fit'])
+    train_seconds = time.perf_counter() - started
+
+    y_pred = model.predict(_data['X_val'])
+    mse = mean_squared_error(_data['y_val'], y_pred)
+
+    candidate_dir = os.path.join(out_dir, f'candidate_{index}')
+    os.makedirs(candidate_dir, exist_ok=True)
+    pickle_path = os.path.join(candidate_dir, 'model.pkl')
+    joblib.dump(model, pickle_path, compress=3)
+    flat_model = FlatForest.from_sklearn(model)
+    save_flat_model(flat_model, {}, os.path.join(candidate_dir, 'model_flat'))
+
+    return {
+        'index': index,
+        'params': params,
+        'val_rmse': float(np.sqrt(mse)),
+        'val_r2': float(r2_score(_data['y_val'], y_pred)),
+        'train_seconds': round(train_seconds, 2),
+        'node_count': int(flat_model.node_count),
+        'pickle_mb': round(os.path.getsize(pickle_path) / 1e6, 2),
+        'flat_mb': round(_directory_mb(os.path.join(candidate_dir, 'model_flat')), 2),
+        'dir': candidate_dir,
+    }
+
+
+def measure_latency(predict, X, samples=LATENCY_SAMPLES):
+    """Single-row p50/p95/p99 (ms) and whole-X batch cost (us per row)"""
+    for i in range(min(20, len(X))):
+        predict(X[i:i + 1])
+    timings = np.empty(samples)
+    for i in range(samples):
+        row = X[i % len(X)][None, :]
+        start = time.perf_counter()
+        predict(row)
+        timings[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict(X)
+    batch_seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+    return {
+        'single_row_ms': {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3)},
+        'batch_rows': len(X),
+        'batch_us_per_row': round(batch_seconds / len(X) * 1e6, 2),
+    }
+
+
+def load_for_engine(candidate, engine):
+    if engine == 'flat':
+        return load_flat_model(os.path.join(candidate['dir'], 'model_flat'))[0]
+    return joblib.load(os.path.join(candidate['dir'], 'model.pkl'))
+
+
+def select_candidate(results, p99_budget_ms):
+    """Lowest validation RMSE within the p99 budget, else the lowest p99 overall"""
+    within = [r for r in results if r['within_budget']]
+    if within:
+        return min(within, key=lambda r: (r['val_rmse'], r['single_row_ms']['p99']))
+    return min(results, key=lambda r: r['single_row_ms']['p99'])
+
+
+def parse_grid(argv):
+    """DEFAULT_GRID overridden by --n-estimators / --max-depth / --min-samples-leaf"""
+    grid = dict(DEFAULT_GRID)
+    for name in grid:
+        flag = '--' + name.replace('_', '-')
+        if flag in argv:
+            values = argv[argv.index(flag) + 1].split(',')
+            grid[name] = [None if v.lower() == 'none' else int(v) for v in values]
+    return grid
+
+
+def run_search(X_train, y_train, X_test, y_test, grid=None, p99_budget_ms=DEFAULT_P99_BUDGET_MS,
+               engine='flat', workers=None, out_dir=SEARCH_DIR, report_path=REPORT_PATH):
+    """Fit all grid candidates, pick one under the latency budget and write the report
+
+    Returns the selected RandomForestRegressor, refitted on all of X_train,
+    and the report dict. X_test/y_test only score that final model.
+    """
+    if engine not in ('flat', 'sklearn'):
+        raise ValueError(f"engine must be 'flat' or 'sklearn', got {engine!r}")
+    grid = grid or DEFAULT_GRID
+    candidates = [
+        {'n_estimators': n, 'max_depth': depth, 'min_samples_leaf': leaf}
+        for n in grid['n_estimators'] for depth in grid['max_depth'] for leaf in grid['min_samples_leaf']
+    ]
+    workers = workers or os.cpu_count() or 1
+    print(f'Searching {len(candidates)} candidates with {workers} worker processes...')
+
+    os.makedirs(out_dir, exist_ok=True)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=VALIDATION_SIZE,
+                                                  random_state=42)
+    print(f'Fitting on {len(X_fit)} rows, validating on {len(X_val)}')
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X_fit, y_fit, X_val, y_val)) as pool:
+        futures = [pool.submit(fit_candidate, i, params, out_dir) for i, params in enumerate(candidates)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"  fitted {result['params']}: validation RMSE {result['val_rmse']:.4f} "
+                  f"in {result['train_seconds']}s")
+    results.sort(key=lambda r: r['index'])
+
+    # Latency measured sequentially with nothing else running, on plain
+    # float arrays as the API passes them
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    X_latency = np.asarray(X_val, dtype=np.float64)
+    for result in results:
+        result.update(measure_latency(load_for_engine(result, engine).predict, X_latency))
+        result['within_budget'] = bool(result['single_row_ms']['p99'] <= p99_budget_ms)
+
+    selected = select_candidate(results, p99_budget_ms)
+    if not selected['within_budget']:
+        print(f'WARNING: no candidate meets the {p99_budget_ms} ms p99 budget; '
+              f'selected the fastest one instead')
+
+    print(f'\n{"params":<58} {"val RMSE":>8} {"val R²":>7} {"p99 ms":>8} {"batch us":>9} {"flat MB":>8}')
+    for r in results:
+        marker = '*' if r is selected else ' '
+        print(f"{marker}{str(r['params']):<57} {r['val_rmse']:8.4f} {r['val_r2']:7.4f} "
+              f"{r['single_row_ms']['p99']:8.3f} {r['batch_us_per_row']:9.2f} {r['flat_mb']:8.2f}")
+
+    # The winner is refitted on the whole training set; only it sees the test set
+    model = RandomForestRegressor(**selected['params'], random_state=42, n_jobs=-1)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    test_rmse = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+    test_r2 = float(r2_score(y_test, y_pred))
+    print(f'\nSelected {selected["params"]}, refitted on {len(X_train)} rows: '
+          f'test RMSE {test_rmse:.4f}, R² {test_r2:.4f}')
+
+    report = {
+        'engine': engine,
+        'p99_budget_ms': p99_budget_ms,
+        'latency_samples': LATENCY_SAMPLES,
+        'n_fit': len(X_fit),
+        'n_validation': len(X_val),
+        'n_train': len(X_train),
+        'n_test': len(X_test),
+        'grid': grid,
+        'selected': selected['index'],
+        'selected_params': selected['params'],
+        'selected_within_budget': selected['within_budget'],
+        'selected_test_rmse': test_rmse,
+        'selected_test_r2': test_r2,
+        'candidates': [{k: v for k, v in r.items() if k != 'dir'} for r in results],
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Comparison report written to {report_path}')
+    return model, report
+
+
+def search_options(argv=sys.argv):
+    """run_search keyword arguments from the command line"""
+    def value(flag, default, cast):
+        return cast(argv[argv.index(flag) + 1]) if flag in argv else default
+
+    return {
+        'grid': parse_grid(argv),
+        'p99_budget_ms': value('--p99-budget-ms', DEFAULT_P99_BUDGET_MS, float),
+        'engine': value('--engine', 'flat', str),
+        'workers': value('--workers', None, int),
+    }
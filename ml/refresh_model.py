@@ -0,0 +1,160 @@
+"""Incremental model refresh from reviews newer than the last training run
+
+train_model_sampled.py saves the per-product / per-customer rating sums and
+counts together with the highest review_id they include (training_state.npz).
+A refresh:
+  1. streams product_reviews.csv from the byte offset the last run stopped
+     at, so only reviews past the watermark are parsed, and merges them into
+     the running sums and counts (no groupby over history)
+  2. rewrites the feature snapshot with the updated aggregates and builds
+     the new reviews' features from it, encoded exactly as served
+  3. grows the forest with warm_start: --new-trees trees fitted on the new
+     reviews are added, and with --max-trees the oldest trees are dropped
+     so the forest (and its latency) stays a fixed size; tree seeds come
+     from the trees_grown counter in training_state.npz, so a refresh never
+     repeats the seeds of earlier trees
+  4. writes model.pkl, model_flat/, features_snapshot.npz, training_state.npz
+     and manifest.json to model_versions/v<NNNN>/, then copies them over the
+     top-level artifacts that api.py loads
+
+Usage (from the directory holding the artifacts and dataset/):
+    python3 refresh_model.py [--new-trees 10] [--max-trees 100] [--sample-size 50000]
+"""
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+import pandas as pd
+import joblib
+from features import FEATURES, MODEL_PATH, build_feature_plan
+from feature_snapshot import SNAPSHOT_PATH, FeatureSnapshot, snapshot_rows, write_snapshot
+from flat_forest import FLAT_MODEL_PATH, FlatForest, save_flat_model
+from ingest import TRAINING_STATE_PATH, ReviewStats, read_customers, read_products, stream_reviews
+
+VERSIONS_DIR = 'model_versions'
+
+DEFAULT_NEW_TREES = 10
+DEFAULT_SAMPLE_SIZE = 50000
+
+
+def grow_forest(model, X, y, new_trees, max_trees=None, seed=None):
+    """Add `new_trees` trees fitted on (X, y) to a fitted random forest; with
+    `max_trees`, keep only the newest max_trees trees
+
+    warm_start draws the new trees' seeds after skipping one per existing
+    tree, so once trees have been dropped the same seeds would come back;
+    a different `seed` per call (refresh passes its trees_grown counter)
+    keeps them apart.
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees)
+    if seed is not None:
+        model.set_params(random_state=seed)
+    model.fit(X, y)
+    if max_trees and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.set_params(n_estimators=max_trees)
+    model.set_params(warm_start=False)
+    return model
+
+
+def publish(version_dir):
+    """Replace the top-level artifacts with those of `version_dir`
+
+    Files are swapped with os.replace; a running API keeps serving the old
+    memory-mapped model_flat/ until it reloads.
+    """
+    for name in (MODEL_PATH, SNAPSHOT_PATH, TRAINING_STATE_PATH):
+        shutil.copy2(os.path.join(version_dir, name), name + '.tmp')
+        os.replace(name + '.tmp', name)
+
+    staging, retired = FLAT_MODEL_PATH + '.tmp', FLAT_MODEL_PATH + '.old'
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.copytree(os.path.join(version_dir, FLAT_MODEL_PATH), staging)
+    if os.path.isdir(FLAT_MODEL_PATH):
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(FLAT_MODEL_PATH, retired)
+    os.rename(staging, FLAT_MODEL_PATH)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def refresh(reviews_path='dataset/product_reviews.csv', new_trees=DEFAULT_NEW_TREES, max_trees=None,
+            sample_size=DEFAULT_SAMPLE_SIZE):
+    started = time.perf_counter()
+    stats = ReviewStats.load(TRAINING_STATE_PATH)
+    parent_version, previous_watermark = stats.version, stats.watermark
+    print(f'Current version {parent_version}, watermark review_id {previous_watermark}')
+
+    sample, stats, new_reviews = stream_reviews(reviews_path, sample_size, stats=stats)
+    if not new_reviews:
+        print('No new reviews; nothing to refresh')
+        return None
+    print(f'New reviews: {new_reviews} (watermark now review_id {stats.watermark})')
+
+    model, encoders = joblib.load(MODEL_PATH)
+    if not hasattr(model, 'estimators_'):
+        raise SystemExit(f'{MODEL_PATH} is a {type(model).__name__}; incremental refresh only grows '
+                         f'random forests, retrain with train_model_sampled.py instead')
+    stats.version = parent_version + 1
+    # States written before the counter existed start it at the current size
+    stats.trees_grown = max(stats.trees_grown, len(model.estimators_))
+    version_dir = os.path.join(VERSIONS_DIR, f'v{stats.version:04d}')
+    os.makedirs(version_dir, exist_ok=True)
+
+    snapshot_path = os.path.join(version_dir, SNAPSHOT_PATH)
+    write_snapshot(snapshot_path, read_products('dataset/products.csv'),
+                   read_customers('dataset/customers.csv'),
+                   stats.product_frame(), stats.customer_frame())
+
+    # Reviews of products/customers missing from the CSVs cannot be featurized
+    snapshot = FeatureSnapshot.load(snapshot_path)
+    product_rows = snapshot_rows(sample['product_id'].to_numpy(), snapshot.product_id)
+    customer_rows = snapshot_rows(sample['customer_id'].to_numpy(), snapshot.customer_id)
+    known = (product_rows >= 0) & (customer_rows >= 0)
+    X = pd.DataFrame(
+        snapshot.feature_matrix(product_rows[known], customer_rows[known], build_feature_plan(encoders)),
+        columns=FEATURES
+    )
+    y = sample['rating'].to_numpy()[known]
+    print(f'Training {new_trees} new trees on {len(X)} reviews '
+          f'({int((~known).sum())} skipped: unknown product or customer)')
+
+    grow_forest(model, X, y, new_trees, max_trees, seed=stats.trees_grown)
+    stats.trees_grown += new_trees
+    model_path = os.path.join(version_dir, MODEL_PATH)
+    joblib.dump((model, encoders), model_path, compress=3)
+    # Flattened straight from the in-memory forest rather than re-reading the pickle
+    save_flat_model(FlatForest.from_sklearn(model), encoders, os.path.join(version_dir, FLAT_MODEL_PATH))
+    stats.save(os.path.join(version_dir, TRAINING_STATE_PATH))
+
+    manifest = {
+        'version': stats.version,
+        'parent_version': parent_version,
+        'mode': 'incremental',
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'previous_watermark_review_id': previous_watermark,
+        'watermark_review_id': stats.watermark,
+        'new_reviews': new_reviews,
+        'trained_on': len(X),
+        'n_estimators': len(model.estimators_),
+        'trees_grown': stats.trees_grown,
+        'refresh_seconds': round(time.perf_counter() - started, 2),
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    publish(version_dir)
+    print(f'Version {stats.version} written to {version_dir}/ and published '
+          f'({manifest["n_estimators"]} trees, {manifest["refresh_seconds"]}s)')
+    return manifest
+
+
+if __name__ == '__main__':
+    def option(flag, default):
+        return int(sys.argv[sys.argv.index(flag) + 1]) if flag in sys.argv else default
+
+    reviews_path = (sys.argv[sys.argv.index('--reviews') + 1] if '--reviews' in sys.argv
+                    else 'dataset/product_reviews.csv')
+    refresh(reviews_path, new_trees=option('--new-trees', DEFAULT_NEW_TREES),
+            max_trees=option('--max-trees', None), sample_size=option('--sample-size', DEFAULT_SAMPLE_SIZE))
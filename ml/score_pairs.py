@@ -0,0 +1,242 @@
+"""Offline bulk scoring of (customer, product) pairs
+
+Scores a file of pairs without going through the HTTP API:
+  1. model.pkl (or, with --engine flat, model_flat/ memory-mapped) and
+     features_snapshot.npz are loaded once in the parent process; sklearn's
+     traversal is the faster one on chunks this size, so it is the default
+  2. pairs are read in chunks of --chunk-size rows; each chunk's ids are
+     mapped to snapshot rows and its feature matrix is built with
+     FeatureSnapshot.feature_matrix, the vectorized form of the encoding
+     make_prediction applies, then scored with a single model.predict call
+  3. chunks are scored in a pool of --workers forked processes, which share
+     the loaded model and snapshot with the parent copy-on-write instead of
+     each loading their own copy; at most 2 chunks per worker are in flight,
+     so memory is bounded by the chunk size, not the number of pairs
+  4. results are written in input order as they come back, to CSV or (with
+     pyarrow) Parquet, with a progress line per chunk
+
+Predictions are clamped to 1-5 as the API does. Pairs whose customer or
+product is not in the snapshot get an empty predicted_rating and are counted
+as unknown in the report.
+
+Usage (from the directory holding the artifacts):
+    python3 score_pairs.py --pairs pairs.csv [--output scores.csv] [--workers N]
+        [--chunk-size 100000] [--engine sklearn|flat]
+
+The pairs file (.csv or .parquet) needs customer_id and product_id columns;
+the output format follows the --output extension. A summary is written to
+score_report.json.
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+import warnings
+from collections import deque
+import numpy as np
+import pandas as pd
+import joblib
+from features import FEATURES, MODEL_PATH, build_feature_plan, round_rating
+from feature_snapshot import SNAPSHOT_PATH, FeatureSnapshot, snapshot_rows
+from flat_forest import FLAT_MODEL_PATH, load_flat_model
+
+DEFAULT_CHUNK_SIZE = 100_000
+PAIR_COLUMNS = ['customer_id', 'product_id']
+REPORT_PATH = 'score_report.json'
+
+# Chunks queued per worker process; bounds memory while keeping workers busy
+IN_FLIGHT_PER_WORKER = 2
+
+# Set by load_artifacts() before the pool forks, then shared copy-on-write
+model = None
+feature_plan = None
+feature_snapshot = None
+
+
+def _file_format(path):
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'parquet'):
+        raise SystemExit(f'{path}: expected a .csv or .parquet file')
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit(f'{path}: Parquet needs pyarrow (pip install pyarrow)')
+    return fmt
+
+
+def load_artifacts(engine='sklearn', workers=1):
+    """Load the model, encoder plan and feature snapshot into module globals"""
+    global model, feature_plan, feature_snapshot
+    # model_flat/ also serves when it is the only artifact
+    if os.path.isdir(FLAT_MODEL_PATH) and (engine == 'flat' or not os.path.exists(MODEL_PATH)):
+        artifact = FLAT_MODEL_PATH
+        loaded_model, encoders = load_flat_model(FLAT_MODEL_PATH, mmap_mode='r')
+    else:
+        artifact = MODEL_PATH
+        loaded_model, encoders = joblib.load(MODEL_PATH)
+        # Parallelism comes from the worker processes; a forest's own n_jobs
+        # threads would oversubscribe the cores
+        if workers > 1 and 'n_jobs' in loaded_model.get_params():
+            loaded_model.set_params(n_jobs=1)
+
+    if list(getattr(loaded_model, 'feature_names_in_', FEATURES)) != FEATURES:
+        raise SystemExit(f'{artifact} was trained on {list(loaded_model.feature_names_in_)}, '
+                         f'expected {FEATURES}')
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    if not os.path.exists(SNAPSHOT_PATH):
+        raise SystemExit(f'{SNAPSHOT_PATH} not found; run train_model_sampled.py first')
+
+    model = loaded_model
+    feature_plan = build_feature_plan(encoders)
+    feature_snapshot = FeatureSnapshot.load(SNAPSHOT_PATH)
+    return artifact
+
+
+def read_pairs(path, chunk_size):
+    """Yield (customer_id, product_id) int64 array pairs of up to chunk_size rows"""
+    if _file_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+
+        batches = (batch.to_pandas() for batch in
+                   pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=PAIR_COLUMNS))
+    else:
+        batches = pd.read_csv(path, usecols=PAIR_COLUMNS, chunksize=chunk_size)
+    for batch in batches:
+        yield (batch['customer_id'].to_numpy(np.int64), batch['product_id'].to_numpy(np.int64))
+
+
+def score_chunk(chunk):
+    """(customer ids, product ids, predictions) for one chunk; NaN for pairs
+    with an id missing from the snapshot"""
+    customer_ids, product_ids = chunk
+    customer_rows = snapshot_rows(customer_ids, feature_snapshot.customer_id)
+    product_rows = snapshot_rows(product_ids, feature_snapshot.product_id)
+    known = (customer_rows >= 0) & (product_rows >= 0)
+
+    predictions = np.full(len(customer_ids), np.nan)
+    if known.any():
+        X = feature_snapshot.feature_matrix(product_rows[known], customer_rows[known], feature_plan)
+        predictions[known] = round_rating(np.clip(model.predict(X), 1.0, 5.0))
+    return customer_ids, product_ids, predictions
+
+
+class ScoreWriter:
+    """Appends scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._file = None
+        self._parquet = None
+
+    def write(self, customer_ids, product_ids, predictions):
+        frame = pd.DataFrame({'customer_id': customer_ids, 'product_id': product_ids,
+                              'predicted_rating': predictions})
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            header = self._file is None
+            if header:
+                self._file = open(self.path, 'w', newline='')
+            frame.to_csv(self._file, header=header, index=False)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def scored_chunks(chunks, workers):
+    """Score chunks in order; with workers > 1 in a forked pool, keeping at
+    most IN_FLIGHT_PER_WORKER chunks per worker queued"""
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_chunk(chunk)
+        return
+
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(score_chunk, (chunk,)))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def score_pairs(pairs_path, output='scores.csv', workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                engine='sklearn'):
+    workers = workers or os.cpu_count() or 1
+    _file_format(output)
+    started = time.perf_counter()
+    artifact = load_artifacts(engine, workers)
+    load_seconds = time.perf_counter() - started
+    print(f'Loaded {artifact} and {SNAPSHOT_PATH} ({feature_snapshot.n_products:,} products, '
+          f'{feature_snapshot.n_customers:,} customers) in {load_seconds:.1f}s')
+    print(f'Scoring {pairs_path} in chunks of {chunk_size:,} with {workers} worker processes...')
+
+    total = unknown = chunks = 0
+    scoring_started = time.perf_counter()
+    writer = ScoreWriter(output)
+    try:
+        for customer_ids, product_ids, predictions in scored_chunks(read_pairs(pairs_path, chunk_size), workers):
+            writer.write(customer_ids, product_ids, predictions)
+            chunks += 1
+            total += len(predictions)
+            unknown += int(np.isnan(predictions).sum())
+            elapsed = time.perf_counter() - scoring_started
+            print(f'  chunk {chunks:>5}: {total:>14,} pairs  {total / elapsed:>12,.0f} pairs/s')
+    finally:
+        writer.close()
+    scoring_seconds = time.perf_counter() - scoring_started
+
+    report = {
+        'pairs': pairs_path,
+        'output': output,
+        'artifact': artifact,
+        'workers': workers,
+        'chunk_size': chunk_size,
+        'chunks': chunks,
+        'total_pairs': total,
+        'scored_pairs': total - unknown,
+        'unknown_pairs': unknown,
+        'load_seconds': round(load_seconds, 2),
+        'scoring_seconds': round(scoring_seconds, 2),
+        'pairs_per_second': round(total / scoring_seconds) if scoring_seconds else None,
+    }
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f'{total:,} pairs scored in {scoring_seconds:.1f}s '
+          f'({report["pairs_per_second"] or 0:,} pairs/s), written to {output}')
+    if unknown:
+        print(f'{unknown:,} pairs reference a customer or product missing from the snapshot '
+              f'(empty predicted_rating)')
+    print(f'Report written to {REPORT_PATH}')
+    return report
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    def option(flag, default, cast=str):
+        return cast(args[args.index(flag) + 1]) if flag in args else default
+
+    pairs_path = option('--pairs', None)
+    if pairs_path is None:
+        raise SystemExit('Usage: python3 score_pairs.py --pairs pairs.csv [--output scores.csv] '
+                         '[--workers N] [--chunk-size 100000] [--engine sklearn|flat]')
+    score_pairs(pairs_path,
+                output=option('--output', 'scores.csv'),
+                workers=option('--workers', None, int),
+                chunk_size=option('--chunk-size', DEFAULT_CHUNK_SIZE, int),
+                engine=option('--engine', 'sklearn'))
@@ -2,61 +2,121 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
-
-# Set sample size for faster training
-SAMPLE_SIZE = 50000  # Use 50k reviews for training
-
-print("Loading datasets...")
-# Load all datasets
-customers_df = pd.read_csv('dataset/customers.csv')
-products_df = pd.read_csv('dataset/products.csv')
-orders_df = pd.read_csv('dataset/orders.csv')
-order_items_df = pd.read_csv('dataset/order_items.csv')
-reviews_df = pd.read_csv('dataset/product_reviews.csv')
-
-print(f"Total reviews: {len(reviews_df)}")
-print(f"Sampling {SAMPLE_SIZE} reviews for training...")
-
-# Sample the reviews for faster training
-reviews_df_sample = reviews_df.sample(n=min(SAMPLE_SIZE, len(reviews_df)), random_state=42)
-
-# Merge relevant data
-product_reviews = reviews_df_sample.merge(products_df, on='product_id')
-product_reviews = product_reviews.merge(customers_df, on='customer_id')
-
-# Calculate additional features (using full dataset for better statistics)
-product_avg_ratings = reviews_df.groupby('product_id')['rating'].agg(['mean', 'count']).reset_index()
-product_avg_ratings = product_avg_ratings.rename(columns={'mean': 'mean_product_avg', 'count': 'count_product_avg'})
-
-customer_avg_ratings = reviews_df.groupby('customer_id')['rating'].agg(['mean', 'count']).reset_index()
-customer_avg_ratings = customer_avg_ratings.rename(columns={'mean': 'mean_customer_avg', 'count': 'count_customer_avg'})
-
-# Prepare final dataset
-final_df = product_reviews.merge(product_avg_ratings, on='product_id')
-final_df = final_df.merge(customer_avg_ratings, on='customer_id')
-
-print(f"Final dataset shape after sampling and merging: {final_df.shape}")
-
-# Feature engineering - Create separate encoder for each categorical column
-le_category = LabelEncoder()
-le_brand = LabelEncoder()
-le_gender = LabelEncoder()
-le_country = LabelEncoder()
-
-final_df['category_encoded'] = le_category.fit_transform(final_df['category'])
-final_df['brand_encoded'] = le_brand.fit_transform(final_df['brand'])
-final_df['gender_encoded'] = le_gender.fit_transform(final_df['gender'])
-final_df['country_encoded'] = le_country.fit_transform(final_df['country'])
-
-# Select features for model
-features = ['price', 'category_encoded', 'brand_encoded', 'gender_encoded',
-            'country_encoded', 'mean_product_avg', 'count_product_avg',
-            'mean_customer_avg', 'count_customer_avg']
-
-X = final_df[features]
+import os
+import shutil
+import sys
+import time
+import warnings
+from backends import SAMPLE_SIZES, backend_option, build_model, model_size_mb, print_comparison, write_report
+from flat_forest import FLAT_MODEL_PATH, export_flat_model
+from feature_frame_cache import FeatureFrameCache, cache_key
+from feature_snapshot import write_snapshot
+from features import FEATURES
+from ingest import TRAINING_STATE_PATH, read_customers, read_products, stream_reviews, peak_rss_mb
+from model_search import measure_latency
+from training_sources import load_training_data, source_option
+
+pipeline_started = time.perf_counter()
+
+# --backend forest (default) or hgb, see backends.py
+BACKEND = backend_option(sys.argv)
+if '--search' in sys.argv and BACKEND != 'forest':
+    raise SystemExit('--search only tunes the forest backend; drop it or use --backend forest')
+
+# Set sample size for faster training: the forest uses 50k reviews,
+# hgb trains on all of them (None)
+SAMPLE_SIZE = SAMPLE_SIZES[BACKEND]
+
+# --source csv (default, dataset/*.csv), sql or mongo (live databases,
+# see training_sources.py)
+SOURCE = source_option(sys.argv)
+
+DATASET_FILES = ['dataset/products.csv', 'dataset/customers.csv', 'dataset/product_reviews.csv']
+
+# The finished feature frame is cached by a hash of the dataset files and
+# feature code, this script included (see feature_frame_cache.py);
+# --rebuild forces the full load/merge/encode pass. A live database cannot
+# be hashed, so its entry is rebuilt on every run
+if SOURCE == 'csv':
+    feature_cache = FeatureFrameCache(cache_key(
+        DATASET_FILES, sample_size=SAMPLE_SIZE, seed=42
+    ))
+else:
+    feature_cache = FeatureFrameCache(f'live-{SOURCE}')
+
+if SOURCE == 'csv' and feature_cache.complete and '--rebuild' not in sys.argv:
+    print(f"Loading feature frame from cache {feature_cache.dir}/ (--rebuild to recompute)")
+    final_df, cached_encoders = feature_cache.load()
+    le_category, le_brand, le_gender, le_country = (
+        cached_encoders[col] for col in ('category', 'brand', 'gender', 'country')
+    )
+    print(f"Cached feature frame shape: {final_df.shape}")
+else:
+    feature_cache.prepare()
+
+    if SOURCE == 'csv':
+        print("Loading datasets...")
+        # Only the columns used below, with compact dtypes (see ingest.py)
+        customers_df = read_customers('dataset/customers.csv')
+        products_df = read_products('dataset/products.csv')
+
+        # Stream the reviews once: rating aggregates over the full dataset for
+        # better statistics, plus a reservoir sample of SAMPLE_SIZE reviews for training
+        print(f"Streaming reviews and sampling {SAMPLE_SIZE or 'all'} for training...")
+        reviews_df_sample, review_stats, total_reviews = stream_reviews(
+            'dataset/product_reviews.csv', SAMPLE_SIZE, seed=42
+        )
+        product_avg_ratings = review_stats.product_frame()
+        customer_avg_ratings = review_stats.customer_frame()
+
+        # Merge relevant data
+        product_reviews = reviews_df_sample.merge(products_df, on='product_id')
+        product_reviews = product_reviews.merge(customers_df, on='customer_id')
+
+        # Prepare final dataset
+        final_df = product_reviews.merge(product_avg_ratings, on='product_id')
+        final_df = final_df.merge(customer_avg_ratings, on='customer_id')
+    else:
+        # Aggregation and joins run in the database; only feature columns come back
+        print(f"Loading training data from the {SOURCE} database...")
+        training_data = load_training_data(SOURCE, SAMPLE_SIZE, seed=42, argv=sys.argv)
+        final_df = training_data.rows
+        products_df, customers_df = training_data.products, training_data.customers
+        product_avg_ratings = training_data.product_stats
+        customer_avg_ratings = training_data.customer_stats
+        review_stats, total_reviews = training_data.stats, training_data.total_reviews
+
+    print(f"Total reviews: {total_reviews}")
+    print(f"Peak memory after loading: {peak_rss_mb():.0f} MB")
+    print(f"Final dataset shape after sampling and merging: {final_df.shape}")
+
+    # Feature engineering - Create separate encoder for each categorical column
+    le_category = LabelEncoder()
+    le_brand = LabelEncoder()
+    le_gender = LabelEncoder()
+    le_country = LabelEncoder()
+
+    final_df['category_encoded'] = le_category.fit_transform(final_df['category'])
+    final_df['brand_encoded'] = le_brand.fit_transform(final_df['brand'])
+    final_df['gender_encoded'] = le_gender.fit_transform(final_df['gender'])
+    final_df['country_encoded'] = le_country.fit_transform(final_df['country'])
+
+    # Per-product / per-customer features for /local/predict (no upstream calls)
+    # and running rating sums/counts + review_id watermark for refresh_model.py;
+    # a full retrain starts the artifact version history over at 1
+    write_snapshot(feature_cache.path('features_snapshot.npz'), products_df, customers_df,
+                   product_avg_ratings, customer_avg_ratings)
+    review_stats.version = 1
+    review_stats.save(feature_cache.path(TRAINING_STATE_PATH))
+    print(f'Training state: version 1, watermark review_id {review_stats.watermark}')
+
+    feature_cache.save(final_df[FEATURES + ['rating']], {
+        'category': le_category, 'brand': le_brand, 'gender': le_gender, 'country': le_country
+    })
+
+X = final_df[FEATURES]
 y = final_df['rating']
 
 # Split the data
@@ -65,10 +125,23 @@ X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_
 print(f"\nTraining set size: {len(X_train)}")
 print(f"Test set size: {len(X_test)}")
 
-# Initialize and train the model
-print("\nTraining Random Forest model...")
-model = RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1)
-model.fit(X_train, y_train)
+# Initialize and train the model; --search picks the hyperparameters
+# instead (see model_search.py)
+train_started = time.perf_counter()
+if '--search' in sys.argv:
+    from model_search import run_search, search_options
+    print("\nSearching Random Forest hyperparameters...")
+    model, search_report = run_search(X_train, y_train, X_test, y_test, **search_options(sys.argv))
+elif BACKEND == 'hgb':
+    print("\nTraining HistGradientBoosting model...")
+    model = build_model('hgb', X_train, ['category_encoded', 'brand_encoded', 'gender_encoded', 'country_encoded'])
+    model.fit(X_train, y_train)
+    print(f"Boosting iterations: {model.n_iter_}")
+else:
+    print("\nTraining Random Forest model...")
+    model = build_model('forest', X_train)
+    model.fit(X_train, y_train)
+train_seconds = time.perf_counter() - train_started
 
 # Make predictions on test set
 y_pred = model.predict(X_test)
@@ -96,6 +169,25 @@ encoders = {
 joblib.dump((model, encoders), 'model.pkl', compress=3)
 
 print('\nModel and encoders saved to model.pkl (with compression)')
+
+if BACKEND == 'forest':
+    # Flattened array-backed copy of the forest for low-latency serving
+    serving_model = export_flat_model('model.pkl', FLAT_MODEL_PATH)
+    engine = 'flat'
+else:
+    # The flat engine only handles forests; without model_flat/ the API
+    # serves model.pkl with sklearn
+    if os.path.isdir(FLAT_MODEL_PATH):
+        shutil.rmtree(FLAT_MODEL_PATH)
+        print(f'Removed stale {FLAT_MODEL_PATH}/ (api.py will serve model.pkl)')
+    serving_model = model
+    engine = 'sklearn'
+
+# Feature snapshot and training state built with the feature frame
+for artifact in ('features_snapshot.npz', TRAINING_STATE_PATH):
+    shutil.copyfile(feature_cache.path(artifact), artifact)
+print(f'Feature snapshot and training state copied to features_snapshot.npz, {TRAINING_STATE_PATH}')
+
 print(f'\nEncoder details:')
 print(f'- Categories: {len(le_category.classes_)} unique values')
 print(f'- Brands: {len(le_brand.classes_)} unique values')
@@ -111,3 +203,23 @@ for idx in sample_indices:
     actual = y_test.iloc[idx]
     predicted = y_pred[idx]
     print(f'Actual: {actual:.2f} | Predicted: {predicted:.2f} | Difference: {abs(actual - predicted):.2f}')
+
+print(f'\nPeak memory (RSS): {peak_rss_mb():.0f} MB')
+
+# Training report, compared with the other backend's last run if present
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+latency_rows = X_test.to_numpy()[:10000]
+report = {
+    'backend': BACKEND,
+    'engine': engine,
+    'training_rows': len(X_train),
+    'train_seconds': round(train_seconds, 2),
+    'pipeline_seconds': round(time.perf_counter() - pipeline_started, 2),
+    'peak_rss_mb': round(peak_rss_mb() or 0),
+    'model_mb': model_size_mb('model.pkl', FLAT_MODEL_PATH if engine == 'flat' else ''),
+    'rmse': float(np.sqrt(mse)),
+    'r2': float(r2),
+    'latency': measure_latency(serving_model.predict, latency_rows),
+}
+write_report(report)
+print_comparison(report)
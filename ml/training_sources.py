@@ -0,0 +1,290 @@
+"""Training data straight from the live SQL / MongoDB databases
+
+train_model_sampled.py --source sql|mongo reads what the APIs actually
+serve instead of the CSVs in dataset/. The database does the heavy work:
+
+  1. the per-product and per-customer rating sum/count are aggregated on
+     the server (GROUP BY / $group) into a temporary table (Postgres) or a
+     uniquely named collection that is dropped when loading ends (MongoDB)
+  2. the training reviews are joined there with products, customers and
+     those aggregates (JOIN / $lookup) and only the model's input columns
+     (rating, price, category, brand, gender, country, rating stats) come
+     back, through a server-side cursor in CHUNK_SIZE batches
+  3. the per-entity attributes and aggregates for the feature snapshot and
+     the training state are streamed the same way
+
+so the training host never holds the raw reviews, orders or customer rows.
+
+Postgres: queries are built from the sql_api SQLAlchemy models; the
+connection URL is --postgres-url or $DATABASE_URL. Sampling uses
+TABLESAMPLE BERNOULLI with a fixed seed.
+MongoDB: --mongo-url / $MONGODB_URL and --database / $DATABASE_NAME as for
+load_dataset.py. Sampling uses $sample, which cannot be seeded.
+"""
+import os
+import uuid
+import numpy as np
+import pandas as pd
+from ingest import CUSTOMER_DTYPES, PRODUCT_DTYPES, RatingAggregator, ReviewStats
+
+SOURCES = ('csv', 'sql', 'mongo')
+
+# Rows fetched per round trip from the server-side cursors
+CHUNK_SIZE = 50000
+
+# TABLESAMPLE draws a Bernoulli sample; oversample so LIMIT is (almost) always reached
+SAMPLE_OVERSAMPLING = 1.2
+
+TRAINING_COLUMNS = ['rating', 'price', 'category', 'brand', 'gender', 'country',
+                    'mean_product_avg', 'count_product_avg', 'mean_customer_avg', 'count_customer_avg']
+
+
+class TrainingData:
+    """What the CSV path of train_model_sampled.py builds, from a database
+
+    rows: TRAINING_COLUMNS per training review; products / customers: the
+    snapshot attributes; product_stats / customer_stats: mean/count frames
+    of reviewed entities; stats: ReviewStats for refresh_model.py."""
+
+    def __init__(self, rows, products, customers, product_stats, customer_stats, watermark, total_reviews):
+        self.rows = rows
+        self.products = products
+        self.customers = customers
+        self.product_stats = product_stats
+        self.customer_stats = customer_stats
+        self.total_reviews = total_reviews
+        self.stats = ReviewStats(_aggregator(product_stats, 'product_id', 'product'),
+                                 _aggregator(customer_stats, 'customer_id', 'customer'),
+                                 watermark=watermark)
+
+
+def source_option(argv):
+    source = argv[argv.index('--source') + 1] if '--source' in argv else 'csv'
+    if source not in SOURCES:
+        raise SystemExit(f"Unknown --source {source!r}; choose from {', '.join(SOURCES)}")
+    return source
+
+
+def _aggregator(frame, id_column, prefix):
+    """RatingAggregator (dense sum/count by id) from a mean/count frame"""
+    ids = frame[id_column].to_numpy()
+    size = int(ids.max()) + 1 if len(ids) else 0
+    sums, counts = np.zeros(size), np.zeros(size, dtype=np.int64)
+    counts[ids] = frame[f'count_{prefix}_avg'].to_numpy()
+    sums[ids] = frame[f'mean_{prefix}_avg'].to_numpy() * counts[ids]
+    return RatingAggregator(sums, counts)
+
+
+def _concat(chunks, dtypes=None):
+    frame = pd.concat(list(chunks), ignore_index=True)
+    return frame.astype(dtypes) if dtypes else frame
+
+
+def _split_entity_frame(frame, id_column, prefix, dtypes):
+    """(attributes with compact dtypes, mean/count frame of reviewed entities)"""
+    reviewed = frame[f'count_{prefix}_avg'].fillna(0) > 0
+    stats = frame.loc[reviewed, [id_column, f'mean_{prefix}_avg', f'count_{prefix}_avg']].reset_index(drop=True)
+    stats[f'count_{prefix}_avg'] = stats[f'count_{prefix}_avg'].astype(np.int64)
+    return frame[list(dtypes)].astype(dtypes), stats
+
+
+# ============================================================================
+# POSTGRES (sql_api models, GROUP BY, server-side cursor)
+# ============================================================================
+
+def _sql_rating_stats(conn, review, name, key):
+    """Temporary table of rating sum/count per `key`, aggregated by the server"""
+    from sqlalchemy import Column, Float, Integer, MetaData, Table, func, select, text
+
+    table = Table(name, MetaData(), Column(key, Integer, primary_key=True), Column('rating_sum', Float),
+                  Column('rating_count', Integer), prefixes=['TEMPORARY'])
+    table.create(conn)
+    column = getattr(review, key)
+    conn.execute(table.insert().from_select(
+        [key, 'rating_sum', 'rating_count'],
+        select(column, func.sum(review.rating), func.count()).group_by(column)
+    ))
+    conn.execute(text(f'ANALYZE {name}'))  # row estimates for the join plan
+    return table
+
+
+def _sql_frame(conn, query):
+    """Run `query` on a server-side cursor, CHUNK_SIZE rows per fetch"""
+    query = query.execution_options(stream_results=True, max_row_buffer=CHUNK_SIZE)
+    return _concat(pd.read_sql(query, conn, chunksize=CHUNK_SIZE))
+
+
+def _sql_mean(stats):
+    return stats.c.rating_sum / stats.c.rating_count
+
+
+def load_sql(url, sample_size, seed=42):
+    from sqlalchemy import func, literal, select, tablesample, text
+    from load_dataset import sql_api_database
+
+    models, _, engine = sql_api_database(url)
+    Review, Product, Customer = models.ProductReview, models.Product, models.Customer
+
+    with engine.connect() as conn:
+        total_reviews, watermark = conn.execute(
+            select(func.count(), func.coalesce(func.max(Review.review_id), 0))
+        ).one()
+        print(f'Aggregating rating stats over {total_reviews} reviews in the database...')
+        product_stats = _sql_rating_stats(conn, Review, 'training_product_stats', 'product_id')
+        customer_stats = _sql_rating_stats(conn, Review, 'training_customer_stats', 'customer_id')
+
+        reviews = Review.__table__
+        if sample_size and sample_size < total_reviews:
+            percent = min(100.0, 100.0 * SAMPLE_OVERSAMPLING * sample_size / total_reviews)
+            reviews = tablesample(reviews, func.bernoulli(percent), name='sampled', seed=literal(seed))
+            conn.execute(text('SELECT setseed(:seed)'), {'seed': seed / 2 ** 31})
+        query = (
+            select(reviews.c.rating, Product.price, Product.category, Product.brand, Customer.gender,
+                   Customer.country,
+                   _sql_mean(product_stats).label('mean_product_avg'),
+                   product_stats.c.rating_count.label('count_product_avg'),
+                   _sql_mean(customer_stats).label('mean_customer_avg'),
+                   customer_stats.c.rating_count.label('count_customer_avg'))
+            .select_from(reviews)
+            .join(Product.__table__, Product.product_id == reviews.c.product_id)
+            .join(Customer.__table__, Customer.customer_id == reviews.c.customer_id)
+            .join(product_stats, product_stats.c.product_id == reviews.c.product_id)
+            .join(customer_stats, customer_stats.c.customer_id == reviews.c.customer_id)
+        )
+        if sample_size and sample_size < total_reviews:
+            query = query.order_by(func.random()).limit(sample_size)
+        print(f'Streaming {sample_size or "all"} joined training rows...')
+        rows = _sql_frame(conn, query)
+
+        products = _sql_frame(conn, (
+            select(Product.product_id, Product.product_name, Product.category, Product.brand, Product.price,
+                   _sql_mean(product_stats).label('mean_product_avg'),
+                   product_stats.c.rating_count.label('count_product_avg'))
+            .outerjoin(product_stats, product_stats.c.product_id == Product.product_id)
+        ))
+        customers = _sql_frame(conn, (
+            select(Customer.customer_id, Customer.gender, Customer.country,
+                   _sql_mean(customer_stats).label('mean_customer_avg'),
+                   customer_stats.c.rating_count.label('count_customer_avg'))
+            .outerjoin(customer_stats, customer_stats.c.customer_id == Customer.customer_id)
+        ))
+    engine.dispose()
+    return _training_data(rows, products, customers, watermark, total_reviews)
+
+
+# ============================================================================
+# MONGODB ($group, $lookup, cursor batches)
+# ============================================================================
+
+def _mongo_rating_stats(db, name, key):
+    """Collection of rating sum/count per `key` (as _id), aggregated by the server
+
+    $out writes a real collection in the live database; callers give it a
+    unique name and drop it when done.
+    """
+    db.product_reviews.aggregate([
+        {'$group': {'_id': f'${key}', 'rating_sum': {'$sum': '$rating'}, 'rating_count': {'$sum': 1}}},
+        {'$out': name},
+    ], allowDiskUse=True)
+
+
+def _mongo_lookup(collection, local_field, foreign_field, alias):
+    return [
+        {'$lookup': {'from': collection, 'localField': local_field, 'foreignField': foreign_field, 'as': alias}},
+        {'$unwind': f'${alias}'},
+    ]
+
+
+def _mongo_mean(alias):
+    return {'$divide': [f'${alias}.rating_sum', f'${alias}.rating_count']}
+
+
+def _mongo_frame(collection, pipeline):
+    cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=CHUNK_SIZE)
+    chunks, batch = [], []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) == CHUNK_SIZE:
+            chunks.append(pd.DataFrame(batch))
+            batch = []
+    chunks.append(pd.DataFrame(batch))
+    return _concat(chunks)
+
+
+def load_mongo(url, database, sample_size, client=None):
+    from pymongo import MongoClient
+
+    client = client or MongoClient(url)
+    db = client[database]
+    total_reviews = db.product_reviews.count_documents({})
+    latest = db.product_reviews.find_one({}, {'review_id': 1}, sort=[('review_id', -1)])
+    watermark = int(latest['review_id']) if latest else 0
+
+    # Suffixed per run so concurrent loads never share (or drop) each other's
+    # collections; dropped in the finally below even if a later step fails
+    run_id = uuid.uuid4().hex[:12]
+    product_stats = f'training_product_stats_{run_id}'
+    customer_stats = f'training_customer_stats_{run_id}'
+    try:
+        return _load_mongo_with_stats(db, product_stats, customer_stats, sample_size,
+                                      watermark, total_reviews)
+    finally:
+        db.drop_collection(product_stats)
+        db.drop_collection(customer_stats)
+
+
+def _load_mongo_with_stats(db, product_stats, customer_stats, sample_size, watermark, total_reviews):
+    print(f'Aggregating rating stats over {total_reviews} reviews in the database...')
+    _mongo_rating_stats(db, product_stats, 'product_id')
+    _mongo_rating_stats(db, customer_stats, 'customer_id')
+
+    pipeline = [{'$sample': {'size': sample_size}}] if sample_size and sample_size < total_reviews else []
+    pipeline += (_mongo_lookup('products', 'product_id', 'product_id', 'product')
+                 + _mongo_lookup('customers', 'customer_id', 'customer_id', 'customer')
+                 + _mongo_lookup(product_stats, 'product_id', '_id', 'product_stats')
+                 + _mongo_lookup(customer_stats, 'customer_id', '_id', 'customer_stats'))
+    pipeline.append({'$project': {
+        '_id': 0, 'rating': 1, 'price': '$product.price', 'category': '$product.category',
+        'brand': '$product.brand', 'gender': '$customer.gender', 'country': '$customer.country',
+        'mean_product_avg': _mongo_mean('product_stats'), 'count_product_avg': '$product_stats.rating_count',
+        'mean_customer_avg': _mongo_mean('customer_stats'), 'count_customer_avg': '$customer_stats.rating_count',
+    }})
+    print(f'Streaming {sample_size or "all"} joined training rows...')
+    rows = _mongo_frame(db.product_reviews, pipeline)
+
+    # Entities without reviews keep null stats (preserveNullAndEmptyArrays)
+    def with_stats(stats, key, prefix, fields):
+        return [
+            {'$lookup': {'from': stats, 'localField': key, 'foreignField': '_id', 'as': 'stats'}},
+            {'$unwind': {'path': '$stats', 'preserveNullAndEmptyArrays': True}},
+            {'$project': {'_id': 0, **{f: 1 for f in fields},
+                          f'mean_{prefix}_avg': _mongo_mean('stats'),
+                          f'count_{prefix}_avg': '$stats.rating_count'}},
+        ]
+
+    products = _mongo_frame(db.products, with_stats(product_stats, 'product_id', 'product', PRODUCT_DTYPES))
+    customers = _mongo_frame(db.customers, with_stats(customer_stats, 'customer_id', 'customer', CUSTOMER_DTYPES))
+    return _training_data(rows[TRAINING_COLUMNS], products, customers, watermark, total_reviews)
+
+
+def _training_data(rows, products, customers, watermark, total_reviews):
+    products, product_stats = _split_entity_frame(products, 'product_id', 'product', PRODUCT_DTYPES)
+    customers, customer_stats = _split_entity_frame(customers, 'customer_id', 'customer', CUSTOMER_DTYPES)
+    rows['rating'] = rows['rating'].astype(np.float32)
+    return TrainingData(rows, products, customers, product_stats, customer_stats, watermark, total_reviews)
+
+
+def load_training_data(source, sample_size, seed=42, argv=()):
+    """TrainingData from --source sql or mongo (connection options as load_dataset.py)"""
+    argv = list(argv)
+
+    def option(flag, default):
+        return argv[argv.index(flag) + 1] if flag in argv else default
+
+    if source == 'sql':
+        url = option('--postgres-url', os.getenv('DATABASE_URL'))
+        if not url:
+            raise SystemExit('Postgres URL missing: pass --postgres-url or set DATABASE_URL')
+        return load_sql(url, sample_size, seed)
+    return load_mongo(option('--mongo-url', os.getenv('MONGODB_URL', 'mongodb://localhost:27017')),
+                      option('--database', os.getenv('DATABASE_NAME', 'ecommerce_db')), sample_size)
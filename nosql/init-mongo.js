@@ -21,7 +21,8 @@ db.products.createIndex({ "category": 1 });
 
 db.createCollection('orders');
 db.orders.createIndex({ "order_id": 1 }, { unique: true });
-db.orders.createIndex({ "customer_id": 1 });
+// Per-customer / per-product lists page by the id in the second field
+db.orders.createIndex({ "customer_id": 1, "order_id": 1 });
 
 db.createCollection('order_items');
 db.order_items.createIndex({ "order_item_id": 1 }, { unique: true });
@@ -30,5 +31,6 @@ db.order_items.createIndex({ "product_id": 1 });
 
 db.createCollection('product_reviews');
 db.product_reviews.createIndex({ "review_id": 1 }, { unique: true });
-db.product_reviews.createIndex({ "product_id": 1 });
-db.product_reviews.createIndex({ "customer_id": 1 });
\ No newline at end of file
+// Per-customer / per-product lists page by the id in the second field
+db.product_reviews.createIndex({ "product_id": 1, "review_id": 1 });
+db.product_reviews.createIndex({ "customer_id": 1, "review_id": 1 });
\ No newline at end of file
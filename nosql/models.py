@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 
 class CustomerBase(BaseModel):
@@ -23,6 +23,18 @@ class CustomerUpdate(BaseModel):
 class Customer(CustomerBase):
     id: Optional[str] = Field(default=None, alias="_id")
 
+class CustomerPartial(BaseModel):
+    """Any subset of Customer's fields, for responses narrowed with fields="""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+    customer_id: Optional[int] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    gender: Optional[str] = None
+    signup_date: Optional[datetime] = None
+    country: Optional[str] = None
+
 class ProductBase(BaseModel):
     product_id: int
     product_name: str
@@ -44,6 +56,18 @@ class ProductUpdate(BaseModel):
 class Product(ProductBase):
     id: Optional[str] = Field(default=None, alias="_id")
 
+class ProductPartial(BaseModel):
+    """Any subset of Product's fields, for responses narrowed with fields="""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+    product_id: Optional[int] = None
+    product_name: Optional[str] = None
+    category: Optional[str] = None
+    price: Optional[float] = None
+    stock_quantity: Optional[int] = None
+    brand: Optional[str] = None
+
 class OrderBase(BaseModel):
     order_id: int
     customer_id: int
@@ -65,6 +89,18 @@ class OrderUpdate(BaseModel):
 class Order(OrderBase):
     id: Optional[str] = Field(default=None, alias="_id")
 
+class OrderPartial(BaseModel):
+    """Any subset of Order's fields, for responses narrowed with fields="""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+    order_id: Optional[int] = None
+    customer_id: Optional[int] = None
+    order_date: Optional[datetime] = None
+    total_amount: Optional[float] = None
+    payment_method: Optional[str] = None
+    shipping_country: Optional[str] = None
+
 class OrderItemBase(BaseModel):
     order_item_id: int
     order_id: int
@@ -84,6 +120,17 @@ class OrderItemUpdate(BaseModel):
 class OrderItem(OrderItemBase):
     id: Optional[str] = Field(default=None, alias="_id")
 
+class OrderItemPartial(BaseModel):
+    """Any subset of OrderItem's fields, for responses narrowed with fields="""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+    order_item_id: Optional[int] = None
+    order_id: Optional[int] = None
+    product_id: Optional[int] = None
+    quantity: Optional[int] = None
+    unit_price: Optional[float] = None
+
 class ProductReviewBase(BaseModel):
     review_id: int
     product_id: int
@@ -103,4 +150,49 @@ class ProductReviewUpdate(BaseModel):
     review_date: Optional[datetime] = None
 
 class ProductReview(ProductReviewBase):
-    id: Optional[str] = Field(default=None, alias="_id")
\ No newline at end of file
+    id: Optional[str] = Field(default=None, alias="_id")
+
+class ProductReviewPartial(BaseModel):
+    """Any subset of ProductReview's fields, for responses narrowed with fields="""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+    review_id: Optional[int] = None
+    product_id: Optional[int] = None
+    customer_id: Optional[int] = None
+    rating: Optional[int] = None
+    review_text: Optional[str] = None
+    review_date: Optional[datetime] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # inserted, updated or error; deleted or not_found on DELETE /bulk
+    id: Optional[str] = Field(default=None, alias="_id")
+    error: Optional[str] = None
+
+class BulkWriteResponse(BaseModel):
+    inserted: int
+    updated: int
+    failed: int
+    results: List[BulkItemResult]
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    not_found: int
+    results: List[BulkItemResult]
+
+class RatingStats(BaseModel):
+    mean_rating: Optional[float]
+    review_count: int
+    histogram: Dict[int, int]  # rating -> number of reviews
+
+class ProductRatingStats(RatingStats):
+    product_id: int
+
+class CustomerRatingStats(RatingStats):
+    customer_id: int
+
+class TopRatedProduct(BaseModel):
+    product_id: int
+    mean_rating: float
+    review_count: int
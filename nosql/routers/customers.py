@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from database import get_database
-from models import Customer, CustomerCreate, CustomerUpdate
+from models import BulkDeleteResponse, BulkWriteResponse, Customer, CustomerCreate, CustomerUpdate
 from services import CustomerService
+from services.base import (DEFAULT_BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ITEMS, NEXT_CURSOR_HEADER,
+                           InvalidCursor)
+from .fields import fields_query, fields_response
+from .streaming import NDJSON_RESPONSES, accepts_ndjson, ndjson_response, stream_limit
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
 def get_customer_service(database: AsyncIOMotorDatabase = Depends(get_database)) -> CustomerService:
     return CustomerService(database)
 
+customer_fields = fields_query(Customer)
+
 @router.post("/", response_model=Customer)
 async def create_customer(
     customer: CustomerCreate,
@@ -18,36 +24,76 @@ async def create_customer(
     """Create a new customer"""
     return await service.create_customer(customer)
 
-@router.get("/", response_model=List[Customer])
+@router.post("/bulk", response_model=BulkWriteResponse, response_model_exclude_none=True)
+async def bulk_write_customers(
+    customers: List[CustomerCreate] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    upsert: bool = Query(True, description="Replace customers whose customer_id exists; false only inserts them"),
+    service: CustomerService = Depends(get_customer_service)
+):
+    """Create or replace many customers in unordered batches, with one result per item"""
+    return await service.bulk_write_customers(customers, batch_size=batch_size, upsert=upsert)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse, response_model_exclude_none=True)
+async def bulk_delete_customers(
+    customer_ids: List[int] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    service: CustomerService = Depends(get_customer_service)
+):
+    """Delete many customers by customer_id in batches, with one result per id"""
+    return await service.bulk_delete_customers(customer_ids, batch_size=batch_size)
+
+@router.get("/", response_model=List[Customer], responses=NDJSON_RESPONSES)
 async def get_customers(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, use cursor; ignored when cursor is given"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(customer_fields),
     service: CustomerService = Depends(get_customer_service)
 ):
-    """Get all customers with pagination"""
-    return await service.get_customers(skip=skip, limit=limit)
+    """Get all customers, sorted by customer_id, one page at a time.
+
+    While more customers follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson the customers
+    after skip/cursor are streamed instead, all of them unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_customers(
+                skip=skip, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        customers, next_cursor = await service.get_customers(
+            skip=skip, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(customers, fields, response)
 
 @router.get("/{customer_id}", response_model=Customer)
 async def get_customer(
     customer_id: str,
+    fields: Optional[List[str]] = Depends(customer_fields),
     service: CustomerService = Depends(get_customer_service)
 ):
     """Get a customer by MongoDB ObjectId"""
-    customer = await service.get_customer(customer_id)
+    customer = await service.get_customer(customer_id, fields=fields)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    return fields_response(customer, fields)
 
 @router.get("/by-customer-id/{customer_id}", response_model=Customer)
 async def get_customer_by_customer_id(
     customer_id: int,
+    fields: Optional[List[str]] = Depends(customer_fields),
     service: CustomerService = Depends(get_customer_service)
 ):
     """Get a customer by their customer_id"""
-    customer = await service.get_customer_by_customer_id(customer_id)
+    customer = await service.get_customer_by_customer_id(customer_id, fields=fields)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    return fields_response(customer, fields)
 
 @router.put("/{customer_id}", response_model=Customer)
 async def update_customer(
@@ -0,0 +1,45 @@
+"""fields= query parameter narrowing read responses to some document fields
+
+?fields=rating,product_id becomes the MongoDB projection {rating: 1,
+product_id: 1, _id: 0}, so only those fields leave the server and are
+decoded. Routes keep their full response_model (validation and the OpenAPI
+schema stay as they are); only a projected read is returned through
+fields_response, as the *Partial models, which allow any subset.
+"""
+from typing import List, Optional
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+def fields_query(model):
+    """Dependency parsing ?fields=a,b into a list of `model` field names;
+    None (whole documents) when the parameter is absent"""
+    allowed = ["_id"] + [name for name in model.model_fields if name != "id"]
+
+    def parse_fields(
+        fields: Optional[str] = Query(None, description=f"Comma-separated fields to return: {', '.join(allowed)}")
+    ) -> Optional[List[str]]:
+        if fields is None:
+            return None
+        names = ["_id" if name == "id" else name for name in (part.strip() for part in fields.split(",")) if name]
+        unknown = [name for name in names if name not in allowed]
+        if not names or unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}; "
+                                       f"choose from {', '.join(allowed)}")
+        return names
+
+    return parse_fields
+
+def fields_response(documents, fields, response=None):
+    """`documents` unchanged for a whole-document read; with fields=, a
+    JSONResponse of just the projected fields.
+
+    A projected read would fail the route's full response_model, so it is
+    returned directly instead; headers already set on `response` (such as
+    the next cursor) are carried over.
+    """
+    if not fields:
+        return documents
+    return JSONResponse(jsonable_encoder(documents, by_alias=True, exclude_unset=True),
+                        headers=dict(response.headers) if response is not None else None)
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from database import get_database
-from models import OrderItem, OrderItemCreate, OrderItemUpdate
+from models import BulkDeleteResponse, BulkWriteResponse, OrderItem, OrderItemCreate, OrderItemUpdate
 from services import OrderItemService
+from services.base import (DEFAULT_BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ITEMS, NEXT_CURSOR_HEADER,
+                           InvalidCursor)
+from .fields import fields_query, fields_response
+from .streaming import NDJSON_RESPONSES, accepts_ndjson, ndjson_response, stream_limit
 
 router = APIRouter(prefix="/order-items", tags=["order-items"])
 
 def get_order_item_service(database: AsyncIOMotorDatabase = Depends(get_database)) -> OrderItemService:
     return OrderItemService(database)
 
+order_item_fields = fields_query(OrderItem)
+
 @router.post("/", response_model=OrderItem)
 async def create_order_item(
     order_item: OrderItemCreate,
@@ -18,33 +24,76 @@ async def create_order_item(
     """Create a new order item"""
     return await service.create_order_item(order_item)
 
-@router.get("/", response_model=List[OrderItem])
+@router.post("/bulk", response_model=BulkWriteResponse, response_model_exclude_none=True)
+async def bulk_write_order_items(
+    order_items: List[OrderItemCreate] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    upsert: bool = Query(True, description="Replace order items whose order_item_id exists; false only inserts them"),
+    service: OrderItemService = Depends(get_order_item_service)
+):
+    """Create or replace many order items in unordered batches, with one result per item"""
+    return await service.bulk_write_order_items(order_items, batch_size=batch_size, upsert=upsert)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse, response_model_exclude_none=True)
+async def bulk_delete_order_items(
+    order_item_ids: List[int] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    service: OrderItemService = Depends(get_order_item_service)
+):
+    """Delete many order items by order_item_id in batches, with one result per id"""
+    return await service.bulk_delete_order_items(order_item_ids, batch_size=batch_size)
+
+@router.get("/", response_model=List[OrderItem], responses=NDJSON_RESPONSES)
 async def get_order_items(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, use cursor; ignored when cursor is given"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(order_item_fields),
     service: OrderItemService = Depends(get_order_item_service)
 ):
-    """Get all order items with pagination"""
-    return await service.get_order_items(skip=skip, limit=limit)
+    """Get all order items, sorted by order_item_id, one page at a time.
 
-@router.get("/order/{order_id}", response_model=List[OrderItem])
+    While more order items follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson the order items
+    after skip/cursor are streamed instead, all of them unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_order_items(
+                skip=skip, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        order_items, next_cursor = await service.get_order_items(
+            skip=skip, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(order_items, fields, response)
+
+@router.get("/order/{order_id}", response_model=List[OrderItem], responses=NDJSON_RESPONSES)
 async def get_order_items_by_order(
     order_id: int,
+    request: Request,
+    fields: Optional[List[str]] = Depends(order_item_fields),
     service: OrderItemService = Depends(get_order_item_service)
 ):
-    """Get order items by order ID"""
-    return await service.get_order_items_by_order(order_id)
+    """Get order items by order ID (streamed with Accept: application/x-ndjson)"""
+    if accepts_ndjson(request):
+        return ndjson_response(service.stream_order_items_by_order(order_id, fields=fields))
+    return fields_response(await service.get_order_items_by_order(order_id, fields=fields), fields)
 
 @router.get("/{order_item_id}", response_model=OrderItem)
 async def get_order_item(
     order_item_id: str,
+    fields: Optional[List[str]] = Depends(order_item_fields),
     service: OrderItemService = Depends(get_order_item_service)
 ):
     """Get an order item by MongoDB ObjectId"""
-    order_item = await service.get_order_item(order_item_id)
+    order_item = await service.get_order_item(order_item_id, fields=fields)
     if not order_item:
         raise HTTPException(status_code=404, detail="Order item not found")
-    return order_item
+    return fields_response(order_item, fields)
 
 @router.put("/{order_item_id}", response_model=OrderItem)
 async def update_order_item(
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from database import get_database
-from models import Order, OrderCreate, OrderUpdate
+from models import BulkDeleteResponse, BulkWriteResponse, Order, OrderCreate, OrderUpdate
 from services import OrderService
+from services.base import (DEFAULT_BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ITEMS, NEXT_CURSOR_HEADER,
+                           InvalidCursor)
+from .fields import fields_query, fields_response
+from .streaming import NDJSON_RESPONSES, accepts_ndjson, ndjson_response, stream_limit
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 def get_order_service(database: AsyncIOMotorDatabase = Depends(get_database)) -> OrderService:
     return OrderService(database)
 
+order_fields = fields_query(Order)
+
 @router.post("/", response_model=Order)
 async def create_order(
     order: OrderCreate,
@@ -18,44 +24,104 @@ async def create_order(
     """Create a new order"""
     return await service.create_order(order)
 
-@router.get("/", response_model=List[Order])
+@router.post("/bulk", response_model=BulkWriteResponse, response_model_exclude_none=True)
+async def bulk_write_orders(
+    orders: List[OrderCreate] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    upsert: bool = Query(True, description="Replace orders whose order_id exists; false only inserts them"),
+    service: OrderService = Depends(get_order_service)
+):
+    """Create or replace many orders in unordered batches, with one result per item"""
+    return await service.bulk_write_orders(orders, batch_size=batch_size, upsert=upsert)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse, response_model_exclude_none=True)
+async def bulk_delete_orders(
+    order_ids: List[int] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    service: OrderService = Depends(get_order_service)
+):
+    """Delete many orders by order_id in batches, with one result per id"""
+    return await service.bulk_delete_orders(order_ids, batch_size=batch_size)
+
+@router.get("/", response_model=List[Order], responses=NDJSON_RESPONSES)
 async def get_orders(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, use cursor; ignored when cursor is given"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(order_fields),
     service: OrderService = Depends(get_order_service)
 ):
-    """Get all orders with pagination"""
-    return await service.get_orders(skip=skip, limit=limit)
+    """Get all orders, sorted by order_id, one page at a time.
+
+    While more orders follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson the orders
+    after skip/cursor are streamed instead, all of them unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_orders(
+                skip=skip, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        orders, next_cursor = await service.get_orders(
+            skip=skip, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(orders, fields, response)
 
-@router.get("/customer/{customer_id}", response_model=List[Order])
+@router.get("/customer/{customer_id}", response_model=List[Order], responses=NDJSON_RESPONSES)
 async def get_orders_by_customer(
     customer_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(order_fields),
     service: OrderService = Depends(get_order_service)
 ):
-    """Get orders by customer ID"""
-    return await service.get_orders_by_customer(customer_id)
+    """Get a customer's orders, sorted by order_id, one page at a time.
+
+    While more orders follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson they are
+    streamed instead, all of them after cursor unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_orders_by_customer(
+                customer_id, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        orders, next_cursor = await service.get_orders_by_customer(
+            customer_id, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(orders, fields, response)
 
 @router.get("/{order_id}", response_model=Order)
 async def get_order(
     order_id: str,
+    fields: Optional[List[str]] = Depends(order_fields),
     service: OrderService = Depends(get_order_service)
 ):
     """Get an order by MongoDB ObjectId"""
-    order = await service.get_order(order_id)
+    order = await service.get_order(order_id, fields=fields)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return fields_response(order, fields)
 
 @router.get("/by-order-id/{order_id}", response_model=Order)
 async def get_order_by_order_id(
     order_id: int,
+    fields: Optional[List[str]] = Depends(order_fields),
     service: OrderService = Depends(get_order_service)
 ):
     """Get an order by their order_id"""
-    order = await service.get_order_by_order_id(order_id)
+    order = await service.get_order_by_order_id(order_id, fields=fields)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return fields_response(order, fields)
 
 @router.put("/{order_id}", response_model=Order)
 async def update_order(
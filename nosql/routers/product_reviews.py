@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from database import get_database
-from models import ProductReview, ProductReviewCreate, ProductReviewUpdate
+from models import (BulkDeleteResponse, BulkWriteResponse, CustomerRatingStats, ProductRatingStats, ProductReview,
+                    ProductReviewCreate, ProductReviewUpdate, TopRatedProduct)
 from services import ProductReviewService
+from services.base import (DEFAULT_BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ITEMS, NEXT_CURSOR_HEADER,
+                           InvalidCursor)
+from .fields import fields_query, fields_response
+from .streaming import NDJSON_RESPONSES, accepts_ndjson, ndjson_response, stream_limit
 
 router = APIRouter(prefix="/product-reviews", tags=["product-reviews"])
 
 def get_product_review_service(database: AsyncIOMotorDatabase = Depends(get_database)) -> ProductReviewService:
     return ProductReviewService(database)
 
+product_review_fields = fields_query(ProductReview)
+
 @router.post("/", response_model=ProductReview)
 async def create_product_review(
     product_review: ProductReviewCreate,
@@ -18,41 +25,145 @@ async def create_product_review(
     """Create a new product review"""
     return await service.create_product_review(product_review)
 
-@router.get("/", response_model=List[ProductReview])
+@router.post("/bulk", response_model=BulkWriteResponse, response_model_exclude_none=True)
+async def bulk_write_product_reviews(
+    product_reviews: List[ProductReviewCreate] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    upsert: bool = Query(True, description="Replace product reviews whose review_id exists; false only inserts them"),
+    service: ProductReviewService = Depends(get_product_review_service)
+):
+    """Create or replace many product reviews in unordered batches, with one result per item"""
+    return await service.bulk_write_product_reviews(product_reviews, batch_size=batch_size, upsert=upsert)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse, response_model_exclude_none=True)
+async def bulk_delete_product_reviews(
+    review_ids: List[int] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    service: ProductReviewService = Depends(get_product_review_service)
+):
+    """Delete many product reviews by review_id in batches, with one result per id"""
+    return await service.bulk_delete_product_reviews(review_ids, batch_size=batch_size)
+
+@router.get("/", response_model=List[ProductReview], responses=NDJSON_RESPONSES)
 async def get_product_reviews(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, use cursor; ignored when cursor is given"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_review_fields),
     service: ProductReviewService = Depends(get_product_review_service)
 ):
-    """Get all product reviews with pagination"""
-    return await service.get_product_reviews(skip=skip, limit=limit)
+    """Get all product reviews, sorted by review_id, one page at a time.
+
+    While more product reviews follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson the product reviews
+    after skip/cursor are streamed instead, all of them unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_product_reviews(
+                skip=skip, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        product_reviews, next_cursor = await service.get_product_reviews(
+            skip=skip, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(product_reviews, fields, response)
 
-@router.get("/product/{product_id}", response_model=List[ProductReview])
+@router.get("/product/{product_id}", response_model=List[ProductReview], responses=NDJSON_RESPONSES)
 async def get_reviews_by_product(
     product_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_review_fields),
     service: ProductReviewService = Depends(get_product_review_service)
 ):
-    """Get reviews by product ID"""
-    return await service.get_reviews_by_product(product_id)
+    """Get a product's reviews, sorted by review_id, one page at a time.
 
-@router.get("/customer/{customer_id}", response_model=List[ProductReview])
+    While more reviews follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson they are
+    streamed instead, all of them after cursor unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_reviews_by_product(
+                product_id, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        product_reviews, next_cursor = await service.get_reviews_by_product(
+            product_id, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(product_reviews, fields, response)
+
+@router.get("/customer/{customer_id}", response_model=List[ProductReview], responses=NDJSON_RESPONSES)
 async def get_reviews_by_customer(
     customer_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_review_fields),
+    service: ProductReviewService = Depends(get_product_review_service)
+):
+    """Get a customer's reviews, sorted by review_id, one page at a time.
+
+    While more reviews follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson they are
+    streamed instead, all of them after cursor unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_reviews_by_customer(
+                customer_id, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        product_reviews, next_cursor = await service.get_reviews_by_customer(
+            customer_id, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(product_reviews, fields, response)
+
+@router.get("/stats/product/{product_id}", response_model=ProductRatingStats)
+async def get_product_rating_stats(
+    product_id: int,
+    service: ProductReviewService = Depends(get_product_review_service)
+):
+    """Mean rating, review count and rating histogram of a product"""
+    return await service.get_product_rating_stats(product_id)
+
+@router.get("/stats/customer/{customer_id}", response_model=CustomerRatingStats)
+async def get_customer_rating_stats(
+    customer_id: int,
+    service: ProductReviewService = Depends(get_product_review_service)
+):
+    """Mean rating, review count and rating histogram of a customer's reviews"""
+    return await service.get_customer_rating_stats(customer_id)
+
+@router.get("/stats/top-products", response_model=List[TopRatedProduct])
+async def get_top_rated_products(
+    limit: int = Query(10, ge=1, le=100),
+    min_count: int = Query(1, ge=1, description="Only rank products with at least this many reviews"),
     service: ProductReviewService = Depends(get_product_review_service)
 ):
-    """Get reviews by customer ID"""
-    return await service.get_reviews_by_customer(customer_id)
+    """Products with the highest mean rating"""
+    return await service.get_top_rated_products(limit=limit, min_count=min_count)
 
 @router.get("/{review_id}", response_model=ProductReview)
 async def get_product_review(
     review_id: str,
+    fields: Optional[List[str]] = Depends(product_review_fields),
     service: ProductReviewService = Depends(get_product_review_service)
 ):
     """Get a product review by MongoDB ObjectId"""
-    review = await service.get_product_review(review_id)
+    review = await service.get_product_review(review_id, fields=fields)
     if not review:
         raise HTTPException(status_code=404, detail="Product review not found")
-    return review
+    return fields_response(review, fields)
 
 @router.put("/{review_id}", response_model=ProductReview)
 async def update_product_review(
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from database import get_database
-from models import Product, ProductCreate, ProductUpdate
+from models import BulkDeleteResponse, BulkWriteResponse, Product, ProductCreate, ProductUpdate
 from services import ProductService
+from services.base import (DEFAULT_BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ITEMS, NEXT_CURSOR_HEADER,
+                           InvalidCursor)
+from .fields import fields_query, fields_response
+from .streaming import NDJSON_RESPONSES, accepts_ndjson, ndjson_response, stream_limit
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 def get_product_service(database: AsyncIOMotorDatabase = Depends(get_database)) -> ProductService:
     return ProductService(database)
 
+product_fields = fields_query(Product)
+
 @router.post("/", response_model=Product)
 async def create_product(
     product: ProductCreate,
@@ -18,44 +24,88 @@ async def create_product(
     """Create a new product"""
     return await service.create_product(product)
 
-@router.get("/", response_model=List[Product])
+@router.post("/bulk", response_model=BulkWriteResponse, response_model_exclude_none=True)
+async def bulk_write_products(
+    products: List[ProductCreate] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    upsert: bool = Query(True, description="Replace products whose product_id exists; false only inserts them"),
+    service: ProductService = Depends(get_product_service)
+):
+    """Create or replace many products in unordered batches, with one result per item"""
+    return await service.bulk_write_products(products, batch_size=batch_size, upsert=upsert)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse, response_model_exclude_none=True)
+async def bulk_delete_products(
+    product_ids: List[int] = Body(..., max_length=MAX_BULK_ITEMS),
+    batch_size: int = Query(DEFAULT_BULK_BATCH_SIZE, ge=1, le=MAX_BULK_BATCH_SIZE),
+    service: ProductService = Depends(get_product_service)
+):
+    """Delete many products by product_id in batches, with one result per id"""
+    return await service.bulk_delete_products(product_ids, batch_size=batch_size)
+
+@router.get("/", response_model=List[Product], responses=NDJSON_RESPONSES)
 async def get_products(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated, use cursor; ignored when cursor is given"),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[List[str]] = Depends(product_fields),
     service: ProductService = Depends(get_product_service)
 ):
-    """Get all products with pagination"""
-    return await service.get_products(skip=skip, limit=limit)
+    """Get all products, sorted by product_id, one page at a time.
+
+    While more products follow, the X-Next-Cursor response header holds the
+    cursor of the next page. With Accept: application/x-ndjson the products
+    after skip/cursor are streamed instead, all of them unless limit is given.
+    """
+    try:
+        if accepts_ndjson(request):
+            return ndjson_response(service.stream_products(
+                skip=skip, limit=stream_limit(request, limit), cursor=cursor, fields=fields))
+        products, next_cursor = await service.get_products(
+            skip=skip, limit=limit, cursor=cursor, fields=fields)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return fields_response(products, fields, response)
 
-@router.get("/category/{category}", response_model=List[Product])
+@router.get("/category/{category}", response_model=List[Product], responses=NDJSON_RESPONSES)
 async def get_products_by_category(
     category: str,
+    request: Request,
+    fields: Optional[List[str]] = Depends(product_fields),
     service: ProductService = Depends(get_product_service)
 ):
-    """Get products by category"""
-    return await service.get_products_by_category(category)
+    """Get products by category (streamed with Accept: application/x-ndjson)"""
+    if accepts_ndjson(request):
+        return ndjson_response(service.stream_products_by_category(category, fields=fields))
+    return fields_response(await service.get_products_by_category(category, fields=fields), fields)
 
 @router.get("/{product_id}", response_model=Product)
 async def get_product(
     product_id: str,
+    fields: Optional[List[str]] = Depends(product_fields),
     service: ProductService = Depends(get_product_service)
 ):
     """Get a product by MongoDB ObjectId"""
-    product = await service.get_product(product_id)
+    product = await service.get_product(product_id, fields=fields)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return fields_response(product, fields)
 
 @router.get("/by-product-id/{product_id}", response_model=Product)
 async def get_product_by_product_id(
     product_id: int,
+    fields: Optional[List[str]] = Depends(product_fields),
     service: ProductService = Depends(get_product_service)
 ):
     """Get a product by their product_id"""
-    product = await service.get_product_by_product_id(product_id)
+    product = await service.get_product_by_product_id(product_id, fields=fields)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return fields_response(product, fields)
 
 @router.put("/{product_id}", response_model=Product)
 async def update_product(
@@ -0,0 +1,24 @@
+"""NDJSON streaming for the list endpoints
+
+Requests sent with `Accept: application/x-ndjson` get the documents as
+newline-delimited JSON, written batch by batch as the cursor returns them,
+instead of a JSON array that is built and validated in memory first.
+"""
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Documents the alternative media type in the OpenAPI schema
+NDJSON_RESPONSES = {200: {"content": {NDJSON_MEDIA_TYPE: {}},
+                          "description": f"JSON array, or one document per line with Accept: {NDJSON_MEDIA_TYPE}"}}
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(lines) -> StreamingResponse:
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
+
+def stream_limit(request: Request, limit: int):
+    """A stream covers everything after skip/cursor unless limit was given explicitly"""
+    return limit if "limit" in request.query_params else None
@@ -1,7 +1,188 @@
 """Base service class and utilities for all services"""
+import base64
+import binascii
+import json
+import os
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
 
 def convert_objectid_to_string(document):
     """Convert ObjectId to string in a document"""
     if document and "_id" in document:
         document["_id"] = str(document["_id"])
-    return document
\ No newline at end of file
+    return document
+
+# Response header carrying the next page's cursor on paginated list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that was not issued for this collection"""
+
+def encode_cursor(field, value):
+    """Opaque token for the page after the document whose `field` is `value`"""
+    token = json.dumps([field, value], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+def decode_cursor(cursor, field):
+    """The last `field` value of the previous page, from a token made by encode_cursor"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_field, value = json.loads(token)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if cursor_field != field or not isinstance(value, int):
+        raise InvalidCursor(cursor)
+    return value
+
+# Documents fetched per round trip when streaming a cursor as NDJSON
+STREAM_BATCH_SIZE = 1000
+
+def projection(fields, key=None):
+    """find() projection returning only `fields` (plus `key`, when given);
+    None returns whole documents. _id is left out unless asked for."""
+    if not fields:
+        return None
+    spec = {field: 1 for field in fields}
+    if key:
+        spec[key] = 1
+    spec.setdefault("_id", 0)
+    return spec
+
+def find_sorted(collection, field, skip=0, limit=None, cursor=None, fields=None, query=None):
+    """Cursor over the documents matching `query` (all by default), ordered by
+    the unique indexed `field`, starting after `cursor` (or past the first
+    `skip` documents without one)
+
+    With a cursor the query starts at {field: {$gt: last value}} and walks
+    the index from there, so every page costs the same at any depth. Without
+    one it falls back to skip, which still steps over every skipped entry.
+    With `fields`, only those fields and `field` itself are returned.
+    A `query` needs a compound index on its fields followed by `field` for
+    the same to hold. Raises InvalidCursor right away, before any document
+    is read.
+    """
+    query = dict(query or {})
+    if cursor:
+        query[field] = {"$gt": decode_cursor(cursor, field)}
+    find = collection.find(query, projection(fields, field)).sort(field, 1)
+    if not cursor and skip:
+        find = find.skip(skip)
+    if limit:
+        find = find.limit(limit)
+    return find
+
+async def find_page(collection, field, skip=0, limit=100, cursor=None, fields=None, query=None):
+    """One page of the documents matching `query`, ordered by `field` (see
+    find_sorted), and the cursor of the next page (None on the last page)"""
+    # One extra document tells whether there is a next page
+    documents = await find_sorted(collection, field, skip, limit + 1, cursor, fields,
+                                  query).to_list(length=limit + 1)
+    next_cursor = encode_cursor(field, documents[limit - 1][field]) if len(documents) > limit else None
+    return [convert_objectid_to_string(document) for document in documents[:limit]], next_cursor
+
+async def ndjson_lines(find, model, batch_size=STREAM_BATCH_SIZE):
+    """Serialize a find() cursor as NDJSON, one chunk per fetched batch.
+
+    Only one batch is held at a time, so memory stays flat for any number of
+    documents. Each line is `model` dumped like the JSON list endpoints dump
+    it, with only the fields the documents have.
+    """
+    find = find.batch_size(batch_size)
+    while True:
+        documents = await find.to_list(length=batch_size)
+        if not documents:
+            return
+        yield b"".join(model(**convert_objectid_to_string(document))
+                       .model_dump_json(by_alias=True, exclude_unset=True).encode() + b"\n"
+                       for document in documents)
+
+# Documents per insert_many/bulk_write/delete_many call on the /bulk endpoints
+DEFAULT_BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 1000))
+MAX_BULK_BATCH_SIZE = 10000
+
+# Documents accepted in one /bulk request; the whole array is parsed and
+# held in memory before the first write, so it is capped
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", 100000))
+
+def _write_errors(error):
+    """{batch index: message} from an unordered BulkWriteError"""
+    return {write_error["index"]: write_error["errmsg"] for write_error in error.details["writeErrors"]}
+
+async def _insert_batch(collection, batch):
+    # _ids are assigned here so every inserted document's id is known
+    # without reading it back
+    for document in batch:
+        document["_id"] = ObjectId()
+    try:
+        await collection.insert_many(batch, ordered=False)
+        errors = {}
+    except BulkWriteError as e:
+        errors = _write_errors(e)
+    return [{"status": "error", "error": errors[i]} if i in errors
+            else {"status": "inserted", "_id": str(document["_id"])}
+            for i, document in enumerate(batch)]
+
+async def _upsert_batch(collection, key, batch):
+    operations = [ReplaceOne({key: document[key]}, document, upsert=True) for document in batch]
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        upserted, errors = result.upserted_ids, {}
+    except BulkWriteError as e:
+        upserted = {item["index"]: item["_id"] for item in e.details["upserted"]}
+        errors = _write_errors(e)
+    return [{"status": "error", "error": errors[i]} if i in errors
+            else {"status": "inserted", "_id": str(upserted[i])} if i in upserted
+            else {"status": "updated"}
+            for i in range(len(batch))]
+
+async def bulk_write(collection, key, documents, batch_size=DEFAULT_BULK_BATCH_SIZE, upsert=True):
+    """Write `documents` in unordered batches of `batch_size` and summarize
+    the outcome per document, in input order.
+
+    With upsert each document replaces the one with the same business `key`
+    (or is inserted); without it they are inserted with insert_many and
+    existing keys are reported as errors. Results come from the write
+    acknowledgements alone; nothing is read back. A failed document does not
+    stop the others.
+    """
+    results = []
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        results += await (_upsert_batch(collection, key, batch) if upsert else _insert_batch(collection, batch))
+    for index, result in enumerate(results):
+        result["index"] = index
+    return {
+        "inserted": sum(result["status"] == "inserted" for result in results),
+        "updated": sum(result["status"] == "updated" for result in results),
+        "failed": sum(result["status"] == "error" for result in results),
+        "results": results,
+    }
+
+async def _delete_batch(collection, key, batch):
+    # delete_many only returns a count, so the keys that exist are read first
+    # to tell which values were deleted
+    found = set(await collection.distinct(key, {key: {"$in": batch}}))
+    if found:
+        await collection.delete_many({key: {"$in": list(found)}})
+    results = []
+    for value in batch:
+        # A value repeated in the request is only deleted once
+        results.append({"status": "deleted" if value in found else "not_found"})
+        found.discard(value)
+    return results
+
+async def bulk_delete(collection, key, values, batch_size=DEFAULT_BULK_BATCH_SIZE):
+    """Delete the documents whose business `key` is in `values`, with one
+    delete_many per batch of `batch_size`, and report per value, in input
+    order, whether it was deleted or not found."""
+    results = []
+    for start in range(0, len(values), batch_size):
+        results += await _delete_batch(collection, key, values[start:start + batch_size])
+    for index, result in enumerate(results):
+        result["index"] = index
+    return {
+        "deleted": sum(result["status"] == "deleted" for result in results),
+        "not_found": sum(result["status"] == "not_found" for result in results),
+        "results": results,
+    }
@@ -1,50 +1,77 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import Customer, CustomerCreate, CustomerUpdate
-from .base import convert_objectid_to_string
+from pymongo import ReturnDocument
+from models import BulkDeleteResponse, BulkWriteResponse, Customer, CustomerCreate, CustomerPartial, CustomerUpdate
+from .base import (DEFAULT_BULK_BATCH_SIZE, bulk_delete, bulk_write, convert_objectid_to_string, find_page,
+                   find_sorted, ndjson_lines, projection)
+
+# Whole document, or the fields picked with fields=
+CustomerDocument = Union[Customer, CustomerPartial]
 
 class CustomerService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.collection = database.customers
 
+    @staticmethod
+    def _model(fields):
+        """Document model for a read, partial when narrowed with fields="""
+        return CustomerPartial if fields else Customer
+
     async def create_customer(self, customer: CustomerCreate) -> Customer:
         customer_dict = customer.model_dump()
-        result = await self.collection.insert_one(customer_dict)
-        created_customer = await self.collection.find_one({"_id": result.inserted_id})
-        created_customer = convert_objectid_to_string(created_customer)
-        return Customer(**created_customer)
+        # insert_one sets the new _id on customer_dict, so there is nothing to read back
+        await self.collection.insert_one(customer_dict)
+        return Customer(**convert_objectid_to_string(customer_dict))
+
+    async def bulk_write_customers(self, customers: List[CustomerCreate], batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                                   upsert: bool = True) -> BulkWriteResponse:
+        documents = [customer.model_dump() for customer in customers]
+        return BulkWriteResponse(**await bulk_write(self.collection, "customer_id", documents, batch_size, upsert))
+
+    async def bulk_delete_customers(self, customer_ids: List[int],
+                                    batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> BulkDeleteResponse:
+        return BulkDeleteResponse(**await bulk_delete(self.collection, "customer_id", customer_ids, batch_size))
 
-    async def get_customer(self, customer_id: str) -> Optional[Customer]:
-        customer_data = await self.collection.find_one({"_id": ObjectId(customer_id)})
+    async def get_customer(self, customer_id: str, fields: Optional[List[str]] = None) -> Optional[CustomerDocument]:
+        customer_data = await self.collection.find_one({"_id": ObjectId(customer_id)}, projection(fields))
         if customer_data:
             customer_data = convert_objectid_to_string(customer_data)
-            return Customer(**customer_data)
+            return self._model(fields)(**customer_data)
         return None
 
-    async def get_customer_by_customer_id(self, customer_id: int) -> Optional[Customer]:
-        customer_data = await self.collection.find_one({"customer_id": customer_id})
+    async def get_customer_by_customer_id(self, customer_id: int,
+                                          fields: Optional[List[str]] = None) -> Optional[CustomerDocument]:
+        customer_data = await self.collection.find_one({"customer_id": customer_id}, projection(fields))
         if customer_data:
             customer_data = convert_objectid_to_string(customer_data)
-            return Customer(**customer_data)
+            return self._model(fields)(**customer_data)
         return None
 
-    async def get_customers(self, skip: int = 0, limit: int = 100) -> List[Customer]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        customers = []
-        async for customer_data in cursor:
-            customer_data = convert_objectid_to_string(customer_data)
-            customers.append(Customer(**customer_data))
-        return customers
+    async def get_customers(self, skip: int = 0, limit: int = 100,
+                            cursor: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Tuple[List[CustomerDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "customer_id", skip, limit, cursor, fields)
+        return [self._model(fields)(**customer_data) for customer_data in documents], next_cursor
+
+    def stream_customers(self, skip: int = 0, limit: Optional[int] = None,
+                         cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(find_sorted(self.collection, "customer_id", skip, limit, cursor, fields),
+                            self._model(fields))
 
     async def update_customer(self, customer_id: str, customer_update: CustomerUpdate) -> Optional[Customer]:
         update_data = {k: v for k, v in customer_update.model_dump().items() if v is not None}
-        if update_data:
-            await self.collection.update_one(
-                {"_id": ObjectId(customer_id)}, 
-                {"$set": update_data}
-            )
-        return await self.get_customer(customer_id)
+        if not update_data:
+            return await self.get_customer(customer_id)
+        customer_data = await self.collection.find_one_and_update(
+            {"_id": ObjectId(customer_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if customer_data:
+            return Customer(**convert_objectid_to_string(customer_data))
+        return None
 
     async def delete_customer(self, customer_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(customer_id)})
@@ -1,51 +1,82 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import OrderItem, OrderItemCreate, OrderItemUpdate
-from .base import convert_objectid_to_string
+from pymongo import ReturnDocument
+from models import BulkDeleteResponse, BulkWriteResponse, OrderItem, OrderItemCreate, OrderItemPartial, OrderItemUpdate
+from .base import (DEFAULT_BULK_BATCH_SIZE, bulk_delete, bulk_write, convert_objectid_to_string, find_page,
+                   find_sorted, ndjson_lines, projection)
+
+# Whole document, or the fields picked with fields=
+OrderItemDocument = Union[OrderItem, OrderItemPartial]
 
 class OrderItemService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.collection = database.order_items
 
+    @staticmethod
+    def _model(fields):
+        """Document model for a read, partial when narrowed with fields="""
+        return OrderItemPartial if fields else OrderItem
+
     async def create_order_item(self, order_item: OrderItemCreate) -> OrderItem:
         order_item_dict = order_item.model_dump()
-        result = await self.collection.insert_one(order_item_dict)
-        created_order_item = await self.collection.find_one({"_id": result.inserted_id})
-        created_order_item = convert_objectid_to_string(created_order_item)
-        return OrderItem(**created_order_item)
+        # insert_one sets the new _id on order_item_dict, so there is nothing to read back
+        await self.collection.insert_one(order_item_dict)
+        return OrderItem(**convert_objectid_to_string(order_item_dict))
+
+    async def bulk_write_order_items(self, order_items: List[OrderItemCreate],
+                                     batch_size: int = DEFAULT_BULK_BATCH_SIZE, upsert: bool = True) -> BulkWriteResponse:
+        documents = [order_item.model_dump() for order_item in order_items]
+        return BulkWriteResponse(**await bulk_write(self.collection, "order_item_id", documents, batch_size, upsert))
 
-    async def get_order_item(self, order_item_id: str) -> Optional[OrderItem]:
-        order_item_data = await self.collection.find_one({"_id": ObjectId(order_item_id)})
+    async def bulk_delete_order_items(self, order_item_ids: List[int],
+                                      batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> BulkDeleteResponse:
+        return BulkDeleteResponse(**await bulk_delete(self.collection, "order_item_id", order_item_ids, batch_size))
+
+    async def get_order_item(self, order_item_id: str,
+                             fields: Optional[List[str]] = None) -> Optional[OrderItemDocument]:
+        order_item_data = await self.collection.find_one({"_id": ObjectId(order_item_id)}, projection(fields))
         if order_item_data:
             order_item_data = convert_objectid_to_string(order_item_data)
-            return OrderItem(**order_item_data)
+            return self._model(fields)(**order_item_data)
         return None
 
-    async def get_order_items(self, skip: int = 0, limit: int = 100) -> List[OrderItem]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        order_items = []
-        async for order_item_data in cursor:
-            order_item_data = convert_objectid_to_string(order_item_data)
-            order_items.append(OrderItem(**order_item_data))
-        return order_items
+    async def get_order_items(self, skip: int = 0, limit: int = 100,
+                              cursor: Optional[str] = None,
+                              fields: Optional[List[str]] = None) -> Tuple[List[OrderItemDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "order_item_id", skip, limit, cursor, fields)
+        return [self._model(fields)(**order_item_data) for order_item_data in documents], next_cursor
+
+    def stream_order_items(self, skip: int = 0, limit: Optional[int] = None,
+                           cursor: Optional[str] = None,
+                           fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(find_sorted(self.collection, "order_item_id", skip, limit, cursor, fields),
+                            self._model(fields))
 
-    async def get_order_items_by_order(self, order_id: int) -> List[OrderItem]:
-        cursor = self.collection.find({"order_id": order_id})
+    async def get_order_items_by_order(self, order_id: int,
+                                       fields: Optional[List[str]] = None) -> List[OrderItemDocument]:
+        cursor = self.collection.find({"order_id": order_id}, projection(fields))
         order_items = []
         async for order_item_data in cursor:
             order_item_data = convert_objectid_to_string(order_item_data)
-            order_items.append(OrderItem(**order_item_data))
+            order_items.append(self._model(fields)(**order_item_data))
         return order_items
 
+    def stream_order_items_by_order(self, order_id: int, fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(self.collection.find({"order_id": order_id}, projection(fields)), self._model(fields))
+
     async def update_order_item(self, order_item_id: str, order_item_update: OrderItemUpdate) -> Optional[OrderItem]:
         update_data = {k: v for k, v in order_item_update.model_dump().items() if v is not None}
-        if update_data:
-            await self.collection.update_one(
-                {"_id": ObjectId(order_item_id)}, 
-                {"$set": update_data}
-            )
-        return await self.get_order_item(order_item_id)
+        if not update_data:
+            return await self.get_order_item(order_item_id)
+        order_item_data = await self.collection.find_one_and_update(
+            {"_id": ObjectId(order_item_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if order_item_data:
+            return OrderItem(**convert_objectid_to_string(order_item_data))
+        return None
 
     async def delete_order_item(self, order_item_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(order_item_id)})
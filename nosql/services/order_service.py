@@ -1,58 +1,86 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import Order, OrderCreate, OrderUpdate
-from .base import convert_objectid_to_string
+from pymongo import ReturnDocument
+from models import BulkDeleteResponse, BulkWriteResponse, Order, OrderCreate, OrderPartial, OrderUpdate
+from .base import (DEFAULT_BULK_BATCH_SIZE, bulk_delete, bulk_write, convert_objectid_to_string, find_page,
+                   find_sorted, ndjson_lines, projection)
+
+# Whole document, or the fields picked with fields=
+OrderDocument = Union[Order, OrderPartial]
 
 class OrderService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.collection = database.orders
 
+    @staticmethod
+    def _model(fields):
+        """Document model for a read, partial when narrowed with fields="""
+        return OrderPartial if fields else Order
+
     async def create_order(self, order: OrderCreate) -> Order:
         order_dict = order.model_dump()
-        result = await self.collection.insert_one(order_dict)
-        created_order = await self.collection.find_one({"_id": result.inserted_id})
-        created_order = convert_objectid_to_string(created_order)
-        return Order(**created_order)
+        # insert_one sets the new _id on order_dict, so there is nothing to read back
+        await self.collection.insert_one(order_dict)
+        return Order(**convert_objectid_to_string(order_dict))
+
+    async def bulk_write_orders(self, orders: List[OrderCreate], batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                                upsert: bool = True) -> BulkWriteResponse:
+        documents = [order.model_dump() for order in orders]
+        return BulkWriteResponse(**await bulk_write(self.collection, "order_id", documents, batch_size, upsert))
 
-    async def get_order(self, order_id: str) -> Optional[Order]:
-        order_data = await self.collection.find_one({"_id": ObjectId(order_id)})
+    async def bulk_delete_orders(self, order_ids: List[int],
+                                 batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> BulkDeleteResponse:
+        return BulkDeleteResponse(**await bulk_delete(self.collection, "order_id", order_ids, batch_size))
+
+    async def get_order(self, order_id: str, fields: Optional[List[str]] = None) -> Optional[OrderDocument]:
+        order_data = await self.collection.find_one({"_id": ObjectId(order_id)}, projection(fields))
         if order_data:
             order_data = convert_objectid_to_string(order_data)
-            return Order(**order_data)
+            return self._model(fields)(**order_data)
         return None
 
-    async def get_order_by_order_id(self, order_id: int) -> Optional[Order]:
-        order_data = await self.collection.find_one({"order_id": order_id})
+    async def get_order_by_order_id(self, order_id: int, fields: Optional[List[str]] = None) -> Optional[OrderDocument]:
+        order_data = await self.collection.find_one({"order_id": order_id}, projection(fields))
         if order_data:
             order_data = convert_objectid_to_string(order_data)
-            return Order(**order_data)
+            return self._model(fields)(**order_data)
         return None
 
-    async def get_orders(self, skip: int = 0, limit: int = 100) -> List[Order]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        orders = []
-        async for order_data in cursor:
-            order_data = convert_objectid_to_string(order_data)
-            orders.append(Order(**order_data))
-        return orders
+    async def get_orders(self, skip: int = 0, limit: int = 100,
+                         cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> Tuple[List[OrderDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "order_id", skip, limit, cursor, fields)
+        return [self._model(fields)(**order_data) for order_data in documents], next_cursor
 
-    async def get_orders_by_customer(self, customer_id: int) -> List[Order]:
-        cursor = self.collection.find({"customer_id": customer_id})
-        orders = []
-        async for order_data in cursor:
-            order_data = convert_objectid_to_string(order_data)
-            orders.append(Order(**order_data))
-        return orders
+    def stream_orders(self, skip: int = 0, limit: Optional[int] = None,
+                      cursor: Optional[str] = None,
+                      fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(find_sorted(self.collection, "order_id", skip, limit, cursor, fields), self._model(fields))
+
+    async def get_orders_by_customer(self, customer_id: int, limit: int = 100, cursor: Optional[str] = None,
+                                     fields: Optional[List[str]] = None) -> Tuple[List[OrderDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "order_id", 0, limit, cursor, fields,
+                                                 {"customer_id": customer_id})
+        return [self._model(fields)(**order_data) for order_data in documents], next_cursor
+
+    def stream_orders_by_customer(self, customer_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                  fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        find = find_sorted(self.collection, "order_id", 0, limit, cursor, fields, {"customer_id": customer_id})
+        return ndjson_lines(find, self._model(fields))
 
     async def update_order(self, order_id: str, order_update: OrderUpdate) -> Optional[Order]:
         update_data = {k: v for k, v in order_update.model_dump().items() if v is not None}
-        if update_data:
-            await self.collection.update_one(
-                {"_id": ObjectId(order_id)}, 
-                {"$set": update_data}
-            )
-        return await self.get_order(order_id)
+        if not update_data:
+            return await self.get_order(order_id)
+        order_data = await self.collection.find_one_and_update(
+            {"_id": ObjectId(order_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if order_data:
+            return Order(**convert_objectid_to_string(order_data))
+        return None
 
     async def delete_order(self, order_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(order_id)})
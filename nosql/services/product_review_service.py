@@ -1,59 +1,167 @@
-from typing import List, Optional
+import os
+import time
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import ProductReview, ProductReviewCreate, ProductReviewUpdate
-from .base import convert_objectid_to_string
+from pymongo import ReturnDocument
+from models import (BulkDeleteResponse, BulkWriteResponse, CustomerRatingStats, ProductRatingStats, ProductReview,
+                    ProductReviewCreate, ProductReviewPartial, ProductReviewUpdate, TopRatedProduct)
+from .base import (DEFAULT_BULK_BATCH_SIZE, bulk_delete, bulk_write, convert_objectid_to_string, find_page,
+                   find_sorted, ndjson_lines, projection)
+
+RATINGS = range(1, 6)
+# Reviews counted in rating stats; others have a missing or null rating
+RATED = {"$type": "number"}
+
+# Seconds a top-products result is served from memory before the
+# aggregation runs again; 0 disables the cache
+TOP_PRODUCTS_TTL_SECONDS = float(os.getenv("TOP_PRODUCTS_TTL_SECONDS", 300))
+TOP_PRODUCTS_CACHE_SIZE = 256
+
+# (collection, limit, min_count) -> (monotonic time computed, products)
+_top_products_cache = {}
+
+# Whole document, or the fields picked with fields=
+ProductReviewDocument = Union[ProductReview, ProductReviewPartial]
 
 class ProductReviewService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.collection = database.product_reviews
 
+    @staticmethod
+    def _model(fields):
+        """Document model for a read, partial when narrowed with fields="""
+        return ProductReviewPartial if fields else ProductReview
+
     async def create_product_review(self, product_review: ProductReviewCreate) -> ProductReview:
         product_review_dict = product_review.model_dump()
-        result = await self.collection.insert_one(product_review_dict)
-        created_product_review = await self.collection.find_one({"_id": result.inserted_id})
-        created_product_review = convert_objectid_to_string(created_product_review)
-        return ProductReview(**created_product_review)
+        # insert_one sets the new _id on product_review_dict, so there is nothing to read back
+        await self.collection.insert_one(product_review_dict)
+        return ProductReview(**convert_objectid_to_string(product_review_dict))
+
+    async def bulk_write_product_reviews(self, product_reviews: List[ProductReviewCreate],
+                                         batch_size: int = DEFAULT_BULK_BATCH_SIZE, upsert: bool = True) -> BulkWriteResponse:
+        documents = [product_review.model_dump() for product_review in product_reviews]
+        return BulkWriteResponse(**await bulk_write(self.collection, "review_id", documents, batch_size, upsert))
 
-    async def get_product_review(self, review_id: str) -> Optional[ProductReview]:
-        review_data = await self.collection.find_one({"_id": ObjectId(review_id)})
+    async def bulk_delete_product_reviews(self, review_ids: List[int],
+                                          batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> BulkDeleteResponse:
+        return BulkDeleteResponse(**await bulk_delete(self.collection, "review_id", review_ids, batch_size))
+
+    async def get_product_review(self, review_id: str,
+                                 fields: Optional[List[str]] = None) -> Optional[ProductReviewDocument]:
+        review_data = await self.collection.find_one({"_id": ObjectId(review_id)}, projection(fields))
         if review_data:
             review_data = convert_objectid_to_string(review_data)
-            return ProductReview(**review_data)
+            return self._model(fields)(**review_data)
         return None
 
-    async def get_product_reviews(self, skip: int = 0, limit: int = 100) -> List[ProductReview]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        reviews = []
-        async for review_data in cursor:
-            review_data = convert_objectid_to_string(review_data)
-            reviews.append(ProductReview(**review_data))
-        return reviews
+    async def get_product_reviews(self, skip: int = 0, limit: int = 100,
+                                  cursor: Optional[str] = None,
+                                  fields: Optional[List[str]] = None) -> Tuple[List[ProductReviewDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "review_id", skip, limit, cursor, fields)
+        return [self._model(fields)(**review_data) for review_data in documents], next_cursor
 
-    async def get_reviews_by_product(self, product_id: int) -> List[ProductReview]:
-        cursor = self.collection.find({"product_id": product_id})
-        reviews = []
-        async for review_data in cursor:
-            review_data = convert_objectid_to_string(review_data)
-            reviews.append(ProductReview(**review_data))
-        return reviews
+    def stream_product_reviews(self, skip: int = 0, limit: Optional[int] = None,
+                               cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(find_sorted(self.collection, "review_id", skip, limit, cursor, fields), self._model(fields))
 
-    async def get_reviews_by_customer(self, customer_id: int) -> List[ProductReview]:
-        cursor = self.collection.find({"customer_id": customer_id})
-        reviews = []
-        async for review_data in cursor:
-            review_data = convert_objectid_to_string(review_data)
-            reviews.append(ProductReview(**review_data))
-        return reviews
+    async def get_reviews_by_product(self, product_id: int, limit: int = 100, cursor: Optional[str] = None,
+                                     fields: Optional[List[str]] = None
+                                     ) -> Tuple[List[ProductReviewDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "review_id", 0, limit, cursor, fields,
+                                                 {"product_id": product_id})
+        return [self._model(fields)(**review_data) for review_data in documents], next_cursor
+
+    def stream_reviews_by_product(self, product_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                  fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        find = find_sorted(self.collection, "review_id", 0, limit, cursor, fields, {"product_id": product_id})
+        return ndjson_lines(find, self._model(fields))
+
+    async def get_reviews_by_customer(self, customer_id: int, limit: int = 100, cursor: Optional[str] = None,
+                                      fields: Optional[List[str]] = None
+                                      ) -> Tuple[List[ProductReviewDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "review_id", 0, limit, cursor, fields,
+                                                 {"customer_id": customer_id})
+        return [self._model(fields)(**review_data) for review_data in documents], next_cursor
+
+    def stream_reviews_by_customer(self, customer_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                   fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        find = find_sorted(self.collection, "review_id", 0, limit, cursor, fields, {"customer_id": customer_id})
+        return ndjson_lines(find, self._model(fields))
+
+    async def _rating_stats(self, key: str, value: int) -> dict:
+        """Mean, count and histogram of the ratings of reviews with key == value.
+
+        $match comes first so the product_id / customer_id index selects the
+        reviews, and $group reduces them to at most one row per rating value;
+        mean and count follow from that histogram. Reviews without a numeric
+        rating (partial updates and /bulk can store them) are left out, as
+        AVG leaves out NULL ratings on the SQL side.
+        """
+        histogram = dict.fromkeys(RATINGS, 0)
+        pipeline = [
+            {"$match": {key: value, "rating": RATED}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}},
+        ]
+        async for group in self.collection.aggregate(pipeline):
+            histogram[group["_id"]] = group["count"]
+        review_count = sum(histogram.values())
+        mean_rating = (sum(rating * count for rating, count in histogram.items()) / review_count
+                       if review_count else None)
+        return {"mean_rating": mean_rating, "review_count": review_count, "histogram": histogram}
+
+    async def get_product_rating_stats(self, product_id: int) -> ProductRatingStats:
+        return ProductRatingStats(product_id=product_id, **await self._rating_stats("product_id", product_id))
+
+    async def get_customer_rating_stats(self, customer_id: int) -> CustomerRatingStats:
+        return CustomerRatingStats(customer_id=customer_id, **await self._rating_stats("customer_id", customer_id))
+
+    async def get_top_rated_products(self, limit: int = 10, min_count: int = 1) -> List[TopRatedProduct]:
+        """Products with the highest mean rating among those with at least
+        min_count reviews; ties go to the product with more reviews.
+
+        No index can serve this: $group reads every review in the collection
+        (spilling to disk past 100 MB with allowDiskUse), so the cost grows
+        with the whole collection, not with limit. Results are therefore
+        kept in memory for TOP_PRODUCTS_TTL_SECONDS per (limit, min_count)
+        and may be that much out of date.
+        """
+        key = (self.collection.full_name, limit, min_count)
+        cached = _top_products_cache.get(key)
+        if cached and time.monotonic() - cached[0] < TOP_PRODUCTS_TTL_SECONDS:
+            return cached[1]
+
+        pipeline = [
+            {"$match": {"rating": RATED}},
+            {"$group": {"_id": "$product_id", "mean_rating": {"$avg": "$rating"}, "review_count": {"$sum": 1}}},
+            {"$match": {"review_count": {"$gte": min_count}}},
+            {"$sort": {"mean_rating": -1, "review_count": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+        products = []
+        async for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            products.append(TopRatedProduct(product_id=group["_id"], mean_rating=group["mean_rating"],
+                                            review_count=group["review_count"]))
+        if TOP_PRODUCTS_TTL_SECONDS > 0:
+            if len(_top_products_cache) >= TOP_PRODUCTS_CACHE_SIZE:
+                _top_products_cache.clear()
+            _top_products_cache[key] = (time.monotonic(), products)
+        return products
 
     async def update_product_review(self, review_id: str, review_update: ProductReviewUpdate) -> Optional[ProductReview]:
         update_data = {k: v for k, v in review_update.model_dump().items() if v is not None}
-        if update_data:
-            await self.collection.update_one(
-                {"_id": ObjectId(review_id)}, 
-                {"$set": update_data}
-            )
-        return await self.get_product_review(review_id)
+        if not update_data:
+            return await self.get_product_review(review_id)
+        review_data = await self.collection.find_one_and_update(
+            {"_id": ObjectId(review_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if review_data:
+            return ProductReview(**convert_objectid_to_string(review_data))
+        return None
 
     async def delete_product_review(self, review_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(review_id)})
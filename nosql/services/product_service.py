@@ -1,58 +1,89 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import Product, ProductCreate, ProductUpdate
-from .base import convert_objectid_to_string
+from pymongo import ReturnDocument
+from models import BulkDeleteResponse, BulkWriteResponse, Product, ProductCreate, ProductPartial, ProductUpdate
+from .base import (DEFAULT_BULK_BATCH_SIZE, bulk_delete, bulk_write, convert_objectid_to_string, find_page,
+                   find_sorted, ndjson_lines, projection)
+
+# Whole document, or the fields picked with fields=
+ProductDocument = Union[Product, ProductPartial]
 
 class ProductService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.collection = database.products
 
+    @staticmethod
+    def _model(fields):
+        """Document model for a read, partial when narrowed with fields="""
+        return ProductPartial if fields else Product
+
     async def create_product(self, product: ProductCreate) -> Product:
         product_dict = product.model_dump()
-        result = await self.collection.insert_one(product_dict)
-        created_product = await self.collection.find_one({"_id": result.inserted_id})
-        created_product = convert_objectid_to_string(created_product)
-        return Product(**created_product)
+        # insert_one sets the new _id on product_dict, so there is nothing to read back
+        await self.collection.insert_one(product_dict)
+        return Product(**convert_objectid_to_string(product_dict))
+
+    async def bulk_write_products(self, products: List[ProductCreate], batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+                                  upsert: bool = True) -> BulkWriteResponse:
+        documents = [product.model_dump() for product in products]
+        return BulkWriteResponse(**await bulk_write(self.collection, "product_id", documents, batch_size, upsert))
 
-    async def get_product(self, product_id: str) -> Optional[Product]:
-        product_data = await self.collection.find_one({"_id": ObjectId(product_id)})
+    async def bulk_delete_products(self, product_ids: List[int],
+                                   batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> BulkDeleteResponse:
+        return BulkDeleteResponse(**await bulk_delete(self.collection, "product_id", product_ids, batch_size))
+
+    async def get_product(self, product_id: str, fields: Optional[List[str]] = None) -> Optional[ProductDocument]:
+        product_data = await self.collection.find_one({"_id": ObjectId(product_id)}, projection(fields))
         if product_data:
             product_data = convert_objectid_to_string(product_data)
-            return Product(**product_data)
+            return self._model(fields)(**product_data)
         return None
 
-    async def get_product_by_product_id(self, product_id: int) -> Optional[Product]:
-        product_data = await self.collection.find_one({"product_id": product_id})
+    async def get_product_by_product_id(self, product_id: int,
+                                        fields: Optional[List[str]] = None) -> Optional[ProductDocument]:
+        product_data = await self.collection.find_one({"product_id": product_id}, projection(fields))
         if product_data:
             product_data = convert_objectid_to_string(product_data)
-            return Product(**product_data)
+            return self._model(fields)(**product_data)
         return None
 
-    async def get_products(self, skip: int = 0, limit: int = 100) -> List[Product]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        products = []
-        async for product_data in cursor:
-            product_data = convert_objectid_to_string(product_data)
-            products.append(Product(**product_data))
-        return products
+    async def get_products(self, skip: int = 0, limit: int = 100,
+                           cursor: Optional[str] = None,
+                           fields: Optional[List[str]] = None) -> Tuple[List[ProductDocument], Optional[str]]:
+        documents, next_cursor = await find_page(self.collection, "product_id", skip, limit, cursor, fields)
+        return [self._model(fields)(**product_data) for product_data in documents], next_cursor
+
+    def stream_products(self, skip: int = 0, limit: Optional[int] = None,
+                        cursor: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(find_sorted(self.collection, "product_id", skip, limit, cursor, fields),
+                            self._model(fields))
 
-    async def get_products_by_category(self, category: str) -> List[Product]:
-        cursor = self.collection.find({"category": category})
+    async def get_products_by_category(self, category: str,
+                                       fields: Optional[List[str]] = None) -> List[ProductDocument]:
+        cursor = self.collection.find({"category": category}, projection(fields))
         products = []
         async for product_data in cursor:
             product_data = convert_objectid_to_string(product_data)
-            products.append(Product(**product_data))
+            products.append(self._model(fields)(**product_data))
         return products
 
+    def stream_products_by_category(self, category: str, fields: Optional[List[str]] = None) -> AsyncIterator[bytes]:
+        return ndjson_lines(self.collection.find({"category": category}, projection(fields)), self._model(fields))
+
     async def update_product(self, product_id: str, product_update: ProductUpdate) -> Optional[Product]:
         update_data = {k: v for k, v in product_update.model_dump().items() if v is not None}
-        if update_data:
-            await self.collection.update_one(
-                {"_id": ObjectId(product_id)}, 
-                {"$set": update_data}
-            )
-        return await self.get_product(product_id)
+        if not update_data:
+            return await self.get_product(product_id)
+        product_data = await self.collection.find_one_and_update(
+            {"_id": ObjectId(product_id)},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if product_data:
+            return Product(**convert_objectid_to_string(product_data))
+        return None
 
     async def delete_product(self, product_id: str) -> bool:
         result = await self.collection.delete_one({"_id": ObjectId(product_id)})
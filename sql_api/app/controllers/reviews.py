@@ -1,3 +1,4 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models import ProductReview
 from app import schemas
@@ -30,3 +31,22 @@ def delete_review(db: Session, review_id: int):
         db.delete(db_review)
         db.commit()
     return db_review
+
+def _rating_stats(db: Session, key_column, key_value):
+    row = (
+        db.query(func.avg(ProductReview.rating), func.count(ProductReview.review_id))
+        .filter(key_column == key_value)
+        .group_by(key_column)
+        .first()
+    )
+    if not row:
+        return {"mean_rating": None, "review_count": 0}
+    return {"mean_rating": float(row[0]), "review_count": row[1]}
+
+def get_product_rating_stats(db: Session, product_id: int):
+    stats = _rating_stats(db, ProductReview.product_id, product_id)
+    return {"product_id": product_id, **stats}
+
+def get_customer_rating_stats(db: Session, customer_id: int):
+    stats = _rating_stats(db, ProductReview.customer_id, customer_id)
+    return {"customer_id": customer_id, **stats}
@@ -8,6 +8,10 @@ from app.routers.order_items import router as order_items_router
 from app.routers.reviews import router as reviews_router
 
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so indexes added to a model
+# later are created here for databases made before them
+for index in models.ProductReview.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 app = FastAPI(title="E-Commerce API")
 
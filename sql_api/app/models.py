@@ -56,8 +56,8 @@ class OrderItem(Base):
 class ProductReview(Base):
     __tablename__ = "product_reviews"
     review_id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.product_id"))
-    customer_id = Column(Integer, ForeignKey("customers.customer_id"))
+    product_id = Column(Integer, ForeignKey("products.product_id"), index=True)
+    customer_id = Column(Integer, ForeignKey("customers.customer_id"), index=True)
     rating = Column(Integer)
     review_text = Column(String)
     review_date = Column(Date)
@@ -10,6 +10,14 @@ router = APIRouter(prefix="/reviews", tags=["Product Reviews"])
 def list_reviews(db: Session = Depends(get_db)):
     return review_controller.get_reviews(db)
 
+@router.get("/stats/product/{product_id}", response_model=schemas.ProductRatingStats)
+def read_product_rating_stats(product_id: int, db: Session = Depends(get_db)):
+    return review_controller.get_product_rating_stats(db, product_id)
+
+@router.get("/stats/customer/{customer_id}", response_model=schemas.CustomerRatingStats)
+def read_customer_rating_stats(customer_id: int, db: Session = Depends(get_db)):
+    return review_controller.get_customer_rating_stats(db, customer_id)
+
 @router.get("/{review_id}", response_model=schemas.ProductReview)
 def read_review(review_id: int, db: Session = Depends(get_db)):
     db_review = review_controller.get_review(db, review_id)
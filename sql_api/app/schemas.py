@@ -84,3 +84,13 @@ class ProductReview(ProductReviewBase):
     review_id: int
     class Config:
         orm_mode = True
+
+class RatingStats(BaseModel):
+    mean_rating: Optional[float]
+    review_count: int
+
+class ProductRatingStats(RatingStats):
+    product_id: int
+
+class CustomerRatingStats(RatingStats):
+    customer_id: int